@@ -0,0 +1,102 @@
+import os
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# "json": whole fleet in memory, JSON snapshot + journal on disk.
+# "sqlite": devices stored in SQLite (WAL) and queried in SQL.
+STORAGE_BACKEND = os.getenv("CHIMERA_STORAGE_BACKEND", "json").strip().lower()
+
+DATA_FILE_PATH = os.getenv("CHIMERA_DATA_FILE", "app/data/devices.sample.json")
+SQLITE_PATH = os.getenv("CHIMERA_SQLITE_PATH", "app/data/devices.db")
+
+# Recompute /api/summary from scratch on every read and report drift against
+# the incrementally maintained counters. Debug only: makes the summary O(n).
+SUMMARY_VERIFY = _env_flag("CHIMERA_SUMMARY_VERIFY")
+
+# Mutations are appended to "<data file>.journal"; after this many records the
+# journal is folded into a fresh snapshot of the data file (0 disables).
+JOURNAL_COMPACT_EVERY = int(os.getenv("CHIMERA_JOURNAL_COMPACT_EVERY", "1000"))
+
+# Data files at least this large are parsed one device at a time instead of
+# as a whole array, trading some speed for a much lower peak RSS (0 disables).
+LOAD_STREAM_BYTES = int(os.getenv("CHIMERA_LOAD_STREAM_BYTES", str(256 * 1024 * 1024)))
+
+# Seconds a journal commit waits for concurrent writers to share its fsync.
+JOURNAL_COMMIT_DELAY = float(os.getenv("CHIMERA_JOURNAL_COMMIT_DELAY", "0"))
+
+# Serialized /api/devices and /api/summary bodies kept for the current revision.
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("CHIMERA_RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("CHIMERA_RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Listing responses at least COMPRESSION_MIN_BYTES long are compressed with
+# the coding the client prefers among these, in this order of preference
+# ("br" and "zstd" need the optional brotli / zstandard packages; an empty
+# list disables compression).
+COMPRESSION_ENCODINGS = [
+    coding.strip().lower()
+    for coding in os.getenv("CHIMERA_COMPRESSION", "zstd,br,gzip").split(",")
+    if coding.strip()
+]
+COMPRESSION_MIN_BYTES = int(os.getenv("CHIMERA_COMPRESSION_MIN_BYTES", "1024"))
+
+# Change events kept for clients resuming /api/changes/stream, and how many
+# undelivered events a single client may fall behind before it is cut off.
+CHANGE_FEED_BUFFER = int(os.getenv("CHIMERA_CHANGE_FEED_BUFFER", "1024"))
+CHANGE_FEED_MAX_QUEUE = int(os.getenv("CHIMERA_CHANGE_FEED_MAX_QUEUE", "256"))
+CHANGE_FEED_HEARTBEAT = float(os.getenv("CHIMERA_CHANGE_FEED_HEARTBEAT", "15"))
+
+# SQLite backend: change events kept in the database for other workers, and
+# how often each worker checks for commits made by the others.
+CHANGE_LOG_SIZE = int(os.getenv("CHIMERA_CHANGE_LOG_SIZE", "10000"))
+CHANGE_POLL_INTERVAL = float(os.getenv("CHIMERA_CHANGE_POLL_INTERVAL", "0.2"))
+
+# Mutations on the same device are serialized through this many locks.
+DEVICE_LOCK_STRIPES = int(os.getenv("CHIMERA_DEVICE_LOCK_STRIPES", "64"))
+
+# Default acknowledgement for mutations ("durable": after the change is on
+# disk, "applied": once it is visible, persisted in the background).
+DURABILITY = os.getenv("CHIMERA_DURABILITY", "durable").strip().lower()
+
+# Sightings posted to /api/sightings are merged per MAC and applied every
+# flush interval seconds (0 applies each batch as it arrives), or right away
+# once this many distinct devices are waiting.
+INGEST_FLUSH_INTERVAL = float(os.getenv("CHIMERA_INGEST_FLUSH_INTERVAL", "1"))
+INGEST_MAX_PENDING = int(os.getenv("CHIMERA_INGEST_MAX_PENDING", "10000"))
+
+# Devices not seen for this many seconds (by last_seen) are marked inactive
+# (0 keeps is_active as stored). Expiry is checked at most every check
+# interval seconds; the devices that timed out in between are one commit.
+IDLE_TIMEOUT = float(os.getenv("CHIMERA_IDLE_TIMEOUT", "0"))
+IDLE_CHECK_INTERVAL = float(os.getenv("CHIMERA_IDLE_CHECK_INTERVAL", "1"))
+
+# Background re-classification (0 disables it): every interval seconds the
+# devices due are classified by the rule-based classifier in this many worker
+# processes (0 classifies in the pipeline thread), batch devices per task and
+# at most rate devices per second. A classification is due again after max
+# age seconds scaled by its confidence, never sooner than min age.
+CLASSIFY_INTERVAL = float(os.getenv("CHIMERA_CLASSIFY_INTERVAL", "0"))
+CLASSIFY_WORKERS = int(os.getenv("CHIMERA_CLASSIFY_WORKERS", "2"))
+CLASSIFY_BATCH = int(os.getenv("CHIMERA_CLASSIFY_BATCH", "500"))
+CLASSIFY_RATE = float(os.getenv("CHIMERA_CLASSIFY_RATE", "1000"))
+CLASSIFY_MAX_AGE = float(os.getenv("CHIMERA_CLASSIFY_MAX_AGE", "604800"))
+CLASSIFY_MIN_AGE = float(os.getenv("CHIMERA_CLASSIFY_MIN_AGE", "3600"))
+
+# Time every request for /metrics (Prometheus text format).
+METRICS_ENABLED = _env_flag("CHIMERA_METRICS", True)
+
+# Sampling profiler: start it with the server, and seconds between samples.
+PROFILER_ENABLED = _env_flag("CHIMERA_PROFILER")
+PROFILER_INTERVAL = float(os.getenv("CHIMERA_PROFILER_INTERVAL", "0.01"))
+
+# Summary history (/api/summary/history): sampled every interval seconds and
+# after changes, saved to the file every save interval seconds and on
+# shutdown (empty file path keeps it in memory only).
+SUMMARY_HISTORY_FILE = os.getenv("CHIMERA_SUMMARY_HISTORY_FILE", "app/data/summary_history.npz")
+SUMMARY_HISTORY_INTERVAL = float(os.getenv("CHIMERA_SUMMARY_HISTORY_INTERVAL", "10"))
+SUMMARY_HISTORY_SAVE_INTERVAL = float(os.getenv("CHIMERA_SUMMARY_HISTORY_SAVE_INTERVAL", "300"))
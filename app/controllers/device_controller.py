@@ -1,71 +1,206 @@
-import json
-import os
-from typing import List, Dict, Optional
-from app.schemas.device import Device, DeviceUpdate, Group
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Dict, Optional
+from app import config
+from app.schemas.device import (
+    Device, DeviceQuery, DeviceSearch, DeviceUpdate, GroupCreate, GroupPolicy, GroupUpdate
+)
+from app.services.bulk_operations import BulkOperations
+from app.services.change_publisher import ChangePublisher
+from app.services.classification import Reclassifier
+from app.services.events import devices_event
+from app.services.idle_expiry import IdleExpiry
+from app.services.sighting_ingest import SightingIngest
+from app.services.summary_recorder import SummaryRecorder
+from app.storage.blocklist_bits import BLOCKLIST_FIELDS
+from app.storage.factory import create_repository
+from app.storage.group_policies import DEFAULT_POLICY, membership
+from app.storage.pagination import DevicePage
+from app.storage.repository import DeviceRepository
+from app.utils.lock_stripes import LockStripes
+from app.utils.metrics import LOAD_SECONDS
 
 
 class DeviceController:
+    """
+    Device and group reads and edits over a repository. The background
+    work on the fleet (change publication, summary history, sighting ingest,
+    idle expiry, re-classification) and bulk edits are services sharing the
+    controller's ``mutation``; they are exposed as attributes.
+    """
     
-    def __init__(self, data_file_path: str = "app/data/devices.sample.json"):
-        self.data_file_path = data_file_path
-        self.devices: List[Device] = []
-        self.groups = {
-            1: Group(id=1, name="Default Group", is_default=True),
-            2: Group(id=2, name="Staff", is_default=False),
-            3: Group(id=3, name="Guests", is_default=False),
-            4: Group(id=4, name="IoT", is_default=False)
-        }
+    def __init__(
+        self,
+        repository: Optional[DeviceRepository] = None,
+        verify_summary_reads: bool = config.SUMMARY_VERIFY
+    ):
+        self.repository = repository or create_repository()
+        self.verify_summary_reads = verify_summary_reads
+        self._device_locks = LockStripes(config.DEVICE_LOCK_STRIPES)
+        self._groups_lock = threading.Lock()
+        self.recorder = SummaryRecorder(self.repository)
+        self.changes = ChangePublisher(self.repository, on_publish=self.recorder.changed)
+        # Forks the classifier's workers, so before load starts the journal writer and the other threads
+        self.classifier = Reclassifier(self.repository, self.mutation, self.changes.record)
+        self.expiry = IdleExpiry(self.repository, self.mutation, self.changes.record)
+        self.sightings = SightingIngest(self.repository, self.mutation, self.changes.record, self.expiry, self.classifier)
+        self.bulk = BulkOperations(self.repository, self.mutation, self.changes.record, self.apply_update, self.apply_action)
         self.load_devices()
         
         
     
     def load_devices(self):
-        try:
-            if os.path.exists(self.data_file_path):
-                with open(self.data_file_path, 'r') as f:
-                    devices_data = json.load(f)
-                    self.devices = [Device(**device) for device in devices_data]
-            else:
-                print(f"Warning: Data file {self.data_file_path} not found")
-                self.devices = []
-        except Exception as e:
-            print(f"Error loading devices: {e}")
-            self.devices = []
+        started = time.perf_counter()
+        self.repository.load()
+        LOAD_SECONDS.set(time.perf_counter() - started)
+        self.changes.start()
+        self.recorder.start()
+        self.sightings.start()
+        self.expiry.start()
+        self.classifier.start()
+    
+    
+    
+    @property
+    def epoch(self) -> str:
+        return self.repository.epoch
+    
+    
+    
+    @property
+    def revision(self) -> int:
+        """Bumped by every mutation; (epoch, revision) identifies a state of the fleet."""
+        return self.repository.revision()
+    
+    
+    
+    @contextmanager
+    def mutation(self, device_ids: Optional[Iterable[int]], durable: bool = True) -> Iterator[None]:
+        """
+        Run a read-modify-write cycle on ``device_ids`` (``None`` for every
+        device) as one repository transaction, serialized with every other
+        cycle touching the same devices (readers take none of these locks).
+        Afterwards publish the change events it recorded and, if
+        ``durable``, wait until it is on disk; otherwise persistence
+        completes in the background.
+        """
+        if device_ids is None:
+            device_ids = range(len(self._device_locks))
+        with self._device_locks.hold(device_ids):
+            with self.repository.transaction():
+                yield
+        if self.repository.shared:
+            self.changes.sync()
+        if durable:
+            self.repository.sync()
     
     
     
     def save_devices(self):
-        try:
-            os.makedirs(os.path.dirname(self.data_file_path), exist_ok=True)
-            with open(self.data_file_path, 'w') as f:
-                json.dump([device.model_dump() for device in self.devices], f, indent=2)
-        except Exception as e:
-            print(f"Error saving devices: {e}")
+        self.repository.flush()
+    
+    
+    
+    def close(self):
+        self.changes.close()
+        self.expiry.close()
+        self.classifier.close()
+        self.sightings.close()
+        self.recorder.close()
+        self.repository.close()
+    
+    
     
     def get_all_devices(self) -> List[Device]:
-        return self.devices
+        return self.repository.all()
     
     
     
     def get_device_by_id(self, device_id: int) -> Optional[Device]:
-        for device in self.devices:
-            if device.id == device_id:
-                return device
-        return None
+        return self.repository.get(device_id)
     
     
     
-    def update_device(self, device_id: int, update_data: DeviceUpdate) -> Optional[Device]:
-        device = self.get_device_by_id(device_id)
-        if not device:
-            return None
-        
+    def get_device_by_mac(self, mac: str) -> Optional[Device]:
+        devices = self.repository.find_by_mac(mac)
+        return devices[0] if devices else None
+    
+    
+    
+    def get_devices_by_ip(self, ip: str) -> List[Device]:
+        return self.repository.find_by_ip(ip)
+    
+    
+    
+    def find_devices(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> List[Device]:
+        return self.repository.find(group_id=group_id, category=category, is_active=is_active)
+    
+    
+    
+    def query_devices(self, query: DeviceQuery) -> DevicePage:
+        return self.repository.query(query)
+    
+    
+    
+    def search_devices(self, search: DeviceSearch) -> DevicePage:
+        return self.repository.search(search)
+    
+    
+    
+    def count_devices(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> int:
+        return self.repository.count(group_id=group_id, category=category, is_active=is_active)
+    
+    
+    
+    def update_device(self, device_id: int, update_data: DeviceUpdate, durable: bool = True) -> Optional[Device]:
+        with self.mutation([device_id], durable):
+            device = self.get_device_by_id(device_id)
+            if not device:
+                return None
+            
+            before = device.model_dump()
+            device = device.model_copy(deep=True)
+            self.apply_update(device, update_data)
+            self.repository.save(device)
+            self.changes.record(devices_event([(before, device)]))
+        return device
+    
+    
+    
+    def _group(self, group_id: int) -> GroupPolicy:
+        group = self.repository.get_group(group_id)
+        if group is None:
+            raise ValueError(f"Unknown group {group_id}")
+        return group
+    
+    
+    
+    def apply_update(self, device: Device, update_data: DeviceUpdate):
         if update_data.given_name is not None:
             device.given_name = update_data.given_name
         
-        if update_data.group_id is not None and update_data.group_id in self.groups:
-            new_group = self.groups[update_data.group_id]
-            device.group = new_group
+        if update_data.group_id is not None and update_data.group_id != device.group.id:
+            new_group = self._group(update_data.group_id)
+            device.group = membership(new_group)
+            if not device.has_custom_blocklist:
+                device.blocklist = new_group.blocklist.model_copy()
+        
+        if update_data.has_custom_blocklist is False and device.has_custom_blocklist:
+            device.blocklist = self._group(device.group.id).blocklist.model_copy()
+            device.has_custom_blocklist = False
+        elif update_data.has_custom_blocklist:
+            device.has_custom_blocklist = True
             
         blocklist_fields = [
             'ads_trackers', 'gambling', 'social_media', 'porn', 'gaming',
@@ -79,17 +214,34 @@ class DeviceController:
         
         if any(getattr(update_data, field) is not None for field in blocklist_fields):
             device.has_custom_blocklist = True
-        
-        self.save_devices()
+    
+    
+    
+    def perform_device_action(
+        self,
+        device_id: int,
+        action: str,
+        category: Optional[str] = None,
+        durable: bool = True
+    ) -> Optional[Device]:
+        with self.mutation([device_id], durable):
+            device = self.get_device_by_id(device_id)
+            if not device:
+                return None
+            
+            before = device.model_dump()
+            device = device.model_copy(deep=True)
+            reason = self.apply_action(device, action, category)
+            if reason is not None:
+                raise ValueError(reason)
+            self.repository.save(device)
+            self.changes.record(devices_event([(before, device)]))
         return device
     
     
     
-    def perform_device_action(self, device_id: int, action: str, category: Optional[str] = None) -> Optional[Device]:
-        device = self.get_device_by_id(device_id)
-        if not device:
-            return None
-        
+    def apply_action(self, device: Device, action: str, category: Optional[str] = None) -> Optional[str]:
+        """Apply ``action`` to ``device`` in place; returns why it can't be applied (leaving the device alone), if so."""
         if action == "isolate":
             for field in device.blocklist.model_fields:
                     setattr(device.blocklist, field, True)
@@ -103,32 +255,132 @@ class DeviceController:
             device.has_custom_blocklist = True
             
         elif action == "toggle_block" and category:
-            if hasattr(device.blocklist, category):
-                current_value = getattr(device.blocklist, category)
-                setattr(device.blocklist, category, not current_value)
-                device.has_custom_blocklist = True
+            if category not in BLOCKLIST_FIELDS:
+                return f"Unknown blocklist category '{category}'"
+            current_value = getattr(device.blocklist, category)
+            setattr(device.blocklist, category, not current_value)
+            device.has_custom_blocklist = True
         
-        self.save_devices()
-        return device
+        else:
+            return f"Can't perform '{action}'" + (f" on category '{category}'" if category else "")
+        return None
     
     
-    def get_summary(self) -> Dict:
-        total = len(self.devices)
-        active = sum(1 for device in self.devices if device.is_active)
-        
-        by_group = {}
-        for device in self.devices:
-            group_name = device.group.name
-            by_group[group_name] = by_group.get(group_name, 0) + 1
-        
-        by_category = {}
-        for device in self.devices:
-            category = device.ai_classification.device_category
-            by_category[category] = by_category.get(category, 0) + 1
-        
+    
+    def get_groups(self) -> List[GroupPolicy]:
+        return self.repository.groups()
+    
+    
+    
+    def get_group(self, group_id: int) -> Optional[GroupPolicy]:
+        return self.repository.get_group(group_id)
+    
+    
+    
+    def _check_name(self, name: str, group_id: Optional[int] = None):
+        for group in self.repository.groups():
+            if group.id != group_id and group.name.lower() == name.lower():
+                raise ValueError(f"A group named '{group.name}' already exists")
+    
+    
+    
+    def create_group(self, group_data: GroupCreate, durable: bool = True) -> GroupPolicy:
+        """New (non-default) group; its policy defaults to the default group's."""
+        with self._groups_lock, self.mutation([], durable):
+            self._check_name(group_data.name)
+            groups = self.repository.groups()
+            blocklist = group_data.blocklist
+            if blocklist is None:
+                default = next((group for group in groups if group.is_default), None)
+                blocklist = default.blocklist if default else DEFAULT_POLICY
+            group = GroupPolicy(
+                id=max((group.id for group in groups), default=0) + 1,
+                name=group_data.name,
+                is_default=False,
+                blocklist=blocklist.model_copy()
+            )
+            self.repository.save_group(group)
+            self.changes.record({"type": "group.created", "group": group.model_dump()})
+        return group
+    
+    
+    
+    def update_group(self, group_id: int, update_data: GroupUpdate, durable: bool = True) -> Optional[GroupPolicy]:
+        """
+        Rename a group and/or change its policy. A policy change is one
+        repository write whatever the group's size: devices without a custom
+        blocklist follow it from the next read. A rename also rewrites the
+        group's devices, which embed its name.
+        """
+        # A rename rewrites devices, so it is serialized with every device mutation
+        lock_ids = None if update_data.name is not None else []
+        with self._groups_lock, self.mutation(lock_ids, durable):
+            group = self.repository.get_group(group_id)
+            if group is None:
+                return None
+            renamed = update_data.name is not None and update_data.name != group.name
+            if renamed:
+                self._check_name(update_data.name, group_id)
+            group = group.model_copy(deep=True)
+            if renamed:
+                group.name = update_data.name
+            for field in BLOCKLIST_FIELDS:
+                if getattr(update_data, field) is not None:
+                    setattr(group.blocklist, field, getattr(update_data, field))
+            self.repository.save_group(group)
+            self.changes.record({"type": "group.updated", "group": group.model_dump()})
+            if renamed:
+                self.bulk.apply(
+                    self.repository.match_ids(group_id=group_id),
+                    lambda device: setattr(device, "group", membership(group))
+                )
+        return group
+    
+    
+    
+    def get_blocklist_stats(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> Dict:
         return {
-            "total": total,
-            "active": active,
-            "by_group": by_group,
-            "by_category": by_category
+            "devices": self.repository.count(group_id=group_id, category=category, is_active=is_active),
+            "blocked": self.repository.blocklist_counts(group_id=group_id, category=category, is_active=is_active)
         }
+    
+    
+    
+    def get_summary(self) -> Dict:
+        if self.verify_summary_reads:
+            report = self.verify_summary()
+            if not report["ok"]:
+                print(f"Warning: summary counters drifted: {report['drift']}")
+        return self.repository.summary()
+    
+    
+    
+    def get_summary_history(
+        self,
+        start: float,
+        end: float,
+        resolution: Optional[str] = None,
+        keys: Optional[List[str]] = None,
+        points: int = 500,
+        aggregate: str = "avg"
+    ) -> Dict:
+        return self.recorder.history.query(start, end, resolution=resolution, keys=keys, points=points, aggregate=aggregate)
+    
+    
+    
+    def verify_summary(self) -> Dict:
+        return self.repository.verify_summary()
+    
+    
+    
+    def repair_summary(self, durable: bool = True) -> Dict:
+        with self.mutation(None, durable):
+            report = self.repository.verify_summary(repair=True)
+            if not report["ok"]:
+                self.changes.record({"type": "summary.repaired", "summary": self.repository.summary()})
+        return report
@@ -0,0 +1,73 @@
+import time
+from typing import Dict, List
+from app.utils.metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS, HTTP_REQUESTS
+
+
+UNMATCHED = "unmatched"
+
+
+class _RouteMetrics:
+    """The metric children of one (route, method), resolved once."""
+
+    def __init__(self, method: str, route: str):
+        self.latency = HTTP_REQUEST_SECONDS.labels(method, route)
+        self._method = method
+        self._route = route
+        self._statuses: List = [None] * 6
+
+    def status(self, code: int):
+        index = min(code // 100, 5)
+        child = self._statuses[index]
+        if child is None:
+            child = self._statuses[index] = HTTP_REQUESTS.labels(self._method, self._route, f"{index}xx")
+        return child
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing every HTTP request, labelled by the route
+    template FastAPI matched (``/api/devices/{device_id}``, not the raw path)
+    so label sets stay bounded. Children are cached per route and method, so
+    a request only does dictionary lookups and list increments.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[str, Dict[str, _RouteMetrics]] = {}
+        self._in_flight: Dict[str, object] = {}
+
+    def _route_metrics(self, route, method: str) -> _RouteMetrics:
+        path = route.path if route is not None else UNMATCHED
+        by_method = self._routes.get(path)
+        if by_method is None:
+            by_method = self._routes.setdefault(path, {})
+        metrics = by_method.get(method)
+        if metrics is None:
+            metrics = by_method.setdefault(method, _RouteMetrics(method, path))
+        return metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_flight = self._in_flight.get(method)
+        if in_flight is None:
+            in_flight = self._in_flight.setdefault(method, HTTP_IN_FLIGHT.labels(method))
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            metrics = self._route_metrics(scope.get("route"), method)
+            metrics.latency.observe(time.perf_counter() - started)
+            metrics.status(status[0]).inc()
@@ -1,15 +1,139 @@
-from fastapi import APIRouter, HTTPException, Path, Body
-from app.schemas.device import Device, DeviceUpdate, DeviceAction, Summary
+import asyncio
+import json
+import time
+from fastapi import APIRouter, HTTPException, Path, Body, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from app import config
+from app.schemas.device import (
+    Device, DeviceUpdate, DeviceAction, DeviceQuery, DeviceSearch, Summary,
+    BulkDeviceAction, BulkDeviceUpdate, BulkResult, GroupCreate, GroupPolicy, GroupUpdate,
+    IngestResult, SightingBatch
+)
 from app.controllers.device_controller import DeviceController
-from typing import List
+from app.utils import columnar
+from app.utils.change_feed import OVERFLOW
+from app.utils.compression import compress, negotiate
+from app.utils.metrics import RESPONSE_BODY_BYTES
+from app.utils.response_cache import ResponseCache
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 router = APIRouter(prefix="/api", tags=["devices"])
 
 device_controller = DeviceController()
 
+response_cache = ResponseCache(
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    max_bytes=config.RESPONSE_CACHE_MAX_BYTES
+)
+
+# Serializes straight from the models; no response_model re-validation
+_device_list_adapter = TypeAdapter(List[Device])
+
+FORMAT_QUERY = Query(
+    "json",
+    pattern="^(json|columnar|msgpack)$",
+    description="`json`: a list of devices; `columnar`: one column per field with dictionary-encoded strings "
+                "(see `app/utils/columnar.py`); `msgpack`: the columnar document as MessagePack"
+)
+
+DURABILITY_QUERY = Query(
+    config.DURABILITY,
+    pattern="^(durable|applied)$",
+    description="Respond once the change is on disk (`durable`) or as soon as it is applied (`applied`)"
+)
+
+
+def _durable(response: Response, durability: str) -> bool:
+    """Echo the acknowledgement mode in ``X-Durability`` and return whether to wait for disk."""
+    durable = durability != "applied"
+    response.headers["X-Durability"] = "durable" if durable else "applied"
+    return durable
+
+
+def _render(render: Callable[[], Tuple[bytes, Dict[str, str]]], coding: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+    """Run ``render()`` and compress its body; on a worker thread, as a cache miss can take a while."""
+    body, headers = render()
+    if coding and len(body) >= config.COMPRESSION_MIN_BYTES:
+        body = compress(body, coding)
+        headers = {**headers, "Content-Encoding": coding}
+    return body, headers
+
+
+async def _cached_response(
+    request: Request,
+    shape: str,
+    render: Callable[[], Tuple[bytes, Dict[str, str]]],
+    format: str = "json"
+) -> Response:
+    """
+    Serve ``render()``'s body for the current revision, reusing a cached copy
+    when this shape was already rendered and answering 304 when the client's
+    ETag is still current.
+
+    The body is compressed with the best coding the client's
+    ``Accept-Encoding`` allows (once it reaches ``COMPRESSION_MIN_BYTES``).
+    Each coding is its own representation: cached and ETagged separately, so
+    a revision is compressed once per coding rather than once per request.
+
+    A body rendered while the revision moved may show either state, so it
+    is sent without an ETag and not cached.
+    """
+    coding = negotiate(request.headers.get("accept-encoding"), config.COMPRESSION_ENCODINGS)
+    shape = f"{shape};{coding or 'identity'}"
+    revision = device_controller.revision
+    etag = ResponseCache.etag(device_controller.epoch, revision, shape)
+    if ResponseCache.matches(request.headers.get("if-none-match"), etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"})
+
+    entry = response_cache.get(revision, shape)
+    if entry is None:
+        body, headers = await run_in_threadpool(_render, render, coding)
+        if device_controller.revision == revision:
+            response_cache.put(revision, shape, body, headers)
+        else:
+            etag = None
+    else:
+        body, headers = entry
+    RESPONSE_BODY_BYTES.labels(format, headers.get("Content-Encoding", "identity")).inc(len(body))
+    headers = {**headers, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag is not None:
+        headers["ETag"] = etag
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _check_format(format: str):
+    if format == "msgpack" and columnar.msgpack is None:
+        raise HTTPException(status_code=406, detail="format=msgpack needs the msgpack package on the server")
+
+
+def _encode_devices(devices: List[Device], include: Optional[Set[str]], format: str) -> Tuple[bytes, Dict[str, str]]:
+    """Serialize a page of devices in the requested format; returns the body and its Content-Type header."""
+    if format == "json":
+        body = _device_list_adapter.dump_json(devices, include={"__all__": include} if include else None)
+        return body, {}
+    media_type = columnar.MSGPACK_MEDIA_TYPE if format == "msgpack" else columnar.JSON_MEDIA_TYPE
+    return columnar.dumps(columnar.encode_devices(devices, include), media_type), {"Content-Type": media_type}
+
 
 @router.get("/devices", response_model=List[Device], summary="Get All Devices")
-async def get_devices():
+async def get_devices(
+    request: Request,
+    group_id: Optional[int] = Query(None, description="Only devices in this group", ge=1),
+    category: Optional[str] = Query(None, description="Only devices with this AI classification category"),
+    is_active: Optional[bool] = Query(None, description="Only active (true) or inactive (false) devices"),
+    vendor: Optional[str] = Query(None, description="Only devices from this vendor (case-insensitive)"),
+    has_custom_blocklist: Optional[bool] = Query(None, description="Only devices with (true) or without (false) a custom blocklist"),
+    blocked: Optional[str] = Query(None, description="Comma-separated blocklist fields that must be enabled", examples=["tiktok,gaming"]),
+    allowed: Optional[str] = Query(None, description="Comma-separated blocklist fields that must be disabled", examples=["ads_trackers"]),
+    sort: str = Query("id", description="id, hostname, given_name, vendor, ip or last_seen; prefix '-' for descending"),
+    limit: Optional[int] = Query(None, description="Page size (omit to return every match)", ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated top-level fields to return (id is always included)", examples=["id,hostname,ip,is_active"]),
+    format: str = FORMAT_QUERY
+):
     """
     Retrieve all devices in the system.
     
@@ -19,40 +143,622 @@ async def get_devices():
     - Blocklist settings
     - AI classification data
     - Group membership
+    
+    **Filters** (optional, combined with AND, served from the storage indexes):
+    - `group_id`, `category`, `is_active`, `vendor`, `has_custom_blocklist`
+    - `blocked` / `allowed`: blocklist fields that must be on / off
+    
+    **Pagination:** pass `limit` to page through results in `sort` order. When
+    more results exist, the response carries an `X-Next-Cursor` header; send it
+    back as `cursor` to get the next page. `X-Total-Count` is the number of
+    devices matching the filters.
+    
+    **Projection:** `fields` limits each device to the listed top-level fields.
+    
+    **Formats:** `format=columnar` returns `{format, count, columns}` with one
+    entry per field: plain lists for identifiers, `{dict, codes}` for
+    repeated strings and lists (vendor, OS, group, user agents...),
+    `{bits, masks}` for the blocklist, `{us}` (microseconds since the epoch)
+    for timestamps and `{flags}` (0/1) for booleans. `format=msgpack` is the
+    same document as MessagePack.
+    
+    **Compression:** bodies are compressed according to `Accept-Encoding`
+    (zstd, br or gzip, whichever the server supports and the client prefers).
+    
+    **Caching:** responses carry an `ETag`; send it back in `If-None-Match` to
+    get `304 Not Modified` while nothing has changed.
     """
-    return device_controller.get_all_devices()
+    try:
+        query = DeviceQuery(
+            group_id=group_id,
+            category=category,
+            is_active=is_active,
+            vendor=vendor,
+            has_custom_blocklist=has_custom_blocklist,
+            blocked=_split_csv(blocked),
+            allowed=_split_csv(allowed),
+            sort=sort,
+            limit=limit,
+            cursor=cursor
+        )
+        include = _projection(fields)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _check_format(format)
+
+    def render() -> Tuple[bytes, Dict[str, str]]:
+        try:
+            page = device_controller.query_devices(query)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        body, headers = _encode_devices(page.devices, include, format)
+        headers["X-Total-Count"] = str(page.total)
+        if page.next_cursor:
+            headers["X-Next-Cursor"] = page.next_cursor
+        return body, headers
+
+    shape = "devices?" + "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    return await _cached_response(request, shape, render, format)
+
+
+def _split_csv(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _projection(fields: Optional[str]) -> Optional[Set[str]]:
+    names = _split_csv(fields)
+    if not names:
+        return None
+    unknown = [name for name in names if name not in Device.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return {"id", *names}
+
+
+@router.get("/devices/search", response_model=List[Device], summary="Search Devices")
+async def search_devices(
+    request: Request,
+    q: Optional[str] = Query(None, description="Words to find in hostname, given name, vendor, OS name or AI indicators", examples=["macbook staff"]),
+    mac: Optional[str] = Query(None, description="MAC address prefix, e.g. an OUI (any of AA:BB:CC, aa-bb-cc, aabbcc)", examples=["3C:22:FB"]),
+    ip: Optional[str] = Query(None, description="IP address or CIDR network", examples=["192.168.69.0/28"]),
+    group_id: Optional[int] = Query(None, description="Only devices in this group", ge=1),
+    category: Optional[str] = Query(None, description="Only devices with this AI classification category"),
+    is_active: Optional[bool] = Query(None, description="Only active (true) or inactive (false) devices"),
+    limit: int = Query(50, description="Page size", ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated top-level fields to return (id is always included)", examples=["id,hostname,ip"]),
+    format: str = FORMAT_QUERY
+):
+    """
+    Find devices without downloading the fleet. At least one of `q`, `mac`
+    or `ip` is required; all given criteria must match.
+    
+    **Text (`q`):** every word must match one of `hostname`, `given_name`,
+    `vendor`, `os_name` or `ai_classification.indicators`, case-insensitively.
+    Words of three or more characters match anywhere in a field; shorter
+    ones only at the start of a word (`"pi"` finds "Raspberry Pi", not
+    "Epic"). Results are ranked: an exact field beats a prefix, which beats
+    a word start, which beats a substring, and hostname/given name matches
+    count more than vendor, which counts more than OS and indicators.
+    
+    **MAC (`mac`):** devices whose MAC starts with the given hex digits.
+    
+    **IP (`ip`):** devices inside the network (a bare address matches itself).
+    
+    **Pagination:** best match first, then by id. When more results exist,
+    `X-Next-Cursor` carries the cursor for the next page; `X-Total-Count`
+    is the number of matches. Supports `fields`, `format`, compression and
+    `ETag` like `/api/devices`.
+    """
+    try:
+        search = DeviceSearch(
+            q=q,
+            mac=mac,
+            ip=ip,
+            group_id=group_id,
+            category=category,
+            is_active=is_active,
+            limit=limit,
+            cursor=cursor
+        )
+        include = _projection(fields)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _check_format(format)
+
+    def render() -> Tuple[bytes, Dict[str, str]]:
+        try:
+            page = device_controller.search_devices(search)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        body, headers = _encode_devices(page.devices, include, format)
+        headers["X-Total-Count"] = str(page.total)
+        if page.next_cursor:
+            headers["X-Next-Cursor"] = page.next_cursor
+        return body, headers
+
+    shape = "search?" + "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    return await _cached_response(request, shape, render, format)
+
+
+@router.get("/devices/by-mac/{mac}", response_model=Device, summary="Get Device by MAC")
+async def get_device_by_mac(mac: str = Path(..., description="MAC address (case-insensitive)")):
+    """
+    Look up a single device by its MAC address.
+    """
+    device = device_controller.get_device_by_mac(mac)
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return device
+
+
+@router.get("/devices/by-ip/{ip}", response_model=List[Device], summary="Get Devices by IP")
+async def get_devices_by_ip(ip: str = Path(..., description="IP address")):
+    """
+    Look up the devices currently holding an IP address.
+    """
+    return device_controller.get_devices_by_ip(ip)
+
+
+@router.get("/devices/{device_id}", response_model=Device, summary="Get Device")
+async def get_device(device_id: int = Path(..., description="Device ID", ge=1)):
+    """
+    Retrieve a single device by its ID.
+    """
+    device = device_controller.get_device_by_id(device_id)
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return device
 
 
 @router.get("/summary", response_model=Summary, summary="Get Summary Statistics")
-async def get_summary():
+async def get_summary(request: Request):
     """
     Get summary statistics about devices in the system.
     
     Returns aggregated data including:
     - Total device count
-    - Active device count
+    - Active device count (devices sighted within `CHIMERA_IDLE_TIMEOUT`
+      seconds, when set)
     - Device distribution by group
     - Device distribution by AI classification category
+    
+    Responses carry an `ETag`; send it back in `If-None-Match` to get
+    `304 Not Modified` while nothing has changed.
+    """
+    if device_controller.verify_summary_reads:
+        return device_controller.get_summary()
+
+    def render() -> Tuple[bytes, Dict[str, str]]:
+        return Summary(**device_controller.get_summary()).model_dump_json().encode("utf-8"), {}
+
+    return await _cached_response(request, "summary", render)
+
+
+@router.get("/summary/history", summary="Summary History")
+async def get_summary_history(
+    start: Optional[float] = Query(None, description="Range start, epoch seconds (default: one hour before end)"),
+    end: Optional[float] = Query(None, description="Range end, epoch seconds (default: now)"),
+    resolution: Optional[str] = Query(None, pattern="^(1m|1h|1d)$", description="Bucket size (default: the finest one covering the range)"),
+    series: Optional[str] = Query(None, description="Comma-separated series (default: all)", examples=["total,active,group:Staff,category:IoT"]),
+    points: int = Query(500, description="Maximum points per series; buckets are merged to fit", ge=1, le=5000),
+    aggregate: str = Query("avg", pattern="^(avg|min|max|last)$", description="How samples within a point are combined")
+):
+    """
+    Summary counters over time for trend charts, recorded every
+    `CHIMERA_SUMMARY_HISTORY_INTERVAL` seconds and after changes.
+    
+    Kept as rollups of 1-minute (last day), 1-hour (last 30 days) and 1-day
+    (last 2 years) buckets. Series are `total`, `active`, `group:<name>` and
+    `category:<name>`.
+    
+    Returns columnar data: `timestamps` (bucket start, epoch seconds) and one
+    value list per series in `series`; `step` is the seconds covered by each point.
+    """
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    try:
+        return device_controller.get_summary_history(
+            start,
+            end,
+            resolution=resolution,
+            keys=_split_csv(series),
+            points=points,
+            aggregate=aggregate
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/summary/verify", summary="Verify Summary Counters")
+async def verify_summary():
+    """
+    Recompute the summary from scratch and compare it against the incrementally
+    maintained counters served by `/api/summary`. Read-only; to fix drift, `POST`
+    here instead.
+    
+    Returns `ok`, the per-key `drift` (expected vs. actual), and both summaries.
+    This walks the whole fleet; use it for debugging, not polling.
+    
+    Set `CHIMERA_SUMMARY_VERIFY=1` to run this check on every `/api/summary` read.
+    """
+    return await run_in_threadpool(device_controller.verify_summary)
+
+
+@router.post("/summary/verify", summary="Repair Summary Counters")
+async def repair_summary(response: Response, durability: str = DURABILITY_QUERY):
+    """
+    Like `GET /api/summary/verify`, but when drift is found rebuild the
+    counters from the recount. The report describes the counters as they were
+    before the repair. A repair is published on the change feed as
+    `summary.repaired`.
+    """
+    return await run_in_threadpool(device_controller.repair_summary, durable=_durable(response, durability))
+
+
+@router.get("/blocklist/stats", summary="Blocklist Statistics")
+async def get_blocklist_stats(
+    group_id: Optional[int] = Query(None, description="Only devices in this group", ge=1),
+    category: Optional[str] = Query(None, description="Only devices with this AI classification category"),
+    is_active: Optional[bool] = Query(None, description="Only active (true) or inactive (false) devices")
+):
     """
-    return device_controller.get_summary()
+    Count how many devices have each blocklist category enabled, e.g. how many
+    devices block TikTok. Computed as bitwise reductions over the packed
+    blocklist masks rather than by reading each device.
+    
+    Returns `devices` (number of devices considered) and `blocked`
+    (per-category count of devices with that category enabled).
+    """
+    return device_controller.get_blocklist_stats(group_id=group_id, category=category, is_active=is_active)
+
+
+@router.get("/groups", response_model=List[GroupPolicy], summary="Get Groups", tags=["groups"])
+async def get_groups():
+    """
+    Every group with its blocklist policy. Devices whose
+    `has_custom_blocklist` is false follow their group's policy.
+    """
+    return device_controller.get_groups()
+
+
+@router.get("/groups/{group_id}", response_model=GroupPolicy, summary="Get Group", tags=["groups"])
+async def get_group(group_id: int = Path(..., description="Group ID", ge=1)):
+    """
+    Retrieve a single group and its blocklist policy.
+    """
+    group = device_controller.get_group(group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return group
+
+
+@router.post("/groups", response_model=GroupPolicy, status_code=201, summary="Create Group", tags=["groups"])
+async def create_group(
+    response: Response,
+    group_data: GroupCreate = Body(..., description="Name and optional initial policy"),
+    durability: str = DURABILITY_QUERY
+):
+    """
+    Create a group. Without a `blocklist` it starts with the default group's
+    policy. Names are unique (case-insensitive); a duplicate gets `409`.
+    Published on the change feed as `group.created`.
+    """
+    try:
+        return await run_in_threadpool(device_controller.create_group, group_data, durable=_durable(response, durability))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.patch("/groups/{group_id}", response_model=GroupPolicy, summary="Update Group", tags=["groups"])
+async def update_group(
+    response: Response,
+    group_id: int = Path(..., description="Group ID to update", ge=1),
+    update_data: GroupUpdate = Body(..., description="New name and/or blocklist fields"),
+    durability: str = DURABILITY_QUERY
+):
+    """
+    Rename a group and/or change fields of its blocklist policy.
+    
+    A policy change applies at once to every device of the group whose
+    `has_custom_blocklist` is false, without rewriting them: it is a single
+    write and one `group.updated` event on the change feed (clients apply the
+    new `blocklist` to those devices). Devices with a custom blocklist are
+    not affected.
+    
+    A rename also updates `group.name` on every device of the group
+    (published as `devices.updated`). A name already in use gets `409`.
+    """
+    try:
+        group = await run_in_threadpool(
+            device_controller.update_group,
+            group_id,
+            update_data,
+            durable=_durable(response, durability)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    return group
+
+
+@router.get("/cache/stats", summary="Response Cache Statistics")
+async def get_cache_stats():
+    """
+    Hit/miss counters for the `/api/devices` and `/api/summary` response cache.
+    
+    `not_modified` counts requests answered with `304` without touching the cache.
+    """
+    return {**response_cache.stats(), "current_revision": device_controller.revision}
+
+
+def _sse(data: str, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _resume_revision(last_event_id: Optional[str], since: Optional[int]) -> Tuple[Optional[int], bool]:
+    """
+    Revision to resume after, and whether it belongs to this server's epoch.
+    ``Last-Event-ID`` (``"<epoch>:<revision>"``, sent by EventSource on
+    reconnect) wins over ``since``.
+    """
+    if last_event_id:
+        epoch, _, revision = last_event_id.partition(":")
+        if epoch != device_controller.epoch or not revision.isdigit():
+            return None, False
+        return int(revision), True
+    return since, True
+
+
+@router.get("/changes/stream", summary="Change Feed (Server-Sent Events)")
+async def stream_changes(
+    request: Request,
+    since: Optional[int] = Query(None, description="Resume after this revision (same epoch as the current server)", ge=0)
+):
+    """
+    Push every change to the fleet as a `text/event-stream`, so dashboards
+    can apply deltas instead of re-polling `/api/devices` and `/api/summary`.
+    
+    Each change is a default (`message`) event with id `<epoch>:<revision>`:
+    - `devices.updated`: `devices: [{id, changes}]`, only the changed fields
+      (nested models only carry their changed keys)
+    - `devices.blocklist`: `ids` plus the blocklist fields `set`, `clear` and
+      `toggle` on each of them (they all get `has_custom_blocklist: true`)
+    - `devices.created`: `devices`, new devices in full (from `POST /api/sightings`)
+    - `summary.repaired`: the full recounted `summary`
+    - `group.created` / `group.updated`: the `group` with its `blocklist`
+      policy, which every device of the group without a custom blocklist now has
+    
+    Events that move devices between summary buckets carry a `summary` delta
+    (`total`, `active`, `by_group`, `by_category`; zero entries omitted).
+    
+    Control events:
+    - `hello`: `{epoch, revision}` sent first
+    - `reset`: the requested revision is no longer buffered, the server
+      restarted, or this client fell too far behind; refetch full state
+      (after `slow_consumer` the stream closes and EventSource reconnects)
+    
+    Reconnecting EventSource clients resume automatically via `Last-Event-ID`.
+    """
+    last_revision, same_epoch = _resume_revision(request.headers.get("last-event-id"), since)
+    feed = device_controller.changes.feed
+    subscriber, backlog = feed.subscribe(asyncio.get_running_loop(), last_revision if same_epoch else None)
+    epoch = device_controller.epoch
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            hello = {"epoch": epoch, "revision": device_controller.revision}
+            yield _sse(json.dumps(hello), event="hello")
+            if backlog is None or not same_epoch:
+                yield _sse(json.dumps({**hello, "reason": "not_buffered" if same_epoch else "epoch_changed"}), event="reset")
+            else:
+                for revision, data in backlog:
+                    yield _sse(data, event_id=f"{epoch}:{revision}")
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), timeout=config.CHANGE_FEED_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is OVERFLOW:
+                    yield _sse(json.dumps({**hello, "revision": device_controller.revision, "reason": "slow_consumer"}), event="reset")
+                    return
+                revision, data = item
+                yield _sse(data, event_id=f"{epoch}:{revision}")
+        finally:
+            feed.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/changes/stats", summary="Change Feed Statistics")
+async def get_change_feed_stats():
+    """
+    Connected subscribers, replay buffer occupancy and how many clients were
+    cut off for falling behind.
+    """
+    return {**device_controller.changes.feed.stats(), "current_revision": device_controller.revision}
+
+
+@router.patch("/devices/bulk", response_model=BulkResult, summary="Bulk Update Devices")
+async def bulk_update_devices(
+    response: Response,
+    bulk_data: BulkDeviceUpdate = Body(..., description="Targets and update data"),
+    durability: str = DURABILITY_QUERY
+):
+    """
+    Apply the same partial update to many devices at once.
+    
+    Target either an explicit `device_ids` list or a `selector`
+    (`group_id`, `category`, `is_active`, combined with AND). The update accepts
+    the same fields as `PATCH /api/devices/{id}`.
+    
+    All changes are persisted together in a single commit. The response
+    reports the outcome per device plus `elapsed_ms` and `devices_per_second`.
+    An unknown `group_id` gets `400` and changes nothing.
+    """
+    try:
+        return await run_in_threadpool(
+            device_controller.bulk.update,
+            bulk_data.update,
+            device_ids=bulk_data.device_ids,
+            selector=bulk_data.selector,
+            durable=_durable(response, durability)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/devices/bulk/actions", response_model=BulkResult, summary="Bulk Device Action")
+async def bulk_device_action(
+    response: Response,
+    action_data: BulkDeviceAction = Body(..., description="Targets and action to perform"),
+    durability: str = DURABILITY_QUERY
+):
+    """
+    Perform `isolate`, `release` or `toggle_block` on many devices at once,
+    e.g. isolate every device in the Guests group with `{"selector": {"group_id": 3}, "action": "isolate"}`.
+    
+    Target either an explicit `device_ids` list or a `selector`
+    (`group_id`, `category`, `is_active`, combined with AND).
+    `toggle_block` flips the category on each device individually.
+    
+    All changes are persisted together in a single commit. The response
+    reports the outcome per device plus `elapsed_ms` and `devices_per_second`;
+    a `toggle_block` of an unknown category changes nothing and reports every
+    device `failed` with the `reason`.
+    """
+    return await run_in_threadpool(
+        device_controller.bulk.action,
+        action_data.action,
+        action_data.category,
+        device_ids=action_data.device_ids,
+        selector=action_data.selector,
+        durable=_durable(response, durability)
+    )
+
+
+@router.post("/sightings", response_model=IngestResult, status_code=202, summary="Ingest Sightings", tags=["ingest"])
+async def ingest_sightings(
+    batch: SightingBatch = Body(..., description="Sightings reported by a scanner"),
+    flush: bool = Query(False, description="Apply everything buffered before responding")
+):
+    """
+    Report devices seen on the network. Each sighting is matched to a
+    device by MAC: a known device becomes active and takes the newer
+    `last_seen`, IP, hostname, OS fields and user agents; an unknown MAC
+    becomes a new device (next free id, default group and its policy,
+    classification `Unknown`).
+    
+    Sightings are buffered and merged per MAC, then applied together every
+    `CHIMERA_INGEST_FLUSH_INTERVAL` seconds, so a device reported many times
+    in that window is one state change and one write. A flush is also
+    triggered by `flush=true` and once `CHIMERA_INGEST_MAX_PENDING` devices
+    are waiting; `flushed` then reports its outcome.
+    
+    Flushes are published on the change feed as `devices.updated` and
+    `devices.created` (the new devices in full).
+    """
+    return await run_in_threadpool(device_controller.sightings.ingest, batch.sightings, flush=flush)
+
+
+@router.get("/sightings/stats", summary="Ingest Statistics", tags=["ingest"])
+async def get_ingest_stats():
+    """
+    Sightings and devices waiting for the next flush, sightings received
+    since startup and flushes performed.
+    """
+    return device_controller.sightings.buffer.stats()
+
+
+@router.post("/classifications/run", summary="Re-classify Due Devices", tags=["classification"])
+async def reclassify_devices(
+    limit: Optional[int] = Query(
+        None,
+        description="Most devices to classify (default: one pass's rate limit, or every due device with the background pass off)",
+        ge=1,
+        le=1000000
+    )
+):
+    """
+    Run a re-classification pass now rather than waiting for the next one
+    (every `CHIMERA_CLASSIFY_INTERVAL` seconds). Devices are due once their
+    classification is older than `CHIMERA_CLASSIFY_MAX_AGE` seconds scaled
+    by its confidence (never sooner than `CHIMERA_CLASSIFY_MIN_AGE`), and
+    new devices at once; the most overdue go first.
+    
+    The rule-based classifier looks at `user_agent`, `os_cpe`, `vendor` and
+    `hostname` and runs in `CHIMERA_CLASSIFY_WORKERS` worker processes. A
+    result never replaces a more confident classification (`kept`); the
+    others are written back (`changed` type or category, or `refreshed`) and
+    published as `devices.updated` events.
+    """
+    return await run_in_threadpool(device_controller.classifier.run, limit)
+
+
+@router.get("/classifications/stats", summary="Re-classification Statistics", tags=["classification"])
+async def get_classification_stats():
+    """
+    Devices queued for re-classification and when the next is due, outcome
+    counts since startup and the last pass's throughput.
+    """
+    return device_controller.classifier.stats()
 
 
 @router.patch("/devices/{device_id}", response_model=Device, summary="Update Device")
 async def update_device(
+    response: Response,
     device_id: int = Path(..., description="Device ID to update", ge=1), 
-    update_data: DeviceUpdate = Body(..., description="Device update data")
+    update_data: DeviceUpdate = Body(..., description="Device update data"),
+    durability: str = DURABILITY_QUERY
 ):
     """
     Update device properties with partial data.
     
     **Allowed updates:**
     - `given_name`: Custom name for the device
-    - `group_id`: Change device group (server fills group.name and is_default)
+    - `group_id`: Change device group (server fills group.name and is_default;
+      an unknown group gets `400`)
     - Any `blocklist.*` boolean field
+    - `has_custom_blocklist: false`: drop the device's own blocklist and follow
+      its group's policy again
     
-    **Note:** Updating any blocklist field automatically sets `has_custom_blocklist = true`
+    **Note:** Updating any blocklist field automatically sets `has_custom_blocklist = true`.
+    Devices without a custom blocklist have their group's policy (see `/api/groups`).
+    
+    **Durability:** by default the response is sent once the change is on disk;
+    `?durability=applied` responds as soon as it is visible to readers and
+    persists it in the background. `X-Durability` reports the mode used.
     """
-    device = device_controller.update_device(device_id, update_data)
+    try:
+        device = await run_in_threadpool(
+            device_controller.update_device,
+            device_id,
+            update_data,
+            durable=_durable(response, durability)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
     return device
@@ -60,8 +766,10 @@ async def update_device(
 
 @router.post("/devices/{device_id}/actions", response_model=Device, summary="Perform Device Action")
 async def perform_device_action(
+    response: Response,
     device_id: int = Path(..., description="Device ID to perform action on", ge=1), 
-    action_data: DeviceAction = Body(..., description="Action to perform")
+    action_data: DeviceAction = Body(..., description="Action to perform"),
+    durability: str = DURABILITY_QUERY
 ):
     """
     Perform actions on devices to manage their blocklist settings.
@@ -87,10 +795,22 @@ async def perform_device_action(
     
     **Validation:**
     - Action must be one of: isolate, release, toggle_block
-    - Category is required when action is toggle_block
+    - Category is required when action is toggle_block, and must be a
+      blocklist field (`400` otherwise)
     - Pydantic automatically validates the request body
+    
+    Accepts the same `durability` parameter as `PATCH /api/devices/{id}`.
     """
-    device = device_controller.perform_device_action(device_id, action_data.action, action_data.category)
+    try:
+        device = await run_in_threadpool(
+            device_controller.perform_device_action,
+            device_id,
+            action_data.action,
+            action_data.category,
+            durable=_durable(response, durability)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
     
@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from app import config
+from app.routes.device_routes import device_controller, response_cache
+from app.utils.metrics import REGISTRY
+from app.utils.profiler import SamplingProfiler
+from typing import Optional
+
+router = APIRouter(tags=["metrics"])
+
+profiler = SamplingProfiler(interval=config.PROFILER_INTERVAL)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY.gauge(
+    "chimera_fleet_devices",
+    "Devices in the store",
+    function=lambda: device_controller.count_devices()
+)
+REGISTRY.gauge(
+    "chimera_revision",
+    "Current data revision",
+    function=lambda: device_controller.revision
+)
+REGISTRY.gauge(
+    "chimera_response_cache_hit_ratio",
+    "Share of /api/devices and /api/summary renders served from the response cache",
+    function=lambda: response_cache.stats()["hit_ratio"]
+)
+REGISTRY.gauge(
+    "chimera_response_cache_bytes",
+    "Bytes held by the response cache",
+    function=lambda: response_cache.stats()["bytes"]
+)
+REGISTRY.gauge(
+    "chimera_change_feed_subscribers",
+    "Open /api/changes/stream connections",
+    function=lambda: device_controller.changes.feed.stats()["subscribers"]
+)
+REGISTRY.gauge(
+    "chimera_ingest_pending_devices",
+    "Devices with sightings waiting for the next ingest flush",
+    function=lambda: len(device_controller.sightings.buffer)
+)
+REGISTRY.gauge(
+    "chimera_idle_timers",
+    "Active devices with a pending idle-expiry timer",
+    function=lambda: len(device_controller.expiry.timers)
+)
+REGISTRY.gauge(
+    "chimera_classify_queued_devices",
+    "Devices in the re-classification queue",
+    function=lambda: len(device_controller.classifier.due)
+)
+REGISTRY.gauge(
+    "chimera_profiler_samples",
+    "Samples taken by the sampling profiler since it was last reset",
+    function=lambda: profiler.samples
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Prometheus Metrics")
+async def get_metrics():
+    """
+    Metrics in the Prometheus text format:
+    
+    - `chimera_http_request_duration_seconds{method,route}`: latency histogram per route template
+    - `chimera_http_requests_total{method,route,status}` and `chimera_http_requests_in_flight{method}`
+    - `chimera_persistence_write_duration_seconds{kind}` / `chimera_persistence_written_bytes_total{kind}`:
+      journal batches (incl. fsync), snapshots and SQLite commits
+    - `chimera_load_duration_seconds`, `chimera_fleet_devices`, `chimera_revision`
+    - `chimera_response_cache_hit_ratio`, `chimera_change_feed_subscribers`
+    - `chimera_ingest_sightings_total`, `chimera_ingest_flushed_devices_total{result}`,
+      `chimera_ingest_flush_duration_seconds`, `chimera_ingest_pending_devices`
+    - `chimera_idle_expired_devices_total`, `chimera_idle_timers`
+    - `chimera_classified_devices_total{result}`, `chimera_classify_batch_duration_seconds`,
+      `chimera_classify_devices_per_second`, `chimera_classify_queued_devices`
+    
+    Request metrics are collected only when `CHIMERA_METRICS` is on (the default).
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/metrics/profiler", response_class=PlainTextResponse, summary="Profiler Samples")
+async def get_profile(limit: Optional[int] = Query(None, description="Only the most frequent stacks", ge=1)):
+    """
+    Stacks sampled by the profiler in collapsed format (`thread;outer;...;inner count`),
+    most frequent first. Feed it to flamegraph.pl or speedscope.
+    """
+    return PlainTextResponse(profiler.collapsed(limit))
+
+
+@router.post("/metrics/profiler/start", summary="Start Profiler")
+async def start_profiler(
+    interval: Optional[float] = Query(None, description="Seconds between samples", gt=0, le=1),
+    reset: bool = Query(False, description="Discard the samples collected so far")
+):
+    """
+    Start sampling every thread's stack. Costs one stack walk per thread per
+    sample while running and nothing while stopped.
+    """
+    if reset:
+        profiler.reset()
+    profiler.start(interval)
+    return profiler.stats()
+
+
+@router.post("/metrics/profiler/stop", summary="Stop Profiler")
+async def stop_profiler():
+    """Stop sampling; the samples stay available until the next reset."""
+    profiler.stop()
+    return profiler.stats()
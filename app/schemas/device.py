@@ -1,3 +1,7 @@
+import ipaddress
+import re
+import string
+from datetime import datetime, timezone
 from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import List, Optional
 
@@ -54,6 +58,85 @@ class Blocklist(BaseModel):
     }
 
 
+class GroupPolicy(Group):
+    blocklist: Blocklist = Field(default=..., description="Blocklist followed by every device of the group without a custom blocklist")
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "id": 4,
+                "name": "IoT",
+                "is_default": False,
+                "blocklist": {
+                    "ads_trackers": True,
+                    "gambling": False,
+                    "social_media": True,
+                    "porn": False,
+                    "gaming": True,
+                    "streaming": False,
+                    "facebook": True,
+                    "instagram": True,
+                    "tiktok": True,
+                    "netflix": False,
+                    "youtube": False,
+                    "ai": True,
+                    "safesearch": False
+                }
+            }
+        }
+    }
+
+
+class GroupCreate(BaseModel):
+    name: str = Field(default=..., description="Display name of the group", examples=["Printers"], min_length=1, max_length=100)
+    blocklist: Optional[Blocklist] = Field(default=None, description="Initial policy (defaults to the default group's)")
+
+    @field_validator('name')
+    def validate_name(cls, v):
+        if v.strip() == "":
+            raise ValueError('name cannot be empty or whitespace only')
+        return v.strip()
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "name": "Printers"
+            }
+        }
+    }
+
+
+class GroupUpdate(BaseModel):
+    name: Optional[str] = Field(default=None, description="New display name", examples=["Smart Home"], min_length=1, max_length=100)
+    ads_trackers: Optional[bool] = Field(default=None, description="Block ads and trackers", examples=[True])
+    gambling: Optional[bool] = Field(default=None, description="Block gambling sites", examples=[True])
+    social_media: Optional[bool] = Field(default=None, description="Block social media sites", examples=[False])
+    porn: Optional[bool] = Field(default=None, description="Block adult content", examples=[True])
+    gaming: Optional[bool] = Field(default=None, description="Block gaming sites", examples=[False])
+    streaming: Optional[bool] = Field(default=None, description="Block streaming sites", examples=[False])
+    facebook: Optional[bool] = Field(default=None, description="Block Facebook", examples=[False])
+    instagram: Optional[bool] = Field(default=None, description="Block Instagram", examples=[False])
+    tiktok: Optional[bool] = Field(default=None, description="Block TikTok", examples=[False])
+    netflix: Optional[bool] = Field(default=None, description="Block Netflix", examples=[False])
+    youtube: Optional[bool] = Field(default=None, description="Block YouTube", examples=[False])
+    ai: Optional[bool] = Field(default=None, description="Block AI services", examples=[False])
+    safesearch: Optional[bool] = Field(default=None, description="Enable safe search", examples=[True])
+
+    @field_validator('name')
+    def validate_name(cls, v):
+        if v is not None and v.strip() == "":
+            raise ValueError('name cannot be empty or whitespace only')
+        return v.strip() if v is not None else v
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "streaming": True,
+                "youtube": True
+            }
+        }
+    }
+
 class AIClassification(BaseModel):
     device_type: str = Field(default=..., description="Type of device as classified by AI", examples=["Gateway"])
     device_category: str = Field(default=..., description="Category of device", examples=["Network Infrastructure"])
@@ -163,10 +246,14 @@ class DeviceUpdate(BaseModel):
     )
     group_id: Optional[int] = Field(
         default=None,
-        description="ID of the group to assign the device to (1-4)",
+        description="ID of the group to assign the device to (see /api/groups)",
         examples=[2],
-        ge=1,
-        le=4
+        ge=1
+    )
+    has_custom_blocklist: Optional[bool] = Field(
+        default=None,
+        description="false drops the device's own blocklist so it follows its group's policy again",
+        examples=[False]
     )
     ads_trackers: Optional[bool] = Field(default=None, description="Block ads and trackers", examples=[True])
     gambling: Optional[bool] = Field(default=None, description="Block gambling sites", examples=[True])
@@ -188,6 +275,12 @@ class DeviceUpdate(BaseModel):
             raise ValueError('given_name cannot be empty or whitespace only')
         return v
 
+    @model_validator(mode='after')
+    def validate_inherit(self):
+        if self.has_custom_blocklist is False and any(getattr(self, field) is not None for field in Blocklist.model_fields):
+            raise ValueError('blocklist fields cannot be set together with has_custom_blocklist=false')
+        return self
+
     model_config = {
         "json_schema_extra": {
             "example": {
@@ -229,6 +322,78 @@ class DeviceAction(BaseModel):
     }
 
 
+class DeviceSelector(BaseModel):
+    group_id: Optional[int] = Field(default=None, description="Devices in this group", examples=[3], ge=1)
+    category: Optional[str] = Field(default=None, description="Devices with this AI classification category", examples=["IoT"])
+    is_active: Optional[bool] = Field(default=None, description="Active (true) or inactive (false) devices", examples=[True])
+
+    @model_validator(mode='after')
+    def validate_not_empty(self):
+        if self.group_id is None and self.category is None and self.is_active is None:
+            raise ValueError('selector needs at least one of group_id, category or is_active')
+        return self
+
+
+class BulkTarget(BaseModel):
+    device_ids: Optional[List[int]] = Field(
+        default=None,
+        description="Devices to change (provide either device_ids or selector)",
+        examples=[[3, 6, 9]],
+        min_length=1,
+        max_length=100000
+    )
+    selector: Optional[DeviceSelector] = Field(
+        default=None,
+        description="Change every device matching this selector (provide either device_ids or selector)"
+    )
+
+    @model_validator(mode='after')
+    def validate_one_target(self):
+        if (self.device_ids is None) == (self.selector is None):
+            raise ValueError('provide exactly one of device_ids or selector')
+        return self
+
+
+class BulkDeviceAction(DeviceAction, BulkTarget):
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "selector": {"group_id": 3},
+                "action": "isolate",
+                "category": None
+            }
+        }
+    }
+
+
+class BulkDeviceUpdate(BulkTarget):
+    update: DeviceUpdate = Field(default=..., description="Fields to apply to every target device")
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "device_ids": [3, 6, 9],
+                "update": {"group_id": 3, "social_media": True}
+            }
+        }
+    }
+
+
+class BulkItemResult(BaseModel):
+    id: int = Field(default=..., description="Device ID", examples=[3])
+    status: str = Field(default=..., description="updated, failed or not_found", examples=["updated"])
+    reason: Optional[str] = Field(default=None, description="Why the change could not be applied (failed only)", examples=[None])
+
+
+class BulkResult(BaseModel):
+    updated: int = Field(default=..., description="Number of devices changed", examples=[120])
+    failed: int = Field(default=0, description="Number of devices the change could not be applied to (see each result's reason)", examples=[0])
+    not_found: int = Field(default=..., description="Number of requested ids that do not exist", examples=[0])
+    elapsed_ms: float = Field(default=..., description="Server-side time to apply and persist the batch", examples=[4.2])
+    devices_per_second: float = Field(default=..., description="Devices applied per second of elapsed_ms", examples=[28571.4])
+    results: List[BulkItemResult] = Field(default=..., description="Per-device outcome")
+
+
 class Summary(BaseModel):
     total: int = Field(default=..., description="Total number of devices", examples=[10])
     active: int = Field(default=..., description="Number of active devices", examples=[8])
@@ -256,3 +421,140 @@ class Summary(BaseModel):
             }
         }
     }
+
+
+class Sighting(BaseModel):
+    mac: str = Field(default=..., description="MAC address the device was seen with", examples=["3C:22:FB:12:34:56"])
+    ip: Optional[str] = Field(default=None, description="IP address it used", examples=["192.168.69.42"])
+    hostname: Optional[str] = Field(default=None, description="Hostname it announced (DHCP, mDNS...)", examples=["macbook-pro"], max_length=253)
+    user_agent: Optional[str] = Field(default=None, description="User agent string observed", examples=["Safari/17.5"], max_length=500)
+    os_name: Optional[str] = Field(default=None, description="Operating system name", examples=["macOS 14.5"])
+    os_accuracy: Optional[int] = Field(default=None, description="Accuracy of OS detection (0-100)", examples=[92], ge=0, le=100)
+    os_type: Optional[str] = Field(default=None, description="Type of operating system", examples=["general purpose"])
+    os_vendor: Optional[str] = Field(default=None, description="Vendor of the operating system", examples=["Apple"])
+    os_family: Optional[str] = Field(default=None, description="Family of the operating system", examples=["macOS"])
+    os_gen: Optional[str] = Field(default=None, description="Generation of the operating system", examples=["14.X"])
+    os_cpe: Optional[List[str]] = Field(default=None, description="CPE identifiers for the OS", examples=[["cpe:/o:apple:macos:14"]])
+    timestamp: Optional[datetime] = Field(default=None, description="When it was seen (defaults to when the server received it)", examples=["2025-08-30T01:22:45.902311"])
+
+    @field_validator('mac')
+    def validate_mac(cls, v):
+        digits = re.sub(r"[\s:.-]", "", v)
+        if len(digits) != 12 or not all(char in string.hexdigits for char in digits):
+            raise ValueError('mac must be a MAC address of 12 hex digits')
+        return ":".join(digits[i:i + 2] for i in range(0, 12, 2)).upper()
+
+    @field_validator('ip')
+    def validate_ip(cls, v):
+        if v is not None:
+            try:
+                return str(ipaddress.ip_address(v.strip()))
+            except ValueError:
+                raise ValueError('ip must be an IP address')
+        return v
+
+    @field_validator('timestamp')
+    def validate_timestamp(cls, v):
+        # Stored timestamps are naive UTC
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "mac": "3C:22:FB:12:34:56",
+                "ip": "192.168.69.42",
+                "hostname": "macbook-pro",
+                "user_agent": "Safari/17.5",
+                "os_name": "macOS 14.5",
+                "timestamp": "2025-08-30T01:22:45.902311"
+            }
+        }
+    }
+
+
+class SightingBatch(BaseModel):
+    sightings: List[Sighting] = Field(default=..., description="Sightings in any order; several may name the same MAC", min_length=1, max_length=100000)
+
+
+class IngestFlush(BaseModel):
+    devices: int = Field(default=..., description="Distinct devices the flushed sightings named", examples=[120])
+    sightings: int = Field(default=..., description="Sightings merged into them", examples=[4800])
+    created: int = Field(default=..., description="New devices", examples=[3])
+    updated: int = Field(default=..., description="Existing devices that changed", examples=[110])
+    unchanged: int = Field(default=..., description="Existing devices the sightings told nothing new about", examples=[7])
+    elapsed_ms: float = Field(default=..., description="Time to apply and persist the flush", examples=[12.5])
+
+
+class IngestResult(BaseModel):
+    accepted: int = Field(default=..., description="Sightings accepted from this batch", examples=[500])
+    pending: int = Field(default=..., description="Devices waiting for the next flush", examples=[120])
+    flushed: Optional[IngestFlush] = Field(default=None, description="Outcome of the flush this request triggered, if any")
+
+
+class DeviceSearch(BaseModel):
+    q: Optional[str] = Field(default=None, description="Words matched against hostname, given name, vendor, OS name and AI indicators", examples=["macbook"], max_length=200)
+    mac: Optional[str] = Field(default=None, description="MAC address prefix, e.g. an OUI", examples=["3C:22:FB"])
+    ip: Optional[str] = Field(default=None, description="IP address or CIDR network", examples=["192.168.69.0/24"])
+    group_id: Optional[int] = Field(default=None, description="Only devices in this group", examples=[2], ge=1)
+    category: Optional[str] = Field(default=None, description="Only devices with this AI classification category", examples=["IoT"])
+    is_active: Optional[bool] = Field(default=None, description="Only active (true) or inactive (false) devices", examples=[True])
+    limit: int = Field(default=50, description="Page size", examples=[20], ge=1, le=1000)
+    cursor: Optional[str] = Field(default=None, description="Opaque cursor from a previous page's X-Next-Cursor header")
+
+    @field_validator('mac')
+    def validate_mac(cls, v):
+        if v is not None:
+            digits = re.sub(r"[\s:.-]", "", v)
+            if not digits or len(digits) > 12 or not all(char in string.hexdigits for char in digits):
+                raise ValueError('mac must be a MAC address prefix of up to 12 hex digits')
+        return v
+
+    @field_validator('ip')
+    def validate_ip(cls, v):
+        if v is not None:
+            try:
+                ipaddress.ip_network(v.strip(), strict=False)
+            except ValueError:
+                raise ValueError('ip must be an IP address or CIDR network')
+        return v
+
+    @model_validator(mode='after')
+    def validate_not_empty(self):
+        if not (self.q or "").split() and self.mac is None and self.ip is None:
+            raise ValueError('search needs at least one of q, mac or ip')
+        return self
+
+
+class DeviceQuery(BaseModel):
+    group_id: Optional[int] = Field(default=None, description="Only devices in this group", examples=[2], ge=1)
+    category: Optional[str] = Field(default=None, description="Only devices with this AI classification category", examples=["IoT"])
+    is_active: Optional[bool] = Field(default=None, description="Only active (true) or inactive (false) devices", examples=[True])
+    vendor: Optional[str] = Field(default=None, description="Only devices from this vendor (case-insensitive)", examples=["Apple"])
+    has_custom_blocklist: Optional[bool] = Field(default=None, description="Only devices with (true) or without (false) a custom blocklist", examples=[True])
+    blocked: List[str] = Field(default=[], description="Blocklist fields that must be enabled", examples=[["tiktok"]])
+    allowed: List[str] = Field(default=[], description="Blocklist fields that must be disabled", examples=[["ads_trackers"]])
+    sort: str = Field(
+        default="id",
+        description="Sort key, prefix with '-' for descending",
+        examples=["-last_seen"],
+        pattern="^-?(id|hostname|given_name|vendor|ip|last_seen)$"
+    )
+    limit: Optional[int] = Field(default=None, description="Page size (omit to return every match)", examples=[100], ge=1, le=1000)
+    cursor: Optional[str] = Field(default=None, description="Opaque cursor from a previous page's X-Next-Cursor header")
+
+    @field_validator('blocked', 'allowed')
+    def validate_blocklist_fields(cls, v):
+        unknown = [field for field in v if field not in Blocklist.model_fields]
+        if unknown:
+            raise ValueError(f"unknown blocklist field(s): {', '.join(unknown)}")
+        return v
+
+    @property
+    def sort_key(self) -> str:
+        return self.sort.lstrip("-")
+
+    @property
+    def descending(self) -> bool:
+        return self.sort.startswith("-")
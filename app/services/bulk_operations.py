@@ -0,0 +1,162 @@
+import time
+from typing import Callable, ContextManager, Dict, List, Optional, Tuple
+from app.schemas.device import Device, DeviceSelector, DeviceUpdate
+from app.services.events import devices_event
+from app.storage.blocklist_bits import BLOCKLIST_FIELDS, BlocklistChange, mask_to_fields
+from app.storage.repository import DeviceRepository
+
+
+class BulkOperations:
+    """
+    Updates and actions applied to many devices at once, named by id or by
+    a selector. Each is one mutation: one commit and one change event
+    however many devices it touches. ``apply_update`` and ``apply_action``
+    edit a single device in place, as for the single-device endpoints.
+    """
+
+    def __init__(
+        self,
+        repository: DeviceRepository,
+        mutation: Callable[..., ContextManager[None]],
+        record_change: Callable[[Dict], int],
+        apply_update: Callable[[Device, DeviceUpdate], None],
+        apply_action: Callable[[Device, str, Optional[str]], Optional[str]]
+    ):
+        self.repository = repository
+        self.mutation = mutation
+        self.record_change = record_change
+        self.apply_update = apply_update
+        self.apply_action = apply_action
+
+    def update(
+        self,
+        update_data: DeviceUpdate,
+        device_ids: Optional[List[int]] = None,
+        selector: Optional[DeviceSelector] = None,
+        durable: bool = True
+    ) -> Dict:
+        started = time.perf_counter()
+        blocklist_values = {
+            field: getattr(update_data, field)
+            for field in BLOCKLIST_FIELDS
+            if getattr(update_data, field) is not None
+        }
+        with self.mutation(self._lock_ids(device_ids, selector), durable):
+            target_ids = self._target_ids(device_ids, selector)
+            if (
+                blocklist_values
+                and update_data.given_name is None
+                and update_data.group_id is None
+                and update_data.has_custom_blocklist is None
+            ):
+                updated_ids, failed = self._blocklist(target_ids, BlocklistChange.for_fields(blocklist_values)), {}
+            else:
+                updated_ids, failed = self.apply(target_ids, lambda device: self.apply_update(device, update_data))
+        return self._result(target_ids, updated_ids, started, failed)
+
+    def action(
+        self,
+        action: str,
+        category: Optional[str] = None,
+        device_ids: Optional[List[int]] = None,
+        selector: Optional[DeviceSelector] = None,
+        durable: bool = True
+    ) -> Dict:
+        started = time.perf_counter()
+        change = BlocklistChange.for_action(action, category)
+        with self.mutation(self._lock_ids(device_ids, selector), durable):
+            target_ids = self._target_ids(device_ids, selector)
+            if change is not None:
+                updated_ids, failed = self._blocklist(target_ids, change), {}
+            else:
+                updated_ids, failed = self.apply(target_ids, lambda device: self.apply_action(device, action, category))
+        return self._result(target_ids, updated_ids, started, failed)
+
+    def apply(
+        self,
+        target_ids: List[int],
+        mutate: Callable[[Device], Optional[str]]
+    ) -> Tuple[List[int], Dict[int, str]]:
+        """
+        Apply ``mutate`` to copies of every target, then swap all of them in
+        with a single ``save_many`` (one journal record / one transaction).
+        A device ``mutate`` returns a reason for is left alone and reported
+        failed with it. Returns the ids updated and the failures. Must run
+        inside a mutation holding the targets.
+        """
+        changed = []
+        failed: Dict[int, str] = {}
+        for device_id in target_ids:
+            device = self.repository.get(device_id)
+            if device:
+                before = device.model_dump()
+                device = device.model_copy(deep=True)
+                reason = mutate(device)
+                if reason is not None:
+                    failed[device_id] = reason
+                    continue
+                changed.append((before, device))
+        if changed:
+            self.repository.save_many([device for _, device in changed])
+            self.record_change(devices_event(changed))
+        return [device.id for _, device in changed], failed
+
+    def _target_ids(self, device_ids: Optional[List[int]], selector: Optional[DeviceSelector]) -> List[int]:
+        if selector is not None:
+            return self.repository.match_ids(
+                group_id=selector.group_id,
+                category=selector.category,
+                is_active=selector.is_active
+            )
+        return list(dict.fromkeys(device_ids))
+
+    @staticmethod
+    def _lock_ids(device_ids: Optional[List[int]], selector: Optional[DeviceSelector]) -> Optional[List[int]]:
+        # A selector is resolved inside the transaction, so lock every device
+        if selector is not None:
+            return None
+        return device_ids
+
+    def _blocklist(self, target_ids: List[int], change: BlocklistChange) -> List[int]:
+        """
+        Blocklist-only edits are a single vectorized repository operation,
+        published as one event naming the fields set/cleared/toggled on
+        every listed device (each of which now has a custom blocklist).
+        """
+        updated_ids = self.repository.apply_blocklist(target_ids, change)
+        if updated_ids:
+            self.record_change({
+                "type": "devices.blocklist",
+                "ids": updated_ids,
+                "set": mask_to_fields(change.set_mask),
+                "clear": mask_to_fields(change.clear_mask),
+                "toggle": mask_to_fields(change.toggle_mask)
+            })
+        return updated_ids
+
+    @staticmethod
+    def _result(
+        target_ids: List[int],
+        updated_ids: List[int],
+        started: float,
+        failed: Optional[Dict[int, str]] = None
+    ) -> Dict:
+        elapsed = time.perf_counter() - started
+        updated = set(updated_ids)
+        failed = failed or {}
+        results = []
+        for device_id in target_ids:
+            if device_id in updated:
+                results.append({"id": device_id, "status": "updated"})
+            elif device_id in failed:
+                results.append({"id": device_id, "status": "failed", "reason": failed[device_id]})
+            else:
+                results.append({"id": device_id, "status": "not_found"})
+        return {
+            "updated": len(updated),
+            "failed": len(failed),
+            "not_found": len(target_ids) - len(updated) - len(failed),
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "devices_per_second": round(len(updated) / elapsed, 1) if elapsed > 0 else 0.0,
+            "results": results
+        }
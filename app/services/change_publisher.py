@@ -0,0 +1,75 @@
+import threading
+from typing import Callable, Dict, Optional
+from app import config
+from app.storage.repository import DeviceRepository
+from app.utils.change_feed import ChangeFeed
+
+
+class ChangePublisher:
+    """
+    Publishes the repository's change events to ``feed`` in revision order.
+    In-process backends publish each event as it is recorded; shared ones
+    publish from their change log after commit, which also picks up the
+    commits of other processes (polled every ``CHANGE_POLL_INTERVAL``
+    seconds). ``on_publish`` is called after every publication.
+    """
+
+    def __init__(self, repository: DeviceRepository, on_publish: Callable[[], None] = lambda: None):
+        self.repository = repository
+        self.on_publish = on_publish
+        self.feed = ChangeFeed(config.CHANGE_FEED_BUFFER, config.CHANGE_FEED_MAX_QUEUE)
+        self._published_revision = 0
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """Continue from the loaded repository's revision."""
+        self._published_revision = self.repository.revision()
+        self.feed.head = max(self.feed.head, self._published_revision)
+        if self.repository.shared and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="change-watcher", daemon=True)
+            self._watcher.start()
+
+    def close(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def record(self, event: Dict) -> int:
+        """
+        Stamp ``event`` with the next revision. In-process backends publish
+        it right away, under the publish lock so the feed stays in revision
+        order; shared ones publish from their change log after commit.
+        """
+        if self.repository.shared:
+            return self.repository.record_change(event)
+        with self._lock:
+            revision = self.repository.record_change(event)
+            self.feed.publish(revision, event)
+        self.on_publish()
+        return revision
+
+    def sync(self):
+        """Publish every change committed (by any process) since the last one published."""
+        with self._lock:
+            while True:
+                changes = self.repository.changes_since(self._published_revision)
+                if not changes:
+                    return
+                if changes[0][0] > self._published_revision + 1:
+                    print(f"Warning: change log no longer holds revisions {self._published_revision + 1}-{changes[0][0] - 1}")
+                for revision, data in changes:
+                    self.feed.publish_json(revision, data)
+                self._published_revision = changes[-1][0]
+                self.on_publish()
+
+    def _watch(self):
+        """Pick up commits made by other processes sharing the repository."""
+        while not self._stop.wait(config.CHANGE_POLL_INTERVAL):
+            try:
+                if self.repository.revision() > self._published_revision:
+                    self.sync()
+            except Exception as e:
+                print(f"Error reading change log: {e}")
@@ -0,0 +1,258 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Tuple
+from app import config
+from app.schemas.device import AIClassification, Device
+from app.storage.repository import DeviceRepository
+from app.utils.change_feed import summary_delta
+from app.utils.classifier import classify_batch, features
+from app.utils.deadlines import DeadlineHeap, epoch_seconds
+from app.utils.metrics import CLASSIFY_BATCH_SECONDS, CLASSIFY_THROUGHPUT, DEVICES_CLASSIFIED
+
+
+class Reclassifier:
+    """
+    Re-classifies devices as their classifications age: confident ones
+    less often. Devices wait in ``due`` by the time their classification
+    is due again; a background pass every ``CLASSIFY_INTERVAL`` seconds
+    works through them at the configured rate.
+
+    With ``CLASSIFY_WORKERS`` set, the classifier's processes are forked
+    here, so a reclassifier must be made before anything starts a thread.
+    """
+
+    def __init__(
+        self,
+        repository: DeviceRepository,
+        mutation: Callable[..., ContextManager[None]],
+        record_change: Callable[[Dict], int]
+    ):
+        self.repository = repository
+        self.mutation = mutation
+        self.record_change = record_change
+        self.due = DeadlineHeap()
+        # Whether due holds every device (filled at load with the background
+        # pass on, otherwise by the first pass run on demand)
+        self._queued = False
+        self._lock = threading.Lock()
+        self._pool: Optional[Executor] = None
+        self._classifier: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stats = {"passes": 0, "classified": 0, "changed": 0, "refreshed": 0, "kept": 0, "last_pass": None}
+        if config.CLASSIFY_WORKERS > 0:
+            self._pool = self._fork_workers()
+
+    def start(self):
+        """Queue the loaded repository's devices, if classifying in the background."""
+        self.due.clear()
+        self._queued = False
+        if config.CLASSIFY_INTERVAL > 0:
+            self._queue()
+            if self._classifier is None:
+                self._classifier = threading.Thread(target=self._reclassify_periodically, name="classifier", daemon=True)
+                self._classifier.start()
+
+    def close(self):
+        self._stop.set()
+        if self._classifier is not None:
+            self._classifier.join()
+            self._classifier = None
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def schedule_new(self, device_ids: Iterable[int]):
+        """Classify new devices on the next pass (once the queue holds every device)."""
+        if self._queued:
+            self.due.schedule_many([(device_id, 0.0) for device_id in device_ids])
+
+    def run(self, limit: Optional[int] = None, now: Optional[float] = None) -> Dict:
+        """
+        Run the devices whose classification is due by ``now`` (epoch
+        seconds, default the current time) through the rule-based
+        classifier, most overdue first: at most ``limit`` of them (default
+        what ``CLASSIFY_RATE`` allows per ``CLASSIFY_INTERVAL``), in batches
+        of ``CLASSIFY_BATCH`` with at most ``CLASSIFY_WORKERS`` in flight.
+        Each batch is written back as it completes, one commit and one
+        ``devices.updated`` event each. Returns the outcome of the pass.
+
+        Without the background pass, the first call queues every device
+        and the default ``limit`` is every device due.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self._queued:
+                self._queue()
+            if limit is None:
+                if config.CLASSIFY_RATE > 0 and config.CLASSIFY_INTERVAL > 0:
+                    limit = max(1, int(config.CLASSIFY_RATE * config.CLASSIFY_INTERVAL))
+                else:
+                    limit = len(self.due)
+            started = time.perf_counter()
+            due = self.due.pop_due(now, limit)
+            outcomes = {"changed": 0, "refreshed": 0, "kept": 0}
+            pool = self._workers()
+            in_flight: Dict[Future, Tuple[List[int], float]] = {}
+            for start in range(0, len(due), config.CLASSIFY_BATCH):
+                batch = due[start:start + config.CLASSIFY_BATCH]
+                while len(in_flight) >= max(config.CLASSIFY_WORKERS, 1):
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._finish(future, *in_flight.pop(future), outcomes)
+                in_flight[pool.submit(classify_batch, self._features(batch))] = (batch, time.perf_counter())
+            for future in list(in_flight):
+                self._finish(future, *in_flight.pop(future), outcomes)
+            elapsed = time.perf_counter() - started
+            classified = sum(outcomes.values())
+            stats = self._stats
+            if due:
+                stats["passes"] += 1
+                stats["classified"] += classified
+                for outcome, count in outcomes.items():
+                    stats[outcome] += count
+                    DEVICES_CLASSIFIED.labels(outcome).inc(count)
+                stats["last_pass"] = {
+                    "devices": classified,
+                    "elapsed_ms": round(elapsed * 1000, 3),
+                    "devices_per_second": round(classified / elapsed, 1) if elapsed else 0.0
+                }
+                CLASSIFY_THROUGHPUT.set(stats["last_pass"]["devices_per_second"])
+        return dict(outcomes, devices=classified, elapsed_ms=round(elapsed * 1000, 3))
+
+    def stats(self) -> Dict:
+        queue = self.due.stats()
+        return dict(self._stats, scheduled=queue["scheduled"], next_due=queue["next_deadline"])
+
+    def _reclassify_periodically(self):
+        while not self._stop.wait(config.CLASSIFY_INTERVAL):
+            try:
+                self.run()
+            except Exception as e:
+                print(f"Error re-classifying devices: {e}")
+
+    def _queue(self):
+        """Schedule every device for re-classification when its stored classification is due."""
+        self.due.clear()
+        self.due.schedule_many([
+            (device_id, self._deadline(last_classified, confidence))
+            for device_id, last_classified, confidence in self.repository.classification_ages()
+        ])
+        self._queued = True
+
+    @staticmethod
+    def _fork_workers() -> Executor:
+        """
+        ``CLASSIFY_WORKERS`` classifier processes. Only called from the
+        constructor, before loading starts any thread: forked then, they
+        inherit no lock another thread holds, nor do they re-import the app
+        the way spawned workers would.
+        """
+        context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+        pool = ProcessPoolExecutor(config.CLASSIFY_WORKERS, mp_context=context)
+        # Forks every worker now rather than on the first pass
+        pool.submit(classify_batch, []).result()
+        return pool
+
+    def _workers(self) -> Executor:
+        """
+        The classifier's workers. Without worker processes (none configured,
+        or the pool broke and the now multi-threaded process must not fork
+        again), classification runs on a thread.
+        """
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(1, thread_name_prefix="classifier")
+        return self._pool
+
+    def _features(self, device_ids: List[int]) -> List[Tuple[int, Dict[str, str]]]:
+        batch = []
+        for device_id in device_ids:
+            device = self.repository.get(device_id)
+            if device is not None:
+                batch.append((device_id, features(device.vendor, device.hostname, device.user_agent, device.os_cpe)))
+        return batch
+
+    def _finish(self, future: Future, device_ids: List[int], submitted: float, outcomes: Dict[str, int]):
+        try:
+            results = future.result()
+        except Exception as e:
+            print(f"Error classifying devices: {e}")
+            if isinstance(e, BrokenProcessPool):
+                print("Warning: classifier worker processes died; classifying on a thread from now on")
+                self._pool = None
+            # Retried on a later pass rather than dropped from the queue
+            self.due.schedule_many([(device_id, time.time() + config.CLASSIFY_MIN_AGE) for device_id in device_ids])
+            return
+        self._write(results, outcomes)
+        CLASSIFY_BATCH_SECONDS.observe(time.perf_counter() - submitted)
+
+    def _write(self, results: List[Tuple[int, Dict]], outcomes: Dict[str, int]):
+        """
+        Write classifier results back. A result never replaces a more
+        confident classification (one from an earlier, richer model, say):
+        the device keeps it and is only rescheduled. The rest get the new
+        classification and ``last_classified``; devices changing category
+        move between the summary's ``by_category`` counters incrementally,
+        through the event's delta and the repository's counters.
+        """
+        now = time.time()
+        classified_at = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+        classified: List[Tuple[str, Device, Dict]] = []
+        deadlines = []
+        # A classification is derived from the device, so it need not wait for disk
+        with self.mutation([device_id for device_id, _ in results], durable=False):
+            for device_id, result in results:
+                device = self.repository.get(device_id)
+                if device is None:
+                    continue
+                current = device.ai_classification
+                if result["confidence"] < current.confidence:
+                    outcomes["kept"] += 1
+                    deadlines.append((device_id, now + self._delay(current.confidence)))
+                    continue
+                classification = AIClassification(**result, last_classified=classified_at)
+                same = (current.device_type, current.device_category) == (classification.device_type, classification.device_category)
+                outcomes["refreshed" if same else "changed"] += 1
+                device = device.model_copy(update={"ai_classification": classification})
+                classified.append((current.device_category, device, {"ai_classification": classification.model_dump()}))
+                deadlines.append((device_id, now + self._delay(classification.confidence)))
+            if classified:
+                self.repository.save_many([device for _, device, _ in classified])
+                self.record_change(self._classified_event(classified))
+        self.due.schedule_many(deadlines)
+
+    @staticmethod
+    def _delay(confidence: float) -> float:
+        """Seconds until a classification of this confidence is due again."""
+        return max(config.CLASSIFY_MIN_AGE, config.CLASSIFY_MAX_AGE * min(max(confidence, 0.0), 1.0))
+
+    @classmethod
+    def _deadline(cls, last_classified: str, confidence: float) -> float:
+        """Epoch seconds at which a stored classification is due again (at once if unparsable)."""
+        classified = epoch_seconds(last_classified)
+        return 0.0 if classified is None else classified + cls._delay(confidence or 0.0)
+
+    @staticmethod
+    def _classified_event(classified: List[Tuple[str, Device, Dict]]) -> Dict:
+        """
+        ``(category before, re-classified device, changes)`` as one
+        ``devices.updated`` event, with a summary delta for the devices that
+        moved between categories.
+        """
+        event = {
+            "type": "devices.updated",
+            "devices": [{"id": device.id, "changes": changes} for _, device, changes in classified]
+        }
+        delta = summary_delta(
+            (
+                (device.group.name, category, device.is_active),
+                (device.group.name, device.ai_classification.device_category, device.is_active)
+            )
+            for category, device, _ in classified if category != device.ai_classification.device_category
+        )
+        if delta:
+            event["summary"] = delta
+        return event
@@ -0,0 +1,39 @@
+from typing import Dict, List, Tuple
+from app.schemas.device import Device
+from app.utils.change_feed import device_changes, summary_delta, summary_keys
+
+
+def devices_event(changed: List[Tuple[Dict, Device]]) -> Dict:
+    """``(model_dump() before the mutation, mutated device)`` pairs as one change event."""
+    devices = []
+    transitions = []
+    for before, device in changed:
+        after = device.model_dump()
+        devices.append({"id": device.id, "changes": device_changes(before, after)})
+        transitions.append((summary_keys(before), summary_keys(after)))
+    event = {"type": "devices.updated", "devices": devices}
+    delta = summary_delta(transitions)
+    if delta:
+        event["summary"] = delta
+    return event
+
+
+def changes_event(updated: List[Tuple[Device, Dict]]) -> Dict:
+    """
+    ``(mutated device, top-level fields changed with their new values)``
+    pairs as one ``devices.updated`` event, built from the changes
+    rather than by diffing dumps. For mutations that may flip
+    ``is_active`` but never move a device between groups or categories.
+    """
+    event = {
+        "type": "devices.updated",
+        "devices": [{"id": device.id, "changes": changes} for device, changes in updated]
+    }
+    toggled = [
+        (device.group.name, device.ai_classification.device_category, changes["is_active"])
+        for device, changes in updated if "is_active" in changes
+    ]
+    delta = summary_delta(((group, category, not active), (group, category, active)) for group, category, active in toggled)
+    if delta:
+        event["summary"] = delta
+    return event
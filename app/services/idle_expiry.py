@@ -0,0 +1,126 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Tuple
+from app import config
+from app.schemas.device import Device
+from app.services.events import changes_event
+from app.storage.repository import DeviceRepository
+from app.utils.deadlines import EXPIRY_BATCH, DeadlineHeap, epoch_seconds
+from app.utils.metrics import DEVICES_EXPIRED
+
+
+class IdleExpiry:
+    """
+    Marks devices inactive once they go ``IDLE_TIMEOUT`` seconds unseen.
+    Every active device has a timer in ``timers``; a background thread
+    expires them as they come due. Does nothing without an idle timeout.
+    """
+
+    def __init__(
+        self,
+        repository: DeviceRepository,
+        mutation: Callable[..., ContextManager[None]],
+        record_change: Callable[[Dict], int]
+    ):
+        self.repository = repository
+        self.mutation = mutation
+        self.record_change = record_change
+        self.timers = DeadlineHeap()
+        self._lock = threading.Lock()
+        self._expirer: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def active_after() -> Optional[datetime]:
+        """Oldest ``last_seen`` (naive UTC) still counting as active; ``None`` without an idle timeout."""
+        if config.IDLE_TIMEOUT <= 0:
+            return None
+        return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=config.IDLE_TIMEOUT)
+
+    @staticmethod
+    def deadline(last_seen: str) -> float:
+        """Epoch seconds at which a device last seen at ``last_seen`` goes idle (at once if unparsable)."""
+        seen = epoch_seconds(last_seen)
+        return 0.0 if seen is None else seen + config.IDLE_TIMEOUT
+
+    def start(self):
+        """Time every active device of the loaded repository."""
+        if config.IDLE_TIMEOUT <= 0:
+            return
+        self.timers.clear()
+        self.timers.schedule_many([
+            (device_id, self.deadline(last_seen))
+            for device_id, last_seen in self.repository.active_last_seen()
+        ])
+        if self._expirer is None:
+            self._expirer = threading.Thread(target=self._expire_periodically, name="idle-expirer", daemon=True)
+            self._expirer.start()
+
+    def close(self):
+        self._stop.set()
+        if self._expirer is not None:
+            self._expirer.join()
+            self._expirer = None
+
+    def schedule(self, devices: Iterable[Device]):
+        """(Re)start the timers of the active ``devices``, just seen."""
+        if config.IDLE_TIMEOUT > 0:
+            self.timers.schedule_many([
+                (device.id, self.deadline(device.last_seen)) for device in devices if device.is_active
+            ])
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """
+        Mark inactive every device whose idle deadline has passed by ``now``
+        (epoch seconds, default the current time). Only the timers that came
+        due are looked at; each device is re-checked against its stored
+        ``last_seen``, since a sighting from another worker may have moved
+        it on. Runs in batches of ``EXPIRY_BATCH``: one commit and one
+        ``devices.updated`` event each. Returns how many devices expired.
+        """
+        now = time.time() if now is None else now
+        expired = 0
+        with self._lock:
+            while True:
+                due = self.timers.pop_due(now, EXPIRY_BATCH)
+                if not due:
+                    return expired
+                expired += self._expire(due, now)
+
+    def _expire(self, device_ids: List[int], now: float) -> int:
+        # Activity is derived from last_seen, so expiry need not wait for disk
+        changed: List[Tuple[Device, Dict]] = []
+        with self.mutation(device_ids, durable=False):
+            for device_id in device_ids:
+                device = self.repository.get(device_id)
+                if device is None or not device.is_active:
+                    continue
+                deadline = self.deadline(device.last_seen)
+                if deadline > now:
+                    self.timers.schedule(device_id, deadline)
+                    continue
+                changed.append((device.model_copy(update={"is_active": False}), {"is_active": False}))
+            if changed:
+                self.repository.save_many([device for device, _ in changed])
+                self.record_change(changes_event(changed))
+        DEVICES_EXPIRED.inc(len(changed))
+        return len(changed)
+
+    def _expire_periodically(self):
+        """
+        Expire devices as their idle deadlines pass: sleep until the
+        earliest one, but at most every ``IDLE_CHECK_INTERVAL`` seconds so
+        devices timing out close together share a commit.
+        """
+        while True:
+            deadline = self.timers.next_deadline()
+            timeout = config.IDLE_CHECK_INTERVAL
+            if deadline is not None:
+                timeout = max(deadline - time.time(), timeout)
+            if self._stop.wait(timeout):
+                return
+            try:
+                self.expire()
+            except Exception as e:
+                print(f"Error expiring idle devices: {e}")
@@ -0,0 +1,251 @@
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, ContextManager, Dict, List, Optional, Tuple
+from app import config
+from app.schemas.device import AIClassification, Device, GroupPolicy, Sighting
+from app.services.classification import Reclassifier
+from app.services.events import changes_event
+from app.services.idle_expiry import IdleExpiry
+from app.storage.group_policies import DEFAULT_POLICY, membership
+from app.storage.repository import DeviceRepository
+from app.utils.change_feed import summary_delta, summary_keys
+from app.utils.metrics import SIGHTINGS_FLUSHED, SIGHTINGS_FLUSH_SECONDS, SIGHTINGS_RECEIVED
+from app.utils.sighting_buffer import MAX_USER_AGENTS, OS_FIELDS, PendingDevice, SightingBuffer, parse_timestamp
+
+
+class SightingIngest:
+    """
+    Turns the sightings the scanners report into device updates and new
+    devices. Sightings are merged per MAC in ``buffer`` and applied in
+    batches, every ``INGEST_FLUSH_INTERVAL`` seconds (or at once, with no
+    flush window). Devices seen are handed to ``expiry`` to restart their
+    idle timers, and new ones to ``reclassifier``.
+    """
+
+    def __init__(
+        self,
+        repository: DeviceRepository,
+        mutation: Callable[..., ContextManager[None]],
+        record_change: Callable[[Dict], int],
+        expiry: IdleExpiry,
+        reclassifier: Reclassifier
+    ):
+        self.repository = repository
+        self.mutation = mutation
+        self.record_change = record_change
+        self.expiry = expiry
+        self.reclassifier = reclassifier
+        self.buffer = SightingBuffer()
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._flusher is None and config.INGEST_FLUSH_INTERVAL > 0:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="ingest-flusher", daemon=True)
+            self._flusher.start()
+
+    def close(self):
+        """Stop flushing in the background, then apply whatever is still buffered."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error flushing sightings: {e}")
+
+    def ingest(self, sightings: List[Sighting], flush: bool = False) -> Dict:
+        """
+        Buffer sightings for the next flush, merged per MAC. The batch is
+        applied right away when ``flush`` is set, when there is no flush
+        window, or once ``INGEST_MAX_PENDING`` devices are waiting (which
+        also holds back senders outpacing the flushes).
+        """
+        pending = self.buffer.add(sightings, datetime.now(timezone.utc).replace(tzinfo=None))
+        SIGHTINGS_RECEIVED.inc(len(sightings))
+        flushed = None
+        if flush or self._flusher is None or pending >= config.INGEST_MAX_PENDING:
+            flushed = self.flush()
+        return {"accepted": len(sightings), "pending": len(self.buffer), "flushed": flushed}
+
+    def flush(self, durable: bool = True) -> Dict:
+        """
+        Apply every buffered sighting as one mutation: existing devices
+        (matched by MAC) and new ones are saved with a single ``save_many``
+        and published as at most one ``devices.updated`` and one
+        ``devices.created`` event, however many sightings were merged.
+
+        Only the stripes of the matched devices and of the ids handed to
+        new ones are locked. Devices are only created here, under the
+        ingest lock, and never change MAC, so both sets are known before
+        locking.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            pending = self.buffer.drain()
+            updated: List[Tuple[Device, Dict]] = []
+            created: List[Device] = []
+            if pending:
+                matched = [self.repository.find_by_mac(sighted.mac) for sighted in pending]
+                first_id = self.repository.next_id()
+                new_ids = range(first_id, first_id + sum(1 for devices in matched if not devices))
+                lock_ids = [devices[0].id for devices in matched if devices] + list(new_ids)
+                with self.mutation(lock_ids, durable):
+                    next_id = None
+                    group = None
+                    active_after = self.expiry.active_after()
+                    for sighted, devices in zip(pending, matched):
+                        device = self.repository.get(devices[0].id) if devices else None
+                        if device:
+                            # Shallow copy: _apply_sighting only replaces top-level fields
+                            device = device.model_copy()
+                            changes = self._apply_sighting(device, sighted, active_after)
+                            if changes:
+                                updated.append((device, changes))
+                        else:
+                            if next_id is None:
+                                next_id = self.repository.next_id()
+                                group = self._default_group()
+                            created.append(self._new_device(next_id, sighted, group, active_after))
+                            next_id += 1
+                    if updated or created:
+                        self.repository.save_many([device for device, _ in updated] + created)
+                    if updated:
+                        self.record_change(changes_event(updated))
+                    if created:
+                        self.record_change(self._created_event(created))
+                    self.reclassifier.schedule_new(device.id for device in created)
+                    self.expiry.schedule([device for device, _ in updated] + created)
+        elapsed = time.perf_counter() - started
+        unchanged = len(pending) - len(updated) - len(created)
+        if pending:
+            SIGHTINGS_FLUSH_SECONDS.observe(elapsed)
+            SIGHTINGS_FLUSHED.labels("created").inc(len(created))
+            SIGHTINGS_FLUSHED.labels("updated").inc(len(updated))
+            SIGHTINGS_FLUSHED.labels("unchanged").inc(unchanged)
+        return {
+            "devices": len(pending),
+            "sightings": sum(sighted.sightings for sighted in pending),
+            "created": len(created),
+            "updated": len(updated),
+            "unchanged": unchanged,
+            "elapsed_ms": round(elapsed * 1000, 3)
+        }
+
+    def _flush_periodically(self):
+        """Apply the sightings buffered during each ``INGEST_FLUSH_INTERVAL`` window."""
+        while not self._stop.wait(config.INGEST_FLUSH_INTERVAL):
+            if not len(self.buffer):
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing sightings: {e}")
+
+    @staticmethod
+    def _apply_sighting(device: Device, sighted: PendingDevice, active_after: Optional[datetime] = None) -> Dict:
+        """
+        Mark the device seen (and active, unless the sightings are older than
+        ``active_after``), and take the addresses, hostname,
+        OS fingerprint and user agents the sightings reported unless the
+        device already has newer information. Returns the fields changed
+        with their new values (as in a ``devices.updated`` event). Only
+        assigns top-level fields (never mutates them in place), so a
+        shallow copy of a stored device is safe to pass.
+        """
+        changes = {}
+        if not device.is_active and (active_after is None or sighted.last_seen >= active_after):
+            changes["is_active"] = True
+        last_seen = parse_timestamp(device.last_seen)
+        if last_seen is None or sighted.last_seen > last_seen:
+            changes["last_seen"] = sighted.last_seen.isoformat()
+        for field in ("ip", "hostname"):
+            if field in sighted.values:
+                timestamp, value = sighted.values[field]
+                if value != getattr(device, field) and (last_seen is None or timestamp >= last_seen):
+                    changes[field] = value
+        os_updated = sighted.os_updated()
+        if os_updated is not None:
+            os_last_updated = parse_timestamp(device.os_last_updated)
+            os_changes = {}
+            for field in OS_FIELDS:
+                if field in sighted.values:
+                    timestamp, value = sighted.values[field]
+                    if value != getattr(device, field) and (os_last_updated is None or timestamp >= os_last_updated):
+                        os_changes[field] = value
+            if os_changes:
+                changes.update(os_changes, os_last_updated=os_updated.isoformat())
+        new_agents = [agent for agent in sighted.agents() if agent not in device.user_agent]
+        if new_agents:
+            changes["user_agent"] = (device.user_agent + new_agents)[-MAX_USER_AGENTS:]
+        for field, value in changes.items():
+            setattr(device, field, value)
+        return changes
+
+    def _default_group(self) -> GroupPolicy:
+        groups = self.repository.groups()
+        group = next((group for group in groups if group.is_default), groups[0] if groups else None)
+        if group is None:
+            group = GroupPolicy(id=1, name="Default Group", is_default=True, blocklist=DEFAULT_POLICY)
+        return group
+
+    @staticmethod
+    def _new_device(
+        device_id: int,
+        sighted: PendingDevice,
+        group: GroupPolicy,
+        active_after: Optional[datetime] = None
+    ) -> Device:
+        """
+        A device first seen in ``sighted``: in ``group``, following its
+        policy, and unclassified until the classifier gets to it.
+        """
+        values = {field: value for field, (_, value) in sighted.values.items()}
+        first_seen = sighted.first_seen.isoformat()
+        os_updated = sighted.os_updated()
+        hostname = values.get("hostname", "")
+        return Device(
+            id=device_id,
+            mac=sighted.mac,
+            hostname=hostname,
+            vendor="Unknown",
+            given_name=hostname or sighted.mac,
+            ip=values.get("ip", ""),
+            user_agent=sighted.agents()[-MAX_USER_AGENTS:],
+            is_active=active_after is None or sighted.last_seen >= active_after,
+            has_custom_blocklist=False,
+            group=membership(group),
+            first_seen=first_seen,
+            last_seen=sighted.last_seen.isoformat(),
+            # Locally administered (randomized) MACs have bit 1 of the first octet set
+            is_mac_universal=not int(sighted.mac[:2], 16) & 0x02,
+            os_name=values.get("os_name", "Unknown"),
+            os_accuracy=values.get("os_accuracy", 0),
+            os_type=values.get("os_type", "Unknown"),
+            os_vendor=values.get("os_vendor", "Unknown"),
+            os_family=values.get("os_family", "Unknown"),
+            os_gen=values.get("os_gen", "Unknown"),
+            os_cpe=values.get("os_cpe", []),
+            os_last_updated=(os_updated or sighted.first_seen).isoformat(),
+            blocklist=group.blocklist.model_copy(),
+            ai_classification=AIClassification(
+                device_type="Unknown",
+                device_category="Unknown",
+                confidence=0.0,
+                reasoning="Not classified yet",
+                indicators=[],
+                last_classified=first_seen
+            )
+        )
+
+    @staticmethod
+    def _created_event(devices: List[Device]) -> Dict:
+        """New devices, in full, as one change event."""
+        event = {"type": "devices.created", "devices": [device.model_dump() for device in devices]}
+        delta = summary_delta((None, summary_keys(device)) for device in event["devices"])
+        if delta:
+            event["summary"] = delta
+        return event
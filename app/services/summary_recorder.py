@@ -0,0 +1,60 @@
+import threading
+import time
+from typing import Optional
+from app import config
+from app.storage.repository import DeviceRepository
+from app.utils.summary_history import SummaryHistory
+
+
+class SummaryRecorder:
+    """
+    Samples the repository's summary into ``history`` every
+    ``SUMMARY_HISTORY_INTERVAL`` seconds, and shortly after changes (bursts
+    of changes share a sample). Does nothing with no interval configured.
+    """
+
+    def __init__(self, repository: DeviceRepository):
+        self.repository = repository
+        self.history = SummaryHistory(config.SUMMARY_HISTORY_FILE or None)
+        self._changed = threading.Event()
+        self._recorder: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._recorder is None and config.SUMMARY_HISTORY_INTERVAL > 0:
+            self.history.load()
+            self._changed.set()
+            self._recorder = threading.Thread(target=self._record, name="summary-history", daemon=True)
+            self._recorder.start()
+
+    def changed(self):
+        """Take a sample soon: the summary may have moved."""
+        self._changed.set()
+
+    def close(self):
+        self._stop.set()
+        self._changed.set()
+        if self._recorder is not None:
+            self._recorder.join()
+            self._recorder = None
+            try:
+                self.history.save()
+            except Exception as e:
+                print(f"Error saving summary history: {e}")
+            self.history.close()
+
+    def _record(self):
+        last_saved = time.monotonic()
+        while not self._stop.is_set():
+            self._changed.wait(config.SUMMARY_HISTORY_INTERVAL)
+            if self._stop.is_set():
+                break
+            self._changed.clear()
+            try:
+                self.history.record(time.time(), self.repository.summary())
+                if time.monotonic() - last_saved >= config.SUMMARY_HISTORY_SAVE_INTERVAL:
+                    self.history.save()
+                    last_saved = time.monotonic()
+            except Exception as e:
+                print(f"Error recording summary history: {e}")
+            self._stop.wait(1.0)
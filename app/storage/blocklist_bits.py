@@ -0,0 +1,242 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional
+import numpy as np
+from app.schemas.device import Blocklist, Device
+
+
+BLOCKLIST_FIELDS = tuple(Blocklist.model_fields)
+FIELD_BITS = {field: 1 << index for index, field in enumerate(BLOCKLIST_FIELDS)}
+ALL_FIELDS_MASK = (1 << len(BLOCKLIST_FIELDS)) - 1
+SAFESEARCH_BIT = FIELD_BITS["safesearch"]
+
+# Bit 13 of the per-device mask carries has_custom_blocklist
+CUSTOM_BIT = 1 << len(BLOCKLIST_FIELDS)
+
+
+def blocklist_to_mask(blocklist: Blocklist) -> int:
+    mask = 0
+    for field, bit in FIELD_BITS.items():
+        if getattr(blocklist, field):
+            mask |= bit
+    return mask
+
+
+def mask_to_blocklist(mask: int) -> Blocklist:
+    return Blocklist.model_construct(**{field: bool(mask & bit) for field, bit in FIELD_BITS.items()})
+
+
+def device_mask(device: Device) -> int:
+    mask = blocklist_to_mask(device.blocklist)
+    if device.has_custom_blocklist:
+        mask |= CUSTOM_BIT
+    return mask
+
+
+def fields_to_mask(fields: Iterable[str]) -> int:
+    mask = 0
+    for field in fields:
+        mask |= FIELD_BITS[field]
+    return mask
+
+
+def mask_to_fields(mask: int) -> List[str]:
+    return [field for field, bit in FIELD_BITS.items() if mask & bit]
+
+
+class BlocklistChange(NamedTuple):
+    """
+    A bitwise edit applied to every target: ``((mask | set) & ~clear) ^ toggle``.
+    Every change also marks the device as having a custom blocklist.
+    """
+    set_mask: int = 0
+    clear_mask: int = 0
+    toggle_mask: int = 0
+
+    @classmethod
+    def for_action(cls, action: str, category: Optional[str] = None) -> Optional["BlocklistChange"]:
+        if action == "isolate":
+            return cls(set_mask=ALL_FIELDS_MASK)
+        if action == "release":
+            return cls(set_mask=SAFESEARCH_BIT, clear_mask=ALL_FIELDS_MASK & ~SAFESEARCH_BIT)
+        if action == "toggle_block" and category in FIELD_BITS:
+            return cls(toggle_mask=FIELD_BITS[category])
+        return None
+
+    @classmethod
+    def for_fields(cls, values: Dict[str, bool]) -> "BlocklistChange":
+        set_mask = fields_to_mask(field for field, value in values.items() if value)
+        clear_mask = fields_to_mask(field for field, value in values.items() if not value)
+        return cls(set_mask=set_mask, clear_mask=clear_mask)
+
+    def apply(self, mask: int) -> int:
+        return (((mask | self.set_mask) & ~self.clear_mask) ^ self.toggle_mask) | CUSTOM_BIT
+
+
+class BlocklistColumn:
+    """
+    One 16-bit mask per device (13 blocklist fields + has_custom_blocklist)
+    in a contiguous NumPy array, so fleet-wide policy edits and "who blocks
+    X" questions are single vectorized operations.
+
+    A device without a custom blocklist follows its group's policy: each
+    row also records the device's group, and its effective mask is looked
+    up in a small per-group policy table, so changing a policy touches no
+    rows. The effective masks of all rows are cached and kept up to date by
+    row writes; a policy change just drops the cache. Rows of groups
+    without a policy use their own mask.
+
+    Rows are assigned on first sight of a device id and never reused. A
+    ``dirty`` flag per row records that the mask changed without the
+    device's ``Blocklist`` model being rewritten; the owner materializes it
+    when the device is next read.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.masks = np.zeros(capacity, dtype=np.uint16)
+        self.row_ids = np.zeros(capacity, dtype=np.int64)
+        self.group_ids = np.zeros(capacity, dtype=np.int64)
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.rows: Dict[int, int] = {}
+        self.size = 0
+        self.dirty_count = 0
+        # group id -> policy mask, -1 for none
+        self.policies = np.full(8, -1, dtype=np.int32)
+        self._effective: Optional[np.ndarray] = None
+
+    def clear(self):
+        """Drop every row; group policies are kept."""
+        self.masks[:self.size] = 0
+        self.dirty[:self.size] = False
+        self.rows.clear()
+        self.size = 0
+        self.dirty_count = 0
+        self._effective = None
+
+    def _grow_policies(self, group_id: int):
+        if group_id >= len(self.policies):
+            policies = np.full(max(group_id + 1, len(self.policies) * 2), -1, dtype=np.int32)
+            policies[:len(self.policies)] = self.policies
+            self.policies = policies
+
+    def set_policy(self, group_id: int, mask: Optional[int]):
+        """Set (or with ``None`` remove) the mask followed by the group's non-custom rows."""
+        self._grow_policies(group_id)
+        self.policies[group_id] = -1 if mask is None else mask & ALL_FIELDS_MASK
+        self._effective = None
+
+    def _resolve(self, masks: np.ndarray, group_ids: np.ndarray) -> np.ndarray:
+        policies = self.policies[group_ids]
+        inherit = ((masks & np.uint16(CUSTOM_BIT)) == 0) & (policies >= 0)
+        return np.where(inherit, policies, masks).astype(np.uint16)
+
+    def effective(self) -> np.ndarray:
+        """Every row's mask with group policies applied (cached)."""
+        if self._effective is None or len(self._effective) != self.size:
+            self._effective = self._resolve(self.masks[:self.size], self.group_ids[:self.size])
+        return self._effective
+
+    def _refresh(self, rows: np.ndarray):
+        if self._effective is not None and len(self._effective) == self.size:
+            self._effective[rows] = self._resolve(self.masks[rows], self.group_ids[rows])
+
+    def _grow(self, needed: int):
+        capacity = len(self.masks)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self.masks = np.resize(self.masks, capacity)
+        self.row_ids = np.resize(self.row_ids, capacity)
+        self.group_ids = np.resize(self.group_ids, capacity)
+        dirty = np.zeros(capacity, dtype=bool)
+        dirty[:self.size] = self.dirty[:self.size]
+        self.dirty = dirty
+
+    def set(self, device_id: int, mask: int, group_id: int = 0):
+        self._grow_policies(group_id)
+        row = self.rows.get(device_id)
+        if row is None:
+            self._grow(self.size + 1)
+            row = self.size
+            self.rows[device_id] = row
+            self.row_ids[row] = device_id
+            self.size += 1
+        elif self.dirty[row]:
+            self.dirty[row] = False
+            self.dirty_count -= 1
+        self.masks[row] = mask
+        self.group_ids[row] = group_id
+        if self._effective is not None and row < len(self._effective):
+            policy = int(self.policies[group_id])
+            self._effective[row] = policy if policy >= 0 and not mask & CUSTOM_BIT else mask
+
+    def get(self, device_id: int) -> int:
+        """The device's effective mask (its group's policy unless it has a custom blocklist)."""
+        row = self.rows[device_id]
+        mask = int(self.masks[row])
+        policy = int(self.policies[self.group_ids[row]])
+        return policy if policy >= 0 and not mask & CUSTOM_BIT else mask
+
+    def is_dirty(self, device_id: int) -> bool:
+        row = self.rows.get(device_id)
+        return row is not None and bool(self.dirty[row])
+
+    def mark_clean(self, device_id: int):
+        row = self.rows[device_id]
+        if self.dirty[row]:
+            self.dirty[row] = False
+            self.dirty_count -= 1
+
+    def dirty_ids(self) -> List[int]:
+        return self.row_ids[:self.size][self.dirty[:self.size]].tolist()
+
+    def rows_for(self, device_ids: Iterable[int]) -> np.ndarray:
+        rows = self.rows
+        return np.fromiter((rows[device_id] for device_id in device_ids if device_id in rows), dtype=np.int64)
+
+    def apply(self, rows: np.ndarray, change: BlocklistChange):
+        """
+        Apply ``change`` to the effective masks of all ``rows`` at once (rows
+        following a group policy start from it) and flag them for
+        materialization.
+        """
+        if not len(rows):
+            return
+        masks = self._resolve(self.masks[rows], self.group_ids[rows])
+        if change.set_mask:
+            masks |= np.uint16(change.set_mask)
+        if change.clear_mask:
+            masks &= np.uint16(~change.clear_mask & 0xFFFF)
+        if change.toggle_mask:
+            masks ^= np.uint16(change.toggle_mask)
+        masks |= np.uint16(CUSTOM_BIT)
+        self.masks[rows] = masks
+        self._refresh(rows)
+        self.dirty_count += int(len(rows) - np.count_nonzero(self.dirty[rows]))
+        self.dirty[rows] = True
+
+    def assign(self, rows: np.ndarray, masks: List[int]):
+        """Overwrite the masks of ``rows`` and flag them for materialization."""
+        if not len(rows):
+            return
+        self.masks[rows] = np.asarray(masks, dtype=np.uint16)
+        self._refresh(rows)
+        self.dirty_count += int(len(rows) - np.count_nonzero(self.dirty[rows]))
+        self.dirty[rows] = True
+
+    def ids_matching(self, require_mask: int = 0, forbid_mask: int = 0) -> np.ndarray:
+        """Ids whose effective mask has every ``require_mask`` bit set and no ``forbid_mask`` bit set."""
+        masks = self.effective()
+        selected = np.ones(self.size, dtype=bool)
+        if require_mask:
+            selected &= (masks & np.uint16(require_mask)) == require_mask
+        if forbid_mask:
+            selected &= (masks & np.uint16(forbid_mask)) == 0
+        return self.row_ids[:self.size][selected]
+
+    def field_counts(self, rows: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Number of devices with each blocklist field enabled (optionally within ``rows``)."""
+        masks = self.effective() if rows is None else self.effective()[rows]
+        counts = {}
+        for field, bit in FIELD_BITS.items():
+            counts[field] = int(np.count_nonzero(masks & np.uint16(bit)))
+        return counts
@@ -0,0 +1,577 @@
+import heapq
+import math
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from app.schemas.device import Device, DeviceQuery, DeviceSearch, GroupPolicy
+from app.storage.blocklist_bits import (
+    CUSTOM_BIT, BlocklistChange, BlocklistColumn, device_mask, fields_to_mask, mask_to_blocklist
+)
+from app.storage.group_policies import GroupPolicies
+from app.storage.pagination import SORT_KEYS, DevicePage, decode_cursor, encode_cursor, encode_position
+from app.storage.search_index import TextIndex, ip_bounds, mac_prefix, score, search_texts, tokenize
+from app.storage.summary_counters import SummaryCounters
+
+
+class IndexKeys(NamedTuple):
+    mac: str
+    ip: str
+    group_id: int
+    group_name: str
+    category: str
+    is_active: bool
+    vendor: str
+    sort_values: Tuple
+    search: Tuple[Tuple[str, ...], ...]
+
+
+def normalize_mac(mac: str) -> str:
+    return mac.strip().upper().replace("-", ":")
+
+
+def _texts(keys: IndexKeys) -> Set[str]:
+    return {text for values in keys.search for text in values}
+
+
+# Below this fraction of the fleet, sorting the filtered ids directly is
+# cheaper than walking a sorted index and skipping non-matches.
+SORTED_SCAN_MIN_FRACTION = 0.125
+
+
+class DeviceStore:
+    """
+    In-memory device store.
+
+    Devices are held in a primary map keyed by ``id``. Secondary indexes map
+    ``mac``, ``ip``, ``group.id``, ``ai_classification.device_category``,
+    ``is_active`` and ``vendor`` to the set of matching device ids, and one
+    sorted ``(value, id)`` list per sort key backs keyset pagination. The keys
+    a device was last indexed under are remembered, so callers mutate a device
+    in place and then call ``update`` to move it between index buckets. The
+    summary counters are adjusted in the same step.
+
+    ``search`` is served by a sorted ``(mac, id)`` list for MAC prefixes, the
+    ``ip`` sort index for CIDR ranges and a ``TextIndex`` for words. The text
+    index is built on the first search and kept up to date from then on.
+
+    Blocklists (and ``has_custom_blocklist``) are kept as bitmasks in a
+    ``BlocklistColumn``. Fleet-wide edits go through ``apply_blocklist`` and
+    only touch the column; a device's ``Blocklist`` model is rewritten from
+    its mask the next time the device is read.
+
+    Devices without a custom blocklist hold their group's policy object
+    (``groups``) instead of a copy. ``set_group`` replacing a policy only
+    updates the registry and the column's policy table; devices of the
+    group still holding the old object are handed the new one when next
+    read.
+    """
+
+    def __init__(self):
+        self.by_id: Dict[int, Device] = {}
+        self._keys: Dict[int, IndexKeys] = {}
+        self._by_mac: Dict[str, Set[int]] = {}
+        self._by_ip: Dict[str, Set[int]] = {}
+        self._by_group: Dict[int, Set[int]] = {}
+        self._by_category: Dict[str, Set[int]] = {}
+        self._by_active: Dict[bool, Set[int]] = {True: set(), False: set()}
+        self._by_vendor: Dict[str, Set[int]] = {}
+        self.blocklists = BlocklistColumn()
+        self._sorted: Dict[str, List[Tuple[Any, int]]] = {key: [] for key in SORT_KEYS}
+        self._sorted_macs: List[Tuple[str, int]] = []
+        self._sorted_stale = False
+        self.text = TextIndex()
+        self._text_stale = False
+        # While the text index is built elsewhere (``text_snapshot``): the
+        # devices changed since, and which load the snapshot belongs to
+        self._text_dirty: Optional[Set[int]] = None
+        self._text_generation = 0
+        self.counters = SummaryCounters()
+        self.groups = GroupPolicies()
+        self._stale_groups: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def __contains__(self, device_id: int) -> bool:
+        return device_id in self.by_id
+
+    @staticmethod
+    def _index_keys(device: Device) -> IndexKeys:
+        return IndexKeys(
+            mac=normalize_mac(device.mac),
+            ip=device.ip,
+            group_id=device.group.id,
+            group_name=device.group.name,
+            category=device.ai_classification.device_category,
+            is_active=device.is_active,
+            vendor=device.vendor.lower(),
+            sort_values=tuple(key(device) for key in SORT_KEYS.values()),
+            search=search_texts(device),
+        )
+
+    @staticmethod
+    def _index_add(index: Dict, key, device_id: int):
+        bucket = index.get(key)
+        if bucket is None:
+            index[key] = {device_id}
+        else:
+            bucket.add(device_id)
+
+    @staticmethod
+    def _index_discard(index: Dict, key, device_id: int):
+        bucket = index.get(key)
+        if bucket is None:
+            return
+        bucket.discard(device_id)
+        if not bucket and not isinstance(key, bool):
+            del index[key]
+
+    def _link(self, device_id: int, keys: IndexKeys, old_keys: Optional[IndexKeys] = None):
+        self._index_add(self._by_mac, keys.mac, device_id)
+        self._index_add(self._by_ip, keys.ip, device_id)
+        self._index_add(self._by_group, keys.group_id, device_id)
+        self._index_add(self._by_category, keys.category, device_id)
+        self._index_add(self._by_active, keys.is_active, device_id)
+        self._index_add(self._by_vendor, keys.vendor, device_id)
+        if not self._sorted_stale:
+            for index, (key, value) in enumerate(zip(SORT_KEYS, keys.sort_values)):
+                if old_keys is None or old_keys.sort_values[index] != value:
+                    insort(self._sorted[key], (value, device_id))
+            if old_keys is None or old_keys.mac != keys.mac:
+                insort(self._sorted_macs, (keys.mac, device_id))
+        if self._text_stale:
+            if self._text_dirty is not None:
+                self._text_dirty.add(device_id)
+        elif old_keys is None or old_keys.search != keys.search:
+            self.text.add(device_id, _texts(keys) - _texts(old_keys) if old_keys else _texts(keys))
+        self.counters.add(keys.group_name, keys.category, keys.is_active)
+        self._keys[device_id] = keys
+
+    def _unlink(self, device_id: int, keys: IndexKeys, new_keys: Optional[IndexKeys] = None):
+        self._index_discard(self._by_mac, keys.mac, device_id)
+        self._index_discard(self._by_ip, keys.ip, device_id)
+        self._index_discard(self._by_group, keys.group_id, device_id)
+        self._index_discard(self._by_category, keys.category, device_id)
+        self._index_discard(self._by_active, keys.is_active, device_id)
+        self._index_discard(self._by_vendor, keys.vendor, device_id)
+        if not self._sorted_stale:
+            for index, (key, value) in enumerate(zip(SORT_KEYS, keys.sort_values)):
+                if new_keys is None or new_keys.sort_values[index] != value:
+                    entries = self._sorted[key]
+                    position = bisect_left(entries, (value, device_id))
+                    if position < len(entries) and entries[position] == (value, device_id):
+                        del entries[position]
+            if new_keys is None or new_keys.mac != keys.mac:
+                position = bisect_left(self._sorted_macs, (keys.mac, device_id))
+                if position < len(self._sorted_macs) and self._sorted_macs[position] == (keys.mac, device_id):
+                    del self._sorted_macs[position]
+        if self._text_stale:
+            if self._text_dirty is not None:
+                self._text_dirty.add(device_id)
+        elif new_keys is None or new_keys.search != keys.search:
+            self.text.remove(device_id, _texts(keys) - _texts(new_keys) if new_keys else _texts(keys))
+        self.counters.remove(keys.group_name, keys.category, keys.is_active)
+        del self._keys[device_id]
+
+    def _rebuild_sorted(self):
+        for index, key in enumerate(SORT_KEYS):
+            self._sorted[key] = sorted((keys.sort_values[index], device_id) for device_id, keys in self._keys.items())
+        self._sorted_macs = sorted((keys.mac, device_id) for device_id, keys in self._keys.items())
+        self._sorted_stale = False
+
+    def _rebuild_text(self):
+        self.text.load((device_id, _texts(keys)) for device_id, keys in self._keys.items())
+        self._text_stale = False
+        self._text_dirty = None
+
+    @property
+    def text_stale(self) -> bool:
+        return self._text_stale
+
+    def text_snapshot(self) -> Tuple[int, Dict[int, Set[str]]]:
+        """
+        The searchable texts of every device, to build the text index from
+        without holding up the store, and a token for ``install_text``.
+        Devices changed from now on are re-indexed when it is installed.
+        """
+        self._text_dirty = set()
+        return self._text_generation, {device_id: _texts(keys) for device_id, keys in self._keys.items()}
+
+    def install_text(self, generation: int, texts: Dict[int, Set[str]], index: TextIndex) -> bool:
+        """Swap in ``index``, built from ``text_snapshot``'s ``texts``, after catching it up; ``False`` if outdated."""
+        if generation != self._text_generation or not self._text_stale or self._text_dirty is None:
+            return False
+        for device_id in self._text_dirty:
+            if device_id in texts:
+                index.remove(device_id, texts[device_id])
+            keys = self._keys.get(device_id)
+            if keys is not None:
+                index.add(device_id, _texts(keys))
+        self.text = index
+        self._text_stale = False
+        self._text_dirty = None
+        return True
+
+    def clear(self):
+        """Drop every device; groups are kept."""
+        self.by_id.clear()
+        self._keys.clear()
+        self._by_mac.clear()
+        self._by_ip.clear()
+        self._by_group.clear()
+        self._by_category.clear()
+        self._by_active = {True: set(), False: set()}
+        self._by_vendor.clear()
+        self.blocklists.clear()
+        self._sorted = {key: [] for key in SORT_KEYS}
+        self._sorted_macs = []
+        self._sorted_stale = False
+        self.text.clear()
+        self._text_stale = False
+        self._text_dirty = None
+        self._text_generation += 1
+        self.counters.clear()
+
+    def load(self, devices: Iterable[Device]):
+        # Sorted indexes are built once at the end rather than insort-ed per
+        # device; the text index is built afterwards (see ``text_snapshot``),
+        # or by the first search
+        self.clear()
+        self._sorted_stale = True
+        self._text_stale = True
+        for device in devices:
+            self.add(device)
+        self._rebuild_sorted()
+
+    def set_group(self, group: GroupPolicy):
+        """Add or replace a group and its policy, without touching its devices."""
+        self.groups.set(group)
+        self.blocklists.set_policy(group.id, self.groups.mask(group.id))
+        if self.ids_in_group(group.id):
+            self._stale_groups.add(group.id)
+
+    def _share_policy(self, device: Device):
+        """Point a device without a custom blocklist at its group's policy object."""
+        if not device.has_custom_blocklist:
+            policy = self.groups.blocklist(device.group.id)
+            if policy is not None:
+                device.blocklist = policy
+
+    def add(self, device: Device):
+        if device.id in self.by_id:
+            raise ValueError(f"Duplicate device id {device.id}")
+        self._share_policy(device)
+        self.by_id[device.id] = device
+        self._link(device.id, self._index_keys(device))
+        self.blocklists.set(device.id, device_mask(device), device.group.id)
+
+    def update(self, device: Device):
+        """Re-index a device after it was mutated in place (or replaced)."""
+        old_keys = self._keys.get(device.id)
+        if old_keys is None:
+            self.add(device)
+            return
+        self._share_policy(device)
+        self.by_id[device.id] = device
+        self.blocklists.set(device.id, device_mask(device), device.group.id)
+        new_keys = self._index_keys(device)
+        if new_keys != old_keys:
+            self._unlink(device.id, old_keys, new_keys)
+            self._link(device.id, new_keys, old_keys)
+
+    def _materialize(self, device_id: int) -> Device:
+        """
+        Swap in a copy of the device with its Blocklist rebuilt from its mask
+        if a bulk edit changed it, or with its group's current policy if
+        that was replaced (readers holding the old object never see it
+        half-updated).
+        """
+        device = self.by_id[device_id]
+        if self.blocklists.is_dirty(device_id):
+            mask = self.blocklists.get(device_id)
+            custom = bool(mask & CUSTOM_BIT)
+            policy = None if custom else self.groups.blocklist(device.group.id)
+            device = device.model_copy(update={
+                "blocklist": policy or mask_to_blocklist(mask),
+                "has_custom_blocklist": custom
+            })
+            self.by_id[device_id] = device
+            self.blocklists.mark_clean(device_id)
+        elif not device.has_custom_blocklist and device.group.id in self._stale_groups:
+            policy = self.groups.blocklist(device.group.id)
+            if device.blocklist is not policy:
+                device = device.model_copy(update={"blocklist": policy})
+                self.by_id[device_id] = device
+        return device
+
+    def _materialize_all(self):
+        if self.blocklists.dirty_count:
+            for device_id in self.blocklists.dirty_ids():
+                self._materialize(device_id)
+        for group_id in self._stale_groups:
+            policy = self.groups.blocklist(group_id)
+            for device_id in self.ids_in_group(group_id):
+                device = self.by_id[device_id]
+                if not device.has_custom_blocklist and device.blocklist is not policy:
+                    self.by_id[device_id] = device.model_copy(update={"blocklist": policy})
+        self._stale_groups.clear()
+
+    def apply_blocklist(self, device_ids: Iterable[int], change: BlocklistChange) -> List[int]:
+        """Apply one bitwise blocklist edit to many devices; returns the ids that exist."""
+        rows = self.blocklists.rows_for(device_ids)
+        self.blocklists.apply(rows, change)
+        return self.blocklists.row_ids[rows].tolist()
+
+    def blocklist_masks(self, device_ids: Iterable[int]) -> List[int]:
+        return self.blocklists.effective()[self.blocklists.rows_for(device_ids)].tolist()
+
+    def assign_blocklists(self, device_ids: List[int], masks: List[int]):
+        """Set the masks of existing devices outright (journal replay of a toggle)."""
+        pairs = [(device_id, mask) for device_id, mask in zip(device_ids, masks) if device_id in self.by_id]
+        rows = self.blocklists.rows_for(device_id for device_id, _ in pairs)
+        self.blocklists.assign(rows, [mask for _, mask in pairs])
+
+    def blocklist_counts(self, ids: Optional[Iterable[int]] = None) -> Dict[str, int]:
+        rows = None if ids is None else self.blocklists.rows_for(ids)
+        return self.blocklists.field_counts(rows)
+
+    def summary(self) -> Dict:
+        return self.counters.snapshot()
+
+    def verify_summary(self, repair: bool = False) -> Dict:
+        """Recount the summary from scratch and report drift from the counters."""
+        actual = self.counters.snapshot()
+        expected = SummaryCounters.recompute(self.by_id.values())
+        drift = SummaryCounters.diff(expected, actual)
+        if drift and repair:
+            for device in self.all():
+                self.update(device)
+            self.counters.clear()
+            for keys in self._keys.values():
+                self.counters.add(keys.group_name, keys.category, keys.is_active)
+        return {"ok": not drift, "drift": drift, "counters": actual, "recomputed": expected}
+
+    def get(self, device_id: int) -> Optional[Device]:
+        if device_id not in self.by_id:
+            return None
+        return self._materialize(device_id)
+
+    def all(self) -> List[Device]:
+        self._materialize_all()
+        return list(self.by_id.values())
+
+    def ids_by_mac(self, mac: str) -> Set[int]:
+        return self._by_mac.get(normalize_mac(mac), set())
+
+    def ids_by_ip(self, ip: str) -> Set[int]:
+        return self._by_ip.get(ip.strip(), set())
+
+    def ids_in_group(self, group_id: int) -> Set[int]:
+        return self._by_group.get(group_id, set())
+
+    def ids_in_category(self, category: str) -> Set[int]:
+        return self._by_category.get(category, set())
+
+    def ids_by_active(self, is_active: bool) -> Set[int]:
+        return self._by_active[is_active]
+
+    def ids_by_vendor(self, vendor: str) -> Set[int]:
+        return self._by_vendor.get(vendor.strip().lower(), set())
+
+    def _resolve(self, ids: Iterable[int]) -> List[Device]:
+        self._materialize_all()
+        return [self.by_id[device_id] for device_id in sorted(ids)]
+
+    def find_by_mac(self, mac: str) -> List[Device]:
+        return self._resolve(self.ids_by_mac(mac))
+
+    def find_by_ip(self, ip: str) -> List[Device]:
+        return self._resolve(self.ids_by_ip(ip))
+
+    def match_ids(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        vendor: Optional[str] = None,
+        has_custom_blocklist: Optional[bool] = None,
+        blocked: Iterable[str] = (),
+        allowed: Iterable[str] = (),
+    ) -> Optional[Set[int]]:
+        """
+        Intersect the matching index buckets, smallest first. Blocklist and
+        ``has_custom_blocklist`` filters are one vectorized pass over the
+        blocklist column.
+
+        Returns ``None`` when no filter is given (i.e. every device matches).
+        """
+        buckets = []
+        if group_id is not None:
+            buckets.append(self.ids_in_group(group_id))
+        if category is not None:
+            buckets.append(self.ids_in_category(category))
+        if is_active is not None:
+            buckets.append(self.ids_by_active(is_active))
+        if vendor is not None:
+            buckets.append(self.ids_by_vendor(vendor))
+        require_mask = fields_to_mask(blocked)
+        forbid_mask = fields_to_mask(allowed)
+        if has_custom_blocklist is True:
+            require_mask |= CUSTOM_BIT
+        elif has_custom_blocklist is False:
+            forbid_mask |= CUSTOM_BIT
+        if require_mask or forbid_mask:
+            buckets.append(set(self.blocklists.ids_matching(require_mask, forbid_mask).tolist()))
+        if not buckets:
+            return None
+
+        buckets.sort(key=len)
+        ids = set(buckets[0])
+        for bucket in buckets[1:]:
+            if not ids:
+                break
+            ids.intersection_update(bucket)
+        return ids
+
+    def filter(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None,
+    ) -> List[Device]:
+        ids = self.match_ids(group_id=group_id, category=category, is_active=is_active)
+        if ids is None:
+            return self.all()
+        return self._resolve(ids)
+
+    def query(self, query: DeviceQuery) -> DevicePage:
+        """Filter, sort and page through devices using keyset pagination."""
+        ids = self.match_ids(
+            group_id=query.group_id,
+            category=query.category,
+            is_active=query.is_active,
+            vendor=query.vendor,
+            has_custom_blocklist=query.has_custom_blocklist,
+            blocked=query.blocked,
+            allowed=query.allowed,
+        )
+        total = len(self.by_id) if ids is None else len(ids)
+        after = decode_cursor(query.cursor, query.sort) if query.cursor else None
+        wanted = total if query.limit is None else query.limit + 1
+
+        if self._sorted_stale:
+            self._rebuild_sorted()
+        self._materialize_all()
+        if ids is None or len(ids) >= len(self.by_id) * SORTED_SCAN_MIN_FRACTION:
+            ordered = self._walk_sorted(query.sort_key, query.descending, after, ids, wanted)
+        else:
+            ordered = self._sort_ids(query.sort_key, query.descending, after, ids, wanted)
+
+        devices = [self.by_id[device_id] for device_id in ordered]
+        next_cursor = None
+        if query.limit is not None and len(devices) > query.limit:
+            devices = devices[:query.limit]
+            next_cursor = encode_cursor(query.sort, devices[-1])
+        return DevicePage(devices=devices, next_cursor=next_cursor, total=total)
+
+    def _walk_sorted(
+        self,
+        key: str,
+        descending: bool,
+        after: Optional[Tuple[Any, int]],
+        ids: Optional[Set[int]],
+        wanted: int
+    ) -> List[int]:
+        entries = self._sorted[key]
+        if descending:
+            end = len(entries) if after is None else bisect_left(entries, tuple(after))
+            positions = range(end - 1, -1, -1)
+        else:
+            start = 0 if after is None else bisect_right(entries, tuple(after))
+            positions = range(start, len(entries))
+
+        ordered = []
+        for position in positions:
+            device_id = entries[position][1]
+            if ids is None or device_id in ids:
+                ordered.append(device_id)
+                if len(ordered) >= wanted:
+                    break
+        return ordered
+
+    def _sort_ids(
+        self,
+        key: str,
+        descending: bool,
+        after: Optional[Tuple[Any, int]],
+        ids: Set[int],
+        wanted: int
+    ) -> List[int]:
+        index = list(SORT_KEYS).index(key)
+        keyed = [(self._keys[device_id].sort_values[index], device_id) for device_id in ids]
+        if after is not None:
+            after = tuple(after)
+            if descending:
+                keyed = [entry for entry in keyed if entry < after]
+            else:
+                keyed = [entry for entry in keyed if entry > after]
+        keyed.sort(reverse=descending)
+        return [device_id for _, device_id in keyed[:wanted]]
+
+    def _ids_by_mac_prefix(self, prefix: str) -> Set[int]:
+        ids = set()
+        position = bisect_left(self._sorted_macs, (prefix,))
+        while position < len(self._sorted_macs):
+            mac, device_id = self._sorted_macs[position]
+            if not mac.startswith(prefix):
+                break
+            ids.add(device_id)
+            position += 1
+        return ids
+
+    def _ids_in_ip_range(self, first: str, last: str) -> Set[int]:
+        entries = self._sorted["ip"]
+        start = bisect_left(entries, (first,))
+        end = bisect_right(entries, (last, math.inf))
+        return {device_id for _, device_id in entries[start:end]}
+
+    def search(self, search: DeviceSearch) -> DevicePage:
+        """
+        Devices matching every given criterion, best rank first (then by id).
+        Without ``q`` every match ranks 0, so results are in id order.
+        """
+        ids = self.match_ids(group_id=search.group_id, category=search.category, is_active=search.is_active)
+        if self._sorted_stale:
+            self._rebuild_sorted()
+        if search.mac is not None:
+            found = self._ids_by_mac_prefix(mac_prefix(search.mac))
+            ids = found if ids is None else ids & found
+        if search.ip is not None:
+            found = self._ids_in_ip_range(*ip_bounds(search.ip))
+            ids = found if ids is None else ids & found
+
+        tokens = tokenize(search.q or "")
+        if tokens:
+            if self._text_stale:
+                self._rebuild_text()
+            # Longest tokens first: they have the fewest candidates
+            for token in sorted(tokens, key=len, reverse=True):
+                ids = self.text.ids_matching(token, ids)
+                if not ids:
+                    break
+            ranked = [(-score(tokens, self._keys[device_id].search), device_id) for device_id in ids]
+        else:
+            ranked = [(0, device_id) for device_id in (self.by_id if ids is None else ids)]
+
+        total = len(ranked)
+        if search.cursor:
+            rank, after_id = decode_cursor(search.cursor, "rank")
+            after = (-rank, after_id)
+            ranked = [entry for entry in ranked if entry > after]
+        page = heapq.nsmallest(search.limit + 1, ranked)
+
+        devices = [self._materialize(device_id) for _, device_id in page[:search.limit]]
+        next_cursor = None
+        if len(page) > search.limit:
+            rank, device_id = page[search.limit - 1]
+            next_cursor = encode_position("rank", -rank, device_id)
+        return DevicePage(devices=devices, next_cursor=next_cursor, total=total)
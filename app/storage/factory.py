@@ -0,0 +1,15 @@
+from app import config
+from app.storage.json_repository import JsonDeviceRepository
+from app.storage.repository import DeviceRepository
+from app.storage.sqlite_repository import SqliteDeviceRepository
+
+
+BACKENDS = ("json", "sqlite")
+
+
+def create_repository(backend: str = config.STORAGE_BACKEND) -> DeviceRepository:
+    if backend == "json":
+        return JsonDeviceRepository()
+    if backend == "sqlite":
+        return SqliteDeviceRepository()
+    raise ValueError(f"Unknown storage backend '{backend}' (expected one of: {', '.join(BACKENDS)})")
@@ -0,0 +1,92 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.schemas.device import Blocklist, Group, GroupPolicy
+from app.storage.blocklist_bits import blocklist_to_mask, mask_to_blocklist
+
+
+DEFAULT_GROUPS = (
+    Group(id=1, name="Default Group", is_default=True),
+    Group(id=2, name="Staff", is_default=False),
+    Group(id=3, name="Guests", is_default=False),
+    Group(id=4, name="IoT", is_default=False),
+)
+
+# Policy of a group nothing else can be inferred for (the Blocklist example)
+DEFAULT_POLICY = Blocklist(**Blocklist.model_config["json_schema_extra"]["example"])
+
+
+def membership(group: Group) -> Group:
+    """The ``{id, name, is_default}`` part of a group, as embedded in each device."""
+    return Group(id=group.id, name=group.name, is_default=group.is_default)
+
+
+def seed_policies(groups: Iterable[Group], inherited_masks: Iterable[Tuple[int, int, int]]) -> List[GroupPolicy]:
+    """
+    Initial policies for a fleet stored before groups had one.
+
+    ``inherited_masks`` is ``(group_id, blocklist mask, device count)`` over
+    the devices without a custom blocklist, which until now each held a
+    copy of their group's settings: a group's policy is the most common of
+    those, ``DEFAULT_POLICY`` for groups without such devices.
+    """
+    counts: Dict[int, Counter] = {}
+    for group_id, mask, count in inherited_masks:
+        counts.setdefault(group_id, Counter())[mask] += count
+    policies = []
+    for group in groups:
+        if group.id in counts:
+            blocklist = mask_to_blocklist(counts[group.id].most_common(1)[0][0])
+        else:
+            blocklist = DEFAULT_POLICY.model_copy()
+        policies.append(GroupPolicy(id=group.id, name=group.name, is_default=group.is_default, blocklist=blocklist))
+    return policies
+
+
+def known_groups(seen: Iterable[Group]) -> List[Group]:
+    """``DEFAULT_GROUPS`` plus any other group found in the data, by id."""
+    groups = {group.id: group for group in DEFAULT_GROUPS}
+    for group in seen:
+        groups.setdefault(group.id, membership(group))
+    return [groups[group_id] for group_id in sorted(groups)]
+
+
+class GroupPolicies:
+    """
+    The groups by id, each with its policy as a shared ``Blocklist`` and as
+    a mask. Devices without a custom blocklist are handed the group's
+    ``Blocklist`` object itself rather than a copy, so replacing a policy
+    is one dict update however many devices follow it.
+    """
+
+    def __init__(self, groups: Iterable[GroupPolicy] = ()):
+        self._groups: Dict[int, GroupPolicy] = {}
+        self._masks: Dict[int, int] = {}
+        for group in groups:
+            self.set(group)
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __contains__(self, group_id: int) -> bool:
+        return group_id in self._groups
+
+    def clear(self):
+        self._groups.clear()
+        self._masks.clear()
+
+    def set(self, group: GroupPolicy):
+        self._groups[group.id] = group
+        self._masks[group.id] = blocklist_to_mask(group.blocklist)
+
+    def get(self, group_id: int) -> Optional[GroupPolicy]:
+        return self._groups.get(group_id)
+
+    def all(self) -> List[GroupPolicy]:
+        return [self._groups[group_id] for group_id in sorted(self._groups)]
+
+    def blocklist(self, group_id: int) -> Optional[Blocklist]:
+        group = self._groups.get(group_id)
+        return None if group is None else group.blocklist
+
+    def mask(self, group_id: int) -> Optional[int]:
+        return self._masks.get(group_id)
@@ -0,0 +1,394 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import IO, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from app.utils.metrics import PERSISTENCE_WRITE_SECONDS, PERSISTENCE_WRITTEN_BYTES
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def fsync_dir(path: str):
+    """Make a rename inside ``path`` durable (no-op where directories can't be opened)."""
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path: str, data: bytes):
+    """
+    Write ``data`` to a temp file, fsync it and rename it over ``path``. The
+    temp file is unique, so concurrent writers of the same path (other
+    processes, say) never write into each other's; the last rename wins.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_dir(directory)
+
+
+def try_process_lock(path: str) -> Optional[IO]:
+    """
+    Take an exclusive, non-blocking lock on ``path`` for the life of this
+    process (released on ``release_process_lock`` or exit); ``None`` if
+    another process holds it. Without ``fcntl`` every caller gets it.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    lock_file = open(path, "a")
+    if fcntl is None:
+        return lock_file
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def acquire_process_lock(path: str) -> Optional[IO]:
+    """
+    ``try_process_lock``, raising ``RuntimeError`` if another process holds
+    the lock. No-op without ``fcntl``.
+    """
+    if fcntl is None:
+        return None
+    lock_file = try_process_lock(path)
+    if lock_file is None:
+        raise RuntimeError(
+            f"{path} is held by another process; the JSON backend serves one process only "
+            "(use CHIMERA_STORAGE_BACKEND=sqlite to run several workers)"
+        )
+    return lock_file
+
+
+def release_process_lock(lock_file: Optional[IO]):
+    if lock_file is not None:
+        lock_file.close()
+
+
+_JOURNAL_WRITE_SECONDS = PERSISTENCE_WRITE_SECONDS.labels("journal")
+_JOURNAL_WRITTEN_BYTES = PERSISTENCE_WRITTEN_BYTES.labels("journal")
+
+# Pause between attempts to write a batch that failed
+RETRY_SECONDS = 1.0
+
+
+class DeviceJournal:
+    """
+    Append-only write-ahead log of device mutations, written by a background
+    thread.
+
+    Each record is one JSON line. ``append`` only queues the serialized
+    record in memory, so it is safe to call while holding locks readers also
+    take; the writer thread writes out whatever is queued and fsyncs it, one
+    fsync per batch (group commit). ``commit`` blocks until a record is on
+    disk.
+
+    A batch that fails to write or fsync is cut back off the file and stays
+    queued, ahead of anything appended since, and the writer retries it
+    every ``RETRY_SECONDS``; meanwhile ``commit`` raises the error for any
+    record not yet on disk. If the file can't even be cut back, the journal
+    fails for good (``failed``): it writes nothing more, since records
+    appended after a partial line would be lost with it on replay.
+
+    Records must be idempotent: compaction snapshots the state at a record
+    ``mark`` and only then drops records up to ``mark`` from the journal, so a
+    crash in between replays some records on top of a snapshot that already
+    contains them.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        commit_delay: float = 0.0,
+        compact: Optional[Callable[[], int]] = None
+    ):
+        """
+        ``compact`` writes a snapshot and returns the last record it covers;
+        it runs on the writer thread when compaction is requested.
+
+        A torn record at the end of ``path`` (left by a crash mid-append) is
+        cut off first: appended after it, new records would share its line
+        and be dropped with it on the next replay.
+        """
+        self.path = path
+        self.commit_delay = commit_delay
+        self._compact = compact
+        self._cond = threading.Condition()
+        self._pending: List[bytes] = []
+        # Seq of the first record still in the file
+        self._file_first_seq = 1
+        self._compact_requested = 0
+        self._compactions_done = 0
+        self._closing = False
+        # The last write error, until a write succeeds again
+        self.error: Optional[BaseException] = None
+        self.failed = False
+        self.fsyncs = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        records = self._cut_torn_tail(path)
+        self._appended_seq = records
+        self._synced_seq = records
+        self.records = records
+        self._file = open(path, "ab")
+        # Length of the file up to its last record on disk
+        self._size = self._file.seek(0, os.SEEK_END)
+        self._writer = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def replay(path: str) -> Iterator[Dict]:
+        """
+        Yield the records in ``path`` in order.
+
+        Stops at the first line that is incomplete or unparsable, which is
+        what a crash in the middle of an append leaves behind.
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            for record, _ in DeviceJournal._complete_records(f):
+                yield record
+
+    @staticmethod
+    def _complete_records(f: BinaryIO) -> Iterator[Tuple[Dict, int]]:
+        """Each complete record in ``f`` with the offset just past it, up to the first torn or unparsable line."""
+        end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            end += len(line)
+            yield record, end
+
+    @staticmethod
+    def _cut_torn_tail(path: str) -> int:
+        """Truncate ``path`` after its last complete record; returns how many records it keeps."""
+        if not os.path.exists(path):
+            return 0
+        records = end = 0
+        with open(path, "r+b") as f:
+            for _, end in DeviceJournal._complete_records(f):
+                records += 1
+            if f.seek(0, os.SEEK_END) > end:
+                logger.warning("Dropping %d bytes of torn record(s) at the end of %s", f.tell() - end, path)
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+        return records
+
+    @property
+    def appended_seq(self) -> int:
+        return self._appended_seq
+
+    def append(self, record: Dict) -> int:
+        """Queue ``record`` and return its sequence number. Never touches the disk."""
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("journal is closed")
+            if self.failed:
+                raise RuntimeError(f"journal {self.path} failed: {self.error}")
+            self._pending.append(line)
+            self._appended_seq += 1
+            self.records += 1
+            self._cond.notify_all()
+            return self._appended_seq
+
+    def commit(self, seq: int):
+        """
+        Block until record ``seq`` (and everything before it) is on disk;
+        raises the write error if it isn't and writing currently fails.
+        """
+        with self._cond:
+            while self._synced_seq < seq:
+                if self.error is not None:
+                    raise self.error
+                self._cond.wait()
+
+    def write(self, record: Dict):
+        self.commit(self.append(record))
+
+    def sync(self):
+        """Block until everything appended so far is on disk."""
+        self.commit(self._appended_seq)
+
+    @property
+    def compaction_pending(self) -> bool:
+        return self._compactions_done < self._compact_requested
+
+    def request_compaction(self, wait: bool = False):
+        """Have the writer thread fold the journal into a snapshot (optionally waiting for it)."""
+        with self._cond:
+            self._compact_requested += 1
+            ticket = self._compact_requested
+            self._cond.notify_all()
+            while wait and self._compactions_done < ticket and self._writer.is_alive() and not self.failed:
+                self._cond.wait()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and self._compactions_done >= self._compact_requested and not self._closing:
+                    self._cond.wait()
+                if self.commit_delay and self._pending and not self._closing:
+                    # Let concurrent writers pile onto this sync
+                    self._cond.wait(self.commit_delay)
+                lines = self._pending
+                self._pending = []
+                target = self._appended_seq
+                compact_ticket = self._compact_requested
+                compact = self._compactions_done < compact_ticket
+                closing = self._closing and not compact
+            written = not lines or self._write(lines, target)
+            if compact:
+                self._run_compaction(compact_ticket)
+            if self.failed:
+                return
+            if not written:
+                with self._cond:
+                    if self._closing:
+                        logger.error("Closing journal %s with %d record(s) not on disk", self.path, len(self._pending))
+                        return
+                    self._cond.wait(RETRY_SECONDS)
+            elif closing:
+                with self._cond:
+                    if not self._pending:
+                        return
+
+    def _write(self, lines: List[bytes], target: int) -> bool:
+        """
+        Append ``lines``, the records up to ``target`` not yet on disk, and
+        fsync them. On failure they are requeued for the next attempt and
+        ``False`` is returned.
+        """
+        if self.failed:
+            with self._cond:
+                self._pending[:0] = lines
+            return False
+        data = b"".join(lines)
+        started = time.perf_counter()
+        try:
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            logger.error("Error writing journal %s: %s", self.path, e)
+            failed = not self._cut_back()
+            with self._cond:
+                self._pending[:0] = lines
+                self.error = e
+                self.failed = failed
+                self._cond.notify_all()
+            return False
+        _JOURNAL_WRITE_SECONDS.observe(time.perf_counter() - started)
+        _JOURNAL_WRITTEN_BYTES.inc(len(data))
+        with self._cond:
+            self._size += len(data)
+            self._synced_seq = target
+            self.error = None
+            self.fsyncs += 1
+            self._cond.notify_all()
+        return True
+
+    def _cut_back(self) -> bool:
+        """
+        Truncate the file to its last record on disk, dropping whatever part
+        of a failed batch reached it, and reopen it; ``False`` if that fails.
+        """
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        try:
+            with open(self.path, "r+b") as f:
+                f.truncate(self._size)
+                os.fsync(f.fileno())
+            self._file = open(self.path, "ab")
+        except OSError as e:
+            logger.critical("Journal %s can't be cut back to its last record and stops writing: %s", self.path, e)
+            return False
+        return True
+
+    def _run_compaction(self, ticket: int):
+        try:
+            if self._compact is not None:
+                mark = self._compact()
+                # The snapshot can only cover records appended before it was
+                # taken, and all of those were queued before this point
+                with self._cond:
+                    lines = self._pending
+                    self._pending = []
+                    target = self._appended_seq
+                if lines and not self._write(lines, target):
+                    # The file must hold every record after those dropped
+                    # by line count; keep it whole until they are written
+                    return
+                self._truncate(mark)
+        except Exception as e:
+            logger.error("Error compacting journal %s: %s", self.path, e)
+        finally:
+            with self._cond:
+                self._compactions_done = max(self._compactions_done, ticket)
+                self._cond.notify_all()
+
+    def _truncate(self, mark: int):
+        """Drop the records up to ``mark`` from the file, keeping any written after it."""
+        skip = mark - self._file_first_seq + 1
+        if skip <= 0:
+            return
+        self._file.close()
+        with open(self.path, "rb") as f:
+            lines = f.readlines()
+        data = b"".join(lines[skip:])
+        write_atomic(self.path, data)
+        self._file = open(self.path, "ab")
+        self._size = len(data)
+        with self._cond:
+            self._file_first_seq = mark + 1
+            self.records = self._appended_seq - mark
+
+    def close(self):
+        """Write out everything queued and stop the writer thread."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._writer.join()
+        if not self._file.closed:
+            self._file.close()
+        # The callback usually points back at the owning repository
+        self._compact = None
@@ -0,0 +1,383 @@
+import logging
+import os
+import threading
+import uuid
+from collections import Counter
+from contextlib import nullcontext
+from typing import ContextManager, Dict, Iterable, List, Optional, Tuple
+from app import config
+from app.schemas.device import Device, DeviceQuery, DeviceSearch, GroupPolicy
+from app.storage.blocklist_bits import BlocklistChange, blocklist_to_mask
+from app.storage.device_store import DeviceStore
+from app.storage.group_policies import known_groups, seed_policies
+from app.storage.journal import DeviceJournal, acquire_process_lock, release_process_lock
+from app.storage.pagination import DevicePage
+from app.storage.repository import DeviceRepository
+from app.storage.search_index import TextIndex
+from app.storage.snapshot import bulk_load, load_devices, read_groups, write_groups, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class JsonDeviceRepository(DeviceRepository):
+    """
+    The whole fleet in memory (``DeviceStore``), persisted as a JSON snapshot
+    plus an append-only journal of mutations.
+
+    ``get`` returns the live object; callers mutate a copy and ``save`` swaps
+    it in, re-indexes it and queues a journal record. Groups and their
+    policies are journaled the same way and snapshotted to
+    ``<data file>.groups``. Every operation holds
+    ``_lock`` only for in-memory work: journal records are written and
+    fsynced by the journal's writer thread, and snapshots are serialized and
+    written outside the lock, so reads never wait on disk I/O. ``sync``
+    waits for durability.
+
+    Single-process only: the data file is locked on ``load`` so a second
+    process (e.g. another uvicorn worker) fails fast instead of overwriting
+    this one's snapshots. Revisions live in memory and restart with a new
+    epoch on every start.
+
+    ``read_only`` loads the data without writing to it (for exports such as
+    ``app.storage.migrate``): no journal is opened, policies seeded on first
+    load stay in memory, and mutations raise ``RuntimeError``.
+    """
+
+    def __init__(
+        self,
+        data_file_path: str = config.DATA_FILE_PATH,
+        compact_every: int = config.JOURNAL_COMPACT_EVERY,
+        commit_delay: float = config.JOURNAL_COMMIT_DELAY,
+        stream_threshold: int = config.LOAD_STREAM_BYTES,
+        read_only: bool = False
+    ):
+        self.data_file_path = data_file_path
+        self.read_only = read_only
+        self.journal_path = f"{data_file_path}.journal"
+        self.compact_every = compact_every
+        self.commit_delay = commit_delay
+        self.stream_threshold = stream_threshold
+        self.store = DeviceStore()
+        self.journal: Optional[DeviceJournal] = None
+        self.replayed_records = 0
+        self.epoch = uuid.uuid4().hex[:8]
+        self._revision = 0
+        self._lock = threading.RLock()
+        self._process_lock = None
+        self._text_builder: Optional[threading.Thread] = None
+
+    def load(self):
+        """Load the groups and the last snapshot, then replay the journal tail on top of them."""
+        if self._process_lock is None:
+            self._process_lock = acquire_process_lock(f"{self.data_file_path}.lock")
+        with bulk_load():
+            try:
+                groups = read_groups(self.data_file_path)
+            except Exception as e:
+                logger.error("Error loading groups: %s", e)
+                groups = None
+            for group in groups or ():
+                self.store.set_group(group)
+            try:
+                if os.path.exists(self.data_file_path):
+                    self.store.load(load_devices(self.data_file_path, self.stream_threshold))
+                else:
+                    logger.warning("Data file %s not found", self.data_file_path)
+                    self.store.clear()
+            except Exception as e:
+                logger.error("Error loading devices: %s", e)
+                self.store.clear()
+
+            self.replayed_records = 0
+            try:
+                for record in DeviceJournal.replay(self.journal_path):
+                    self._apply_journal_record(record)
+                    self.replayed_records += 1
+            except Exception as e:
+                logger.error("Error replaying journal %s: %s", self.journal_path, e)
+            promoted = self._seed_groups() if groups is None else None
+
+        if self.read_only:
+            with self._lock:
+                self._revision += 1
+            return
+        if self.journal is None:
+            self.journal = DeviceJournal(
+                self.journal_path,
+                commit_delay=self.commit_delay,
+                compact=self._write_snapshot
+            )
+        if promoted is not None:
+            # The seeded groups are only written once the devices that keep
+            # their own settings are durably marked custom
+            if promoted:
+                self._journal({"op": "upsert_many", "devices": [device.model_dump() for device in promoted]})
+                self.sync()
+            write_groups(self.data_file_path, self.store.groups.all())
+        with self._lock:
+            self._revision += 1
+        if self.store.text_stale:
+            self._text_builder = threading.Thread(target=self._build_text_index, name="text-index", daemon=True)
+            self._text_builder.start()
+
+    def _build_text_index(self):
+        """
+        Build the search index after load, holding ``_lock`` only to take
+        the texts and to swap the index in (catching up on devices saved in
+        between), so neither startup nor requests wait for it.
+        """
+        try:
+            with self._lock:
+                generation, texts = self.store.text_snapshot()
+            index = TextIndex()
+            index.load(texts.items())
+            with self._lock:
+                self.store.install_text(generation, texts, index)
+        except Exception as e:
+            logger.error("Error building the search index: %s", e)
+
+    def _seed_groups(self) -> List[Device]:
+        """
+        Give every group a policy the first time this data file is served
+        (see ``seed_policies``). Devices without a custom blocklist whose
+        settings differ from their group's new policy keep them as a custom
+        blocklist; those devices are returned.
+        """
+        devices = self.store.all()
+        inherited = Counter(
+            (device.group.id, blocklist_to_mask(device.blocklist))
+            for device in devices
+            if not device.has_custom_blocklist
+        )
+        policies = seed_policies(
+            known_groups(device.group for device in devices),
+            ((group_id, mask, count) for (group_id, mask), count in inherited.items())
+        )
+        for group in policies:
+            self.store.set_group(group)
+        promoted = []
+        for device in devices:
+            if not device.has_custom_blocklist and blocklist_to_mask(device.blocklist) != self.store.groups.mask(device.group.id):
+                device = device.model_copy(update={"has_custom_blocklist": True})
+                self.store.update(device)
+                promoted.append(device)
+        return promoted
+
+    def _apply_journal_record(self, record: Dict):
+        if record.get("op") == "group":
+            self.store.set_group(GroupPolicy(**record["group"]))
+        elif record.get("op") == "upsert":
+            self.store.update(Device(**record["device"]))
+        elif record.get("op") == "upsert_many":
+            for device in record["devices"]:
+                self.store.update(Device(**device))
+        elif record.get("op") == "blocklist":
+            if "masks" in record:
+                self.store.assign_blocklists(record["ids"], record["masks"])
+            else:
+                change = BlocklistChange(record["set"], record["clear"], record["toggle"])
+                self.store.apply_blocklist(record["ids"], change)
+
+    def _write_snapshot(self) -> int:
+        """
+        Snapshot the groups and the fleet and return the last journal record
+        they cover. Only collecting them happens under the lock; they are
+        replaced, never mutated, once saved, so serializing them afterwards
+        is safe.
+        """
+        with self._lock:
+            groups = self.store.groups.all()
+            devices = self.store.all()
+            mark = self.journal.appended_seq
+        write_groups(self.data_file_path, groups)
+        write_snapshot(self.data_file_path, devices)
+        return mark
+
+    def flush(self):
+        """Write a full snapshot atomically and drop the journal records it covers."""
+        if self.journal is not None:
+            self.journal.request_compaction(wait=True)
+
+    def sync(self):
+        """Wait until every mutation so far is on disk; raises if the journal can't write it."""
+        if self.journal is not None:
+            self.journal.sync()
+
+    def close(self):
+        if self._text_builder is not None:
+            self._text_builder.join()
+            self._text_builder = None
+        if self.journal is not None:
+            if self.journal.records:
+                self.flush()
+            self.journal.close()
+            self.journal = None
+        release_process_lock(self._process_lock)
+        self._process_lock = None
+
+    def transaction(self) -> ContextManager:
+        # Each operation is atomic on its own; DeviceController serializes
+        # read-modify-write cycles per device with its lock stripes
+        return nullcontext()
+
+    def record_change(self, event: Dict) -> int:
+        with self._lock:
+            self._revision += 1
+            event["revision"] = self._revision
+            return self._revision
+
+    def revision(self) -> int:
+        return self._revision
+
+    def changes_since(self, revision: int, limit: int = 1000) -> List[Tuple[int, str]]:
+        return []
+
+    def _journal(self, record: Dict):
+        """
+        Queue one mutation record; compaction is requested once the journal
+        grows long enough. Raises if the journal is closed or has failed, or
+        the repository is read-only.
+        """
+        if self.journal is None:
+            raise RuntimeError(f"{self.data_file_path} is not open for writing")
+        self.journal.append(record)
+        if self.compact_every and self.journal.records >= self.compact_every and not self.journal.compaction_pending:
+            self.journal.request_compaction()
+
+    def groups(self) -> List[GroupPolicy]:
+        with self._lock:
+            return self.store.groups.all()
+
+    def get_group(self, group_id: int) -> Optional[GroupPolicy]:
+        with self._lock:
+            return self.store.groups.get(group_id)
+
+    def save_group(self, group: GroupPolicy):
+        record = {"op": "group", "group": group.model_dump()}
+        with self._lock:
+            self.store.set_group(group)
+            self._journal(record)
+
+    def next_id(self) -> int:
+        with self._lock:
+            return max(self.store.by_id, default=0) + 1
+
+    def get(self, device_id: int) -> Optional[Device]:
+        with self._lock:
+            return self.store.get(device_id)
+
+    def all(self) -> List[Device]:
+        with self._lock:
+            return self.store.all()
+
+    def find_by_mac(self, mac: str) -> List[Device]:
+        with self._lock:
+            return self.store.find_by_mac(mac)
+
+    def find_by_ip(self, ip: str) -> List[Device]:
+        with self._lock:
+            return self.store.find_by_ip(ip)
+
+    def find(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> List[Device]:
+        with self._lock:
+            return self.store.filter(group_id=group_id, category=category, is_active=is_active)
+
+    def count(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> int:
+        with self._lock:
+            ids = self.store.match_ids(group_id=group_id, category=category, is_active=is_active)
+            return len(self.store) if ids is None else len(ids)
+
+    def match_ids(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> List[int]:
+        with self._lock:
+            ids = self.store.match_ids(group_id=group_id, category=category, is_active=is_active)
+            return sorted(self.store.by_id if ids is None else ids)
+
+    def active_last_seen(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            by_id = self.store.by_id
+            return [(device_id, by_id[device_id].last_seen) for device_id in self.store.ids_by_active(True)]
+
+    def classification_ages(self) -> List[Tuple[int, str, float]]:
+        with self._lock:
+            return [
+                (device.id, device.ai_classification.last_classified, device.ai_classification.confidence)
+                for device in self.store.by_id.values()
+            ]
+
+    def blocklist_counts(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> Dict[str, int]:
+        with self._lock:
+            ids = self.store.match_ids(group_id=group_id, category=category, is_active=is_active)
+            return self.store.blocklist_counts(ids)
+
+    def apply_blocklist(self, device_ids: Iterable[int], change: BlocklistChange) -> List[int]:
+        with self._lock:
+            updated = self.store.apply_blocklist(device_ids, change)
+            if updated:
+                record = {
+                    "op": "blocklist",
+                    "ids": updated,
+                    "set": change.set_mask,
+                    "clear": change.clear_mask,
+                    "toggle": change.toggle_mask
+                }
+                if change.toggle_mask:
+                    # A toggle replayed twice undoes itself; log the outcome instead
+                    record["masks"] = self.store.blocklist_masks(updated)
+                self._journal(record)
+            return updated
+
+    def query(self, query: DeviceQuery) -> DevicePage:
+        with self._lock:
+            return self.store.query(query)
+
+    def search(self, search: DeviceSearch) -> DevicePage:
+        builder = self._text_builder
+        if builder is not None and search.q:
+            # Waiting here, outside the lock, beats building a second index
+            builder.join()
+        with self._lock:
+            return self.store.search(search)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return self.store.summary()
+
+    def verify_summary(self, repair: bool = False) -> Dict:
+        with self._lock:
+            return self.store.verify_summary(repair=repair)
+
+    def save(self, device: Device):
+        record = {"op": "upsert", "device": device.model_dump()}
+        with self._lock:
+            self.store.update(device)
+            self._journal(record)
+
+    def save_many(self, devices: Iterable[Device]):
+        devices = list(devices)
+        if not devices:
+            return
+        record = {"op": "upsert_many", "devices": [device.model_dump() for device in devices]}
+        with self._lock:
+            for device in devices:
+                self.store.update(device)
+            self._journal(record)
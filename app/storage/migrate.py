@@ -0,0 +1,49 @@
+"""
+Import a JSON device file (plus its groups and journal, if any) into the SQLite backend.
+
+    python -m app.storage.migrate [--source app/data/devices.sample.json] [--target app/data/devices.db]
+"""
+import argparse
+import time
+from app import config
+from app.storage.json_repository import JsonDeviceRepository
+from app.storage.sqlite_repository import SqliteDeviceRepository
+
+
+def migrate_json_to_sqlite(source: str, target: str, batch_size: int = 5000) -> int:
+    # Read-only: the source, journal and groups file are left as they are
+    json_repository = JsonDeviceRepository(data_file_path=source, read_only=True)
+    try:
+        json_repository.load()
+        groups = json_repository.groups()
+        devices = json_repository.all()
+    finally:
+        json_repository.close()
+
+    sqlite_repository = SqliteDeviceRepository(db_path=target)
+    sqlite_repository.load()
+    try:
+        for group in groups:
+            sqlite_repository.save_group(group)
+        for start in range(0, len(devices), batch_size):
+            sqlite_repository.save_many(devices[start:start + batch_size])
+    finally:
+        sqlite_repository.close()
+    return len(devices)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import JSON device data into the SQLite storage backend")
+    parser.add_argument("--source", default=config.DATA_FILE_PATH, help="JSON device file to import")
+    parser.add_argument("--target", default=config.SQLITE_PATH, help="SQLite database to create or update")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Devices per transaction")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    imported = migrate_json_to_sqlite(args.source, args.target, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"Imported {imported} devices from {args.source} into {args.target} in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
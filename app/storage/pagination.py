@@ -0,0 +1,70 @@
+import base64
+import ipaddress
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from app.schemas.device import Device
+
+
+def ip_sort_key(ip: str) -> str:
+    """Order IPs numerically (v4 before v6) with a plain string comparison."""
+    try:
+        address = ipaddress.ip_address(ip.strip())
+    except ValueError:
+        return f"9{ip}"
+    return f"{address.version}{int(address):032x}"
+
+
+SORT_KEYS: Dict[str, Callable[[Device], Any]] = {
+    "id": lambda device: device.id,
+    "hostname": lambda device: device.hostname.lower(),
+    "given_name": lambda device: device.given_name.lower(),
+    "vendor": lambda device: device.vendor.lower(),
+    "ip": lambda device: ip_sort_key(device.ip),
+    "last_seen": lambda device: device.last_seen,
+}
+
+
+# Type of the value SORT_KEYS (and the search rank) put in a cursor
+CURSOR_VALUE_TYPES: Dict[str, Tuple[type, ...]] = {
+    "id": (int,),
+    "hostname": (str,),
+    "given_name": (str,),
+    "vendor": (str,),
+    "ip": (str,),
+    "last_seen": (str,),
+    "rank": (int, float),
+}
+
+
+class DevicePage(NamedTuple):
+    devices: List[Device]
+    next_cursor: Optional[str]
+    total: int
+
+
+def encode_cursor(sort: str, device: Device) -> str:
+    return encode_position(sort, SORT_KEYS[sort.lstrip("-")](device), device.id)
+
+
+def encode_position(sort: str, value: Any, device_id: int) -> str:
+    """Cursor resuming after ``(value, device_id)`` in ``sort`` order (also used for search rank)."""
+    payload = json.dumps([sort, value, device_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """Return the ``(sort value, id)`` to resume after; raises ValueError if the cursor is bad."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, device_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor was issued for sort '{cursor_sort}', not '{sort}'")
+    # A forged position would otherwise fail comparing against real sort keys
+    expected = CURSOR_VALUE_TYPES.get(sort.lstrip("-"), ())
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise ValueError("Invalid cursor")
+    if isinstance(device_id, bool) or not isinstance(device_id, int):
+        raise ValueError("Invalid cursor")
+    return value, device_id
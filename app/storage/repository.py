@@ -0,0 +1,197 @@
+from abc import ABC, abstractmethod
+from typing import ContextManager, Dict, Iterable, List, Optional, Tuple
+from app.schemas.device import Device, DeviceQuery, DeviceSearch, GroupPolicy
+from app.storage.blocklist_bits import BlocklistChange
+from app.storage.pagination import DevicePage
+
+
+class DeviceRepository(ABC):
+    """
+    Storage backend behind ``DeviceController``.
+
+    Callers read a device, mutate it, then hand it back through ``save`` (or
+    ``save_many`` for a batch, which must be persisted as one unit). Backends
+    decide whether ``get`` returns a live object or a fresh copy, so callers
+    must not rely on either.
+
+    Devices without a custom blocklist follow their group's policy: reads
+    return them with the group's current blocklist whatever was saved, and
+    blocklist filters and counts use it too, so ``save_group`` changing a
+    policy never rewrites the group's devices.
+
+    Every mutation happens inside ``transaction()`` and is stamped with a
+    revision through ``record_change``. ``(epoch, revision)`` identifies a
+    state of the fleet; a ``shared`` backend keeps both in the store itself,
+    so several processes serving the same store agree on them.
+    """
+
+    # True when other processes may write the same store concurrently
+    shared = False
+
+    # Identifies the revision sequence; changes when revisions restart
+    epoch: str = ""
+
+    @abstractmethod
+    def transaction(self) -> ContextManager:
+        """
+        Exclusive write section: reads and writes inside it see no
+        concurrent writer (in this or, for shared backends, any process) and
+        are committed as one unit. Re-entrant.
+        """
+
+    @abstractmethod
+    def record_change(self, event: Dict) -> int:
+        """
+        Assign the next revision to ``event`` (stored as ``event["revision"]``)
+        and return it. Must be called inside ``transaction()``; shared
+        backends persist the event with the writes it describes.
+        """
+
+    @abstractmethod
+    def revision(self) -> int:
+        """Latest committed revision, including commits by other processes."""
+
+    @abstractmethod
+    def changes_since(self, revision: int, limit: int = 1000) -> List[Tuple[int, str]]:
+        """
+        ``(revision, event JSON)`` committed after ``revision``, oldest first.
+        Only shared backends keep a change log; others return ``[]``.
+        """
+
+    @abstractmethod
+    def load(self):
+        """Open the backend and bring its state up to date."""
+
+    @abstractmethod
+    def sync(self):
+        """Block until every change saved so far is durable."""
+
+    @abstractmethod
+    def flush(self):
+        """Make everything saved so far durable in its most compact form."""
+
+    @abstractmethod
+    def close(self):
+        """Flush and release files/connections."""
+
+    @abstractmethod
+    def groups(self) -> List[GroupPolicy]:
+        """Every group with its policy, by id."""
+
+    @abstractmethod
+    def get_group(self, group_id: int) -> Optional[GroupPolicy]:
+        ...
+
+    @abstractmethod
+    def save_group(self, group: GroupPolicy):
+        """
+        Add or replace a group. Devices embed ``{id, name, is_default}``, so
+        a renamed group's devices must be saved again by the caller.
+        """
+
+    @abstractmethod
+    def next_id(self) -> int:
+        """
+        An id above every stored device's, for a new device. Call it inside
+        ``transaction()`` and save the device in the same transaction.
+        """
+
+    @abstractmethod
+    def get(self, device_id: int) -> Optional[Device]:
+        ...
+
+    @abstractmethod
+    def all(self) -> List[Device]:
+        ...
+
+    @abstractmethod
+    def find_by_mac(self, mac: str) -> List[Device]:
+        ...
+
+    @abstractmethod
+    def find_by_ip(self, ip: str) -> List[Device]:
+        ...
+
+    @abstractmethod
+    def find(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> List[Device]:
+        ...
+
+    @abstractmethod
+    def count(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> int:
+        ...
+
+    @abstractmethod
+    def match_ids(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> List[int]:
+        """Ids of matching devices, ascending, without loading the devices."""
+
+    @abstractmethod
+    def active_last_seen(self) -> List[Tuple[int, str]]:
+        """``(id, last_seen)`` of every active device, without loading the devices."""
+
+    @abstractmethod
+    def classification_ages(self) -> List[Tuple[int, str, float]]:
+        """``(id, last_classified, confidence)`` of every device, without loading the devices."""
+
+    @abstractmethod
+    def blocklist_counts(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> Dict[str, int]:
+        """Number of matching devices with each blocklist field enabled."""
+
+    @abstractmethod
+    def apply_blocklist(self, device_ids: Iterable[int], change: BlocklistChange) -> List[int]:
+        """
+        Apply one bitwise blocklist edit to many devices, persisted as a
+        single unit. Returns the ids that existed and were changed.
+        """
+
+    @abstractmethod
+    def query(self, query: DeviceQuery) -> DevicePage:
+        """
+        Filter, sort and page through devices.
+
+        Raises ``ValueError`` for a cursor that is malformed or was issued
+        for a different sort.
+        """
+
+    @abstractmethod
+    def search(self, search: DeviceSearch) -> DevicePage:
+        """
+        Text, MAC prefix and IP/CIDR search, best match first (see
+        ``app.storage.search_index`` for the ranking). Paged with a cursor
+        over ``(rank, id)``; raises ``ValueError`` for a bad cursor.
+        """
+
+    @abstractmethod
+    def summary(self) -> Dict:
+        """Return ``{"total", "active", "by_group", "by_category"}``."""
+
+    @abstractmethod
+    def verify_summary(self, repair: bool = False) -> Dict:
+        """Recount the summary from the raw records and report drift."""
+
+    @abstractmethod
+    def save(self, device: Device):
+        ...
+
+    @abstractmethod
+    def save_many(self, devices: Iterable[Device]):
+        ...
@@ -0,0 +1,251 @@
+import ipaddress
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+import numpy as np
+from app.schemas.device import Device
+from app.storage.pagination import ip_sort_key
+
+
+# Searchable text fields, in the order ``search_texts`` returns them, and how
+# much a match in each one counts towards the rank
+SEARCH_FIELDS = ("hostname", "given_name", "vendor", "os_name", "indicators")
+FIELD_WEIGHTS = (3, 3, 2, 1, 1)
+
+# How a token matched a text: the whole text, its start, the start of a word
+# in it, or anywhere (substring matches need at least MIN_SUBSTRING chars)
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING = 4, 3, 2, 1
+MIN_SUBSTRING = 3
+
+_HEX = re.compile(r"[0-9A-F]")
+
+
+def search_texts(device: Device) -> Tuple[Tuple[str, ...], ...]:
+    """The lowercased searchable texts of a device, one tuple per ``SEARCH_FIELDS`` entry."""
+    return (
+        (device.hostname.lower(),),
+        (device.given_name.lower(),),
+        (device.vendor.lower(),),
+        (device.os_name.lower(),),
+        tuple(indicator.lower() for indicator in device.ai_classification.indicators)
+    )
+
+
+def tokenize(q: str) -> List[str]:
+    """Whitespace-separated, lowercased, de-duplicated query tokens."""
+    return list(dict.fromkeys(q.lower().split()))
+
+
+def match_weight(text: str, token: str) -> int:
+    if text == token:
+        return EXACT
+    if text.startswith(token):
+        return PREFIX
+    position = text.find(token)
+    if position < 0:
+        return 0
+    while position >= 0 and token[0].isalnum():
+        if not text[position - 1].isalnum():
+            return WORD_PREFIX
+        position = text.find(token, position + 1)
+    return SUBSTRING if len(token) >= MIN_SUBSTRING else 0
+
+
+def score(tokens: List[str], texts: Tuple[Tuple[str, ...], ...]) -> int:
+    """
+    Rank of a device for ``tokens``: for each token the best field weight
+    times match weight over its texts, summed. 0 when any token matches none
+    of them (every token must match somewhere).
+    """
+    total = 0
+    for token in tokens:
+        best = 0
+        for weight, values in zip(FIELD_WEIGHTS, texts):
+            for text in values:
+                best = max(best, weight * match_weight(text, token))
+        if not best:
+            return 0
+        total += best
+    return total
+
+
+def mac_prefix(value: str) -> str:
+    """
+    Normalize a MAC prefix (``aa:bb:cc``, ``AA-BB-CC``, ``aabbcc``...) to the
+    colon-separated upper-case form MACs are indexed under, so prefixes
+    compare as plain strings. Raises ``ValueError`` for non-hex input.
+    """
+    digits = re.sub(r"[\s:.-]", "", value.upper())
+    if not digits or len(digits) > 12 or len(_HEX.findall(digits)) != len(digits):
+        raise ValueError(f"Invalid MAC prefix '{value}'")
+    return ":".join(digits[index:index + 2] for index in range(0, len(digits), 2))
+
+
+def ip_bounds(value: str) -> Tuple[str, str]:
+    """
+    First and last ``ip_sort_key`` of an address or CIDR network, for a
+    range scan over IPs sorted by that key. Raises ``ValueError`` if invalid.
+    """
+    try:
+        network = ipaddress.ip_network(value.strip(), strict=False)
+    except ValueError:
+        raise ValueError(f"Invalid IP address or network '{value}'")
+    return ip_sort_key(str(network.network_address)), ip_sort_key(str(network.broadcast_address))
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+def _word_starts(text: str) -> Set[str]:
+    """The first one and two characters of every word in ``text``."""
+    starts = set()
+    for index, char in enumerate(text):
+        if char.isalnum() and (index == 0 or not text[index - 1].isalnum()):
+            starts.add(char)
+            starts.add(text[index:index + 2])
+    return starts
+
+
+def _bits(bitmap: int) -> np.ndarray:
+    """Positions of the set bits of ``bitmap``, ascending."""
+    data = np.frombuffer(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(data, bitorder="little"))
+
+
+def _bitmap(positions: List[int], size: int) -> int:
+    bits = np.zeros(size, dtype=bool)
+    bits[positions] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+class TextIndex:
+    """
+    Token lookup over the distinct searchable texts.
+
+    Many devices share a vendor, OS or indicator, so the index is kept per
+    distinct text rather than per device: every text gets a slot, each
+    trigram maps to a bitmap (a Python int) of the slots of the texts
+    containing it, and each text to the device(s) having it. A token of at
+    least three characters ANDs the bitmaps of its trigrams and confirms the
+    survivors with a substring test. Shorter tokens only match word starts,
+    so the first one and two characters of every word get bitmaps too (a
+    two-level prefix index). There are only a few thousand distinct keys,
+    so bitmaps stay far smaller than per-key sets of texts. Adding or
+    removing a device only touches its own texts.
+    """
+
+    def __init__(self):
+        self._trigrams: Dict[str, int] = {}
+        self._starts: Dict[str, int] = {}
+        self._slots: Dict[str, int] = {}
+        self._texts: List[Optional[str]] = []
+        self._free: List[int] = []
+        # text -> the one device id having it, or a set once it is shared
+        self._owners: Dict[str, Union[int, Set[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def clear(self):
+        self._trigrams.clear()
+        self._starts.clear()
+        self._slots.clear()
+        self._texts = []
+        self._free = []
+        self._owners.clear()
+
+    def _own(self, text: str, device_id: int) -> bool:
+        """Record ``device_id`` as an owner of ``text``; True if the text is new."""
+        owners = self._owners.get(text)
+        if owners is None:
+            self._owners[text] = device_id
+            return True
+        if isinstance(owners, set):
+            owners.add(device_id)
+        elif owners != device_id:
+            self._owners[text] = {owners, device_id}
+        return False
+
+    def add(self, device_id: int, texts: Iterable[str]):
+        for text in texts:
+            if not self._own(text, device_id):
+                continue
+            if self._free:
+                slot = self._free.pop()
+                self._texts[slot] = text
+            else:
+                slot = len(self._texts)
+                self._texts.append(text)
+            self._slots[text] = slot
+            bit = 1 << slot
+            for index, keys in ((self._trigrams, _trigrams(text)), (self._starts, _word_starts(text))):
+                for key in keys:
+                    index[key] = index.get(key, 0) | bit
+
+    def remove(self, device_id: int, texts: Iterable[str]):
+        for text in texts:
+            owners = self._owners.get(text)
+            if isinstance(owners, set):
+                owners.discard(device_id)
+                if len(owners) == 1:
+                    self._owners[text] = next(iter(owners))
+                continue
+            if owners != device_id:
+                continue
+            del self._owners[text]
+            slot = self._slots.pop(text)
+            self._texts[slot] = None
+            self._free.append(slot)
+            mask = ~(1 << slot)
+            for index, keys in ((self._trigrams, _trigrams(text)), (self._starts, _word_starts(text))):
+                for key in keys:
+                    bitmap = index.get(key, 0) & mask
+                    if bitmap:
+                        index[key] = bitmap
+                    else:
+                        index.pop(key, None)
+
+    def load(self, entries: Iterable[Tuple[int, Iterable[str]]]):
+        """Build from scratch, setting each bitmap in one pass rather than bit by bit."""
+        self.clear()
+        trigram_slots: Dict[str, List[int]] = {}
+        start_slots: Dict[str, List[int]] = {}
+        for device_id, texts in entries:
+            for text in texts:
+                if not self._own(text, device_id):
+                    continue
+                slot = len(self._texts)
+                self._texts.append(text)
+                self._slots[text] = slot
+                for positions, keys in ((trigram_slots, _trigrams(text)), (start_slots, _word_starts(text))):
+                    for key in keys:
+                        slots = positions.get(key)
+                        if slots is None:
+                            positions[key] = [slot]
+                        else:
+                            slots.append(slot)
+        size = len(self._texts)
+        self._trigrams = {key: _bitmap(slots, size) for key, slots in trigram_slots.items()}
+        self._starts = {key: _bitmap(slots, size) for key, slots in start_slots.items()}
+
+    def texts_matching(self, token: str) -> List[str]:
+        """Indexed texts the token can match (see ``match_weight``)."""
+        if len(token) >= MIN_SUBSTRING:
+            bitmap = -1
+            for trigram in _trigrams(token):
+                bitmap &= self._trigrams.get(trigram, 0)
+                if not bitmap:
+                    return []
+            return [text for text in map(self._texts.__getitem__, _bits(bitmap).tolist()) if token in text]
+        bitmap = self._starts.get(token, 0)
+        return list(map(self._texts.__getitem__, _bits(bitmap).tolist())) if bitmap else []
+
+    def ids_matching(self, token: str, within: Optional[Set[int]] = None) -> Set[int]:
+        ids = set()
+        for text in self.texts_matching(token):
+            owners = self._owners[text]
+            if isinstance(owners, set):
+                ids.update(owners if within is None else owners & within)
+            elif within is None or owners in within:
+                ids.add(owners)
+        return ids
@@ -0,0 +1,243 @@
+import codecs
+import gc
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Type
+from pydantic import BaseModel, TypeAdapter
+from app.schemas.device import AIClassification, Blocklist, Device, Group, GroupPolicy
+from app.storage.journal import write_atomic
+from app.utils.metrics import PERSISTENCE_WRITE_SECONDS, PERSISTENCE_WRITTEN_BYTES
+
+
+MANIFEST_FORMAT = 1
+STREAM_CHUNK_SIZE = 1 << 20
+
+_device_list_adapter = TypeAdapter(List[Device])
+_group_list_adapter = TypeAdapter(List[GroupPolicy])
+
+_SNAPSHOT_WRITE_SECONDS = PERSISTENCE_WRITE_SECONDS.labels("snapshot")
+_SNAPSHOT_WRITTEN_BYTES = PERSISTENCE_WRITTEN_BYTES.labels("snapshot")
+
+# Changes whenever a field, type or constraint of Device changes, so a
+# manifest written for an older schema is never trusted
+SCHEMA_FINGERPRINT = hashlib.sha256(
+    json.dumps(Device.model_json_schema(), sort_keys=True).encode("utf-8")
+).hexdigest()[:16]
+
+
+# Cleared by the first bulk_load: only the startup load touches the GC
+_startup_load = True
+
+
+@contextmanager
+def bulk_load():
+    """
+    Pause the cyclic GC while the fleet is built at startup and freeze the
+    result.
+
+    Loading allocates millions of container objects, each allocation burst
+    triggering a collection that rescans everything built so far; that is
+    more than half the load time for large fleets. Devices hold no
+    reference cycles, so nothing is lost by not collecting, and freezing
+    moves them out of the generations later collections walk.
+
+    Both settings are process-wide, so only the first load in the process
+    (before any request is served) changes them; later loads run with the
+    GC as it is.
+    """
+    global _startup_load
+    if not _startup_load:
+        yield
+        return
+    _startup_load = False
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.freeze()
+        if enabled:
+            gc.enable()
+
+
+def manifest_path(path: str) -> str:
+    return f"{path}.manifest"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(path: str) -> Optional[Dict]:
+    try:
+        with open(manifest_path(path), "rb") as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(path: str, devices: List[Device]):
+    """
+    Atomically write ``devices`` to ``path`` followed by a manifest recording
+    its checksum and schema. The manifest goes second, so a crash between
+    the two leaves a manifest that no longer matches and is ignored.
+    """
+    started = time.perf_counter()
+    data = _device_list_adapter.dump_json(devices)
+    write_atomic(path, data)
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "count": len(devices),
+        "schema": SCHEMA_FINGERPRINT
+    }
+    write_atomic(manifest_path(path), json.dumps(manifest).encode("utf-8"))
+    _SNAPSHOT_WRITE_SECONDS.observe(time.perf_counter() - started)
+    _SNAPSHOT_WRITTEN_BYTES.inc(len(data))
+
+
+def groups_path(path: str) -> str:
+    return f"{path}.groups"
+
+
+def write_groups(path: str, groups: List[GroupPolicy]):
+    """Atomically write the groups (and their policies) kept alongside the snapshot at ``path``."""
+    write_atomic(groups_path(path), _group_list_adapter.dump_json(groups, indent=2))
+
+
+def read_groups(path: str) -> Optional[List[GroupPolicy]]:
+    """The groups stored alongside ``path``, or ``None`` if there are none yet."""
+    try:
+        with open(groups_path(path), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return _group_list_adapter.validate_json(data)
+
+
+def is_trusted(path: str) -> bool:
+    """Whether ``path`` is byte-for-byte a snapshot this server wrote for the current schema."""
+    manifest = read_manifest(path)
+    if not manifest or manifest.get("format") != MANIFEST_FORMAT or manifest.get("schema") != SCHEMA_FINGERPRINT:
+        return False
+    return manifest.get("sha256") == file_sha256(path)
+
+
+def _trusted_factory(model: Type[BaseModel]) -> Callable[[Dict], BaseModel]:
+    """
+    Build ``model`` instances straight from already-valid field dicts.
+
+    ``model_construct`` is slower than full validation (it is per-field
+    Python), so this sets the instance state directly. Only safe for data
+    that is known to match the schema exactly, i.e. ``is_trusted`` snapshots.
+    """
+    fields = frozenset(model.model_fields)
+    new = model.__new__
+    setattr_ = object.__setattr__
+
+    def build(values: Dict) -> BaseModel:
+        instance = new(model)
+        setattr_(instance, "__dict__", values)
+        setattr_(instance, "__pydantic_fields_set__", set(fields))
+        setattr_(instance, "__pydantic_extra__", None)
+        setattr_(instance, "__pydantic_private__", None)
+        return instance
+
+    return build
+
+
+_build_group = _trusted_factory(Group)
+_build_blocklist = _trusted_factory(Blocklist)
+_build_classification = _trusted_factory(AIClassification)
+_build_device = _trusted_factory(Device)
+
+
+def trusted_device(values: Dict) -> Device:
+    values["group"] = _build_group(values["group"])
+    values["blocklist"] = _build_blocklist(values["blocklist"])
+    values["ai_classification"] = _build_classification(values["ai_classification"])
+    return _build_device(values)
+
+
+def iter_json_array(path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator:
+    """
+    Yield the elements of the top-level JSON array in ``path`` one at a time,
+    holding only the current chunk and element in memory.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    started = False
+    with open(path, "rb") as f:
+        eof = False
+        while True:
+            # Skip whitespace and separators; refill when we run dry
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position >= len(buffer):
+                if eof:
+                    raise ValueError("Unexpected end of device file")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + utf8.decode(chunk, final=eof)
+                position = 0
+                continue
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Device file is not a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+                # Complete only once a separator follows: a number cut off
+                # by the chunk (the 12 of 12.5) decodes too
+                following = end
+                while following < len(buffer) and buffer[following] in " \t\r\n":
+                    following += 1
+                if following == len(buffer) or buffer[following] not in ",]":
+                    raise ValueError("Expected ',' or ']' after an array element")
+            except ValueError:
+                # Element spans the chunk boundary
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + utf8.decode(chunk, final=eof)
+                position = 0
+                continue
+            yield item
+            position = end
+
+
+def load_devices(path: str, stream_threshold: int = 0) -> Iterator[Device]:
+    """
+    Yield the devices stored in ``path`` by the fastest safe route:
+
+    - a snapshot this server wrote (checksum and schema match its manifest)
+      is rebuilt without revalidation
+    - anything else is validated as a whole array straight from bytes
+    - files of at least ``stream_threshold`` bytes (0 disables) are parsed
+      one element at a time to bound peak memory
+
+    Raises ``ValueError`` (incl. ``pydantic.ValidationError``) on bad data.
+    """
+    trusted = is_trusted(path)
+    if stream_threshold and os.path.getsize(path) >= stream_threshold:
+        build = trusted_device if trusted else Device.model_validate
+        return (build(item) for item in iter_json_array(path))
+    with open(path, "rb") as f:
+        data = f.read()
+    if trusted:
+        return (trusted_device(item) for item in json.loads(data))
+    return iter(_device_list_adapter.validate_json(data))
@@ -0,0 +1,808 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app import config
+from app.schemas.device import Device, DeviceQuery, DeviceSearch, Group, GroupPolicy
+from app.storage.blocklist_bits import FIELD_BITS, BlocklistChange, blocklist_to_mask, fields_to_mask
+from app.storage.device_store import normalize_mac
+from app.storage.group_policies import GroupPolicies, known_groups, seed_policies
+from app.storage.pagination import SORT_KEYS, DevicePage, decode_cursor, encode_cursor, encode_position
+from app.storage.repository import DeviceRepository
+from app.storage.search_index import MIN_SUBSTRING, ip_bounds, mac_prefix, score, search_texts, tokenize
+from app.storage.summary_counters import SummaryCounters
+from app.utils.metrics import PERSISTENCE_WRITE_SECONDS
+
+
+SCHEMA_VERSION = 6
+
+# Derived columns, in the order ``_row`` produces them (after ``id``).
+COLUMNS = (
+    ("mac", "TEXT NOT NULL"),
+    ("ip", "TEXT NOT NULL"),
+    ("group_id", "INTEGER NOT NULL"),
+    ("group_name", "TEXT NOT NULL"),
+    ("category", "TEXT NOT NULL"),
+    ("is_active", "INTEGER NOT NULL"),
+    ("vendor_key", "TEXT NOT NULL DEFAULT ''"),
+    ("has_custom_blocklist", "INTEGER NOT NULL DEFAULT 0"),
+    ("blocked", "INTEGER NOT NULL DEFAULT 0"),
+    ("hostname_key", "TEXT NOT NULL DEFAULT ''"),
+    ("given_name_key", "TEXT NOT NULL DEFAULT ''"),
+    ("ip_key", "TEXT NOT NULL DEFAULT ''"),
+    ("last_seen", "TEXT NOT NULL DEFAULT ''"),
+    ("os_name_key", "TEXT NOT NULL DEFAULT ''"),
+    ("indicators_key", "TEXT NOT NULL DEFAULT ''"),
+    ("data", "TEXT NOT NULL"),
+)
+
+TABLE_SQL = "CREATE TABLE IF NOT EXISTS devices (id INTEGER PRIMARY KEY, {})".format(
+    ", ".join(f"{name} {definition}" for name, definition in COLUMNS)
+)
+
+INDEXES_SQL = """
+CREATE INDEX IF NOT EXISTS idx_devices_mac ON devices (mac);
+CREATE INDEX IF NOT EXISTS idx_devices_ip ON devices (ip);
+CREATE INDEX IF NOT EXISTS idx_devices_group ON devices (group_id, is_active);
+CREATE INDEX IF NOT EXISTS idx_devices_category ON devices (category, is_active);
+CREATE INDEX IF NOT EXISTS idx_devices_active ON devices (is_active);
+CREATE INDEX IF NOT EXISTS idx_devices_group_name ON devices (group_name);
+CREATE INDEX IF NOT EXISTS idx_devices_vendor ON devices (vendor_key);
+CREATE INDEX IF NOT EXISTS idx_devices_hostname ON devices (hostname_key, id);
+CREATE INDEX IF NOT EXISTS idx_devices_given_name ON devices (given_name_key, id);
+CREATE INDEX IF NOT EXISTS idx_devices_ip_key ON devices (ip_key, id);
+CREATE INDEX IF NOT EXISTS idx_devices_last_seen ON devices (last_seen, id);
+"""
+
+# Trigram full-text index over the search columns (see
+# app.storage.search_index), kept in sync by triggers; an upsert that leaves
+# the text alone does not touch it. Indicators are joined with newlines.
+TEXT_COLUMNS = ("hostname_key", "given_name_key", "vendor_key", "os_name_key", "indicators_key")
+TEXT_TABLE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS device_text USING fts5(
+    {columns}, content='devices', content_rowid='id', tokenize='trigram'
+)
+""".format(columns=", ".join(TEXT_COLUMNS))
+_TEXT_INSERT = "INSERT INTO device_text (rowid, {columns}) VALUES (new.id, {values});".format(
+    columns=", ".join(TEXT_COLUMNS),
+    values=", ".join(f"new.{name}" for name in TEXT_COLUMNS)
+)
+_TEXT_DELETE = "INSERT INTO device_text (device_text, rowid, {columns}) VALUES ('delete', old.id, {values});".format(
+    columns=", ".join(TEXT_COLUMNS),
+    values=", ".join(f"old.{name}" for name in TEXT_COLUMNS)
+)
+TEXT_TRIGGERS_SQL = (
+    f"CREATE TRIGGER IF NOT EXISTS device_text_insert AFTER INSERT ON devices BEGIN {_TEXT_INSERT} END",
+    f"CREATE TRIGGER IF NOT EXISTS device_text_delete AFTER DELETE ON devices BEGIN {_TEXT_DELETE} END",
+    "CREATE TRIGGER IF NOT EXISTS device_text_update AFTER UPDATE ON devices WHEN {changed} BEGIN {delete} {insert} END".format(
+        changed=" OR ".join(f"old.{name} IS NOT new.{name}" for name in TEXT_COLUMNS),
+        delete=_TEXT_DELETE,
+        insert=_TEXT_INSERT
+    ),
+)
+
+# The /api/summary counters, kept by triggers in the same transaction as
+# every write to the columns they count, so reading the summary never scans
+# the devices. Kinds: 'total' and 'active' (key ''), 'group', 'category'.
+SUMMARY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS summary_counts (
+    kind TEXT NOT NULL, key TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (kind, key)
+) WITHOUT ROWID
+"""
+
+
+def _count_rows(row: str, sign: str) -> str:
+    return (
+        f"('total', '', {sign}1), ('active', '', {sign}{row}.is_active), "
+        f"('group', {row}.group_name, {sign}1), ('category', {row}.category, {sign}1)"
+    )
+
+
+_COUNT_UPSERT = "INSERT INTO summary_counts (kind, key, count) VALUES {rows} ON CONFLICT (kind, key) DO UPDATE SET count = count + excluded.count;"
+_COUNT_PRUNE = "DELETE FROM summary_counts WHERE count = 0 AND kind IN ('group', 'category');"
+SUMMARY_TRIGGERS_SQL = (
+    "CREATE TRIGGER IF NOT EXISTS summary_insert AFTER INSERT ON devices BEGIN {upsert} END".format(
+        upsert=_COUNT_UPSERT.format(rows=_count_rows("new", ""))
+    ),
+    "CREATE TRIGGER IF NOT EXISTS summary_delete AFTER DELETE ON devices BEGIN {upsert} {prune} END".format(
+        upsert=_COUNT_UPSERT.format(rows=_count_rows("old", "-")),
+        prune=_COUNT_PRUNE
+    ),
+    "CREATE TRIGGER IF NOT EXISTS summary_update AFTER UPDATE ON devices WHEN {changed} BEGIN {upsert} {prune} END".format(
+        changed=" OR ".join(f"old.{name} IS NOT new.{name}" for name in ("group_name", "category", "is_active")),
+        upsert=_COUNT_UPSERT.format(rows=_count_rows("old", "-") + ", " + _count_rows("new", "")),
+        prune=_COUNT_PRUNE
+    ),
+)
+# Rebuilds the counters from the columns (new tables, repairs)
+RECOUNT_SUMMARY_SQL = """
+DELETE FROM summary_counts;
+INSERT INTO summary_counts (kind, key, count) SELECT 'total', '', COUNT(*) FROM devices;
+INSERT INTO summary_counts (kind, key, count) SELECT 'active', '', COALESCE(SUM(is_active), 0) FROM devices;
+INSERT INTO summary_counts (kind, key, count) SELECT 'group', group_name, COUNT(*) FROM devices GROUP BY group_name;
+INSERT INTO summary_counts (kind, key, count) SELECT 'category', category, COUNT(*) FROM devices GROUP BY category
+"""
+SELECT_SUMMARY_SQL = "SELECT kind, key, count FROM summary_counts"
+
+# Groups and their policies. A device without a custom blocklist follows its
+# group's ``blocked`` mask whatever its own row says, so changing a policy
+# is a one-row update.
+GROUPS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS device_groups (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL, is_default INTEGER NOT NULL, blocked INTEGER NOT NULL, data TEXT NOT NULL
+)
+"""
+UPSERT_GROUP_SQL = """
+INSERT INTO device_groups (id, name, is_default, blocked, data) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    name = excluded.name, is_default = excluded.is_default, blocked = excluded.blocked, data = excluded.data
+"""
+SELECT_GROUPS_SQL = "SELECT data FROM device_groups ORDER BY id"
+EFFECTIVE_BLOCKED_SQL = (
+    "(CASE WHEN has_custom_blocklist THEN blocked "
+    "ELSE COALESCE((SELECT g.blocked FROM device_groups AS g WHERE g.id = devices.group_id), blocked) END)"
+)
+# Seeding groups for a database created before they had policies (see
+# app.storage.group_policies.seed_policies)
+SEEN_GROUPS_SQL = "SELECT group_id, group_name, json_extract(data, '$.group.is_default') FROM devices GROUP BY group_id"
+INHERITED_MASKS_SQL = "SELECT group_id, blocked, COUNT(*) FROM devices WHERE has_custom_blocklist = 0 GROUP BY group_id, blocked"
+PROMOTE_CUSTOM_SQL = """
+UPDATE devices SET has_custom_blocklist = 1, data = json_set(data, '$.has_custom_blocklist', json('true'))
+WHERE has_custom_blocklist = 0 AND blocked != (SELECT g.blocked FROM device_groups AS g WHERE g.id = devices.group_id)
+"""
+
+# Shared across every process using the database: the epoch/revision pair
+# and a bounded log of the change events behind each revision.
+META_SQL = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE IF NOT EXISTS changes (revision INTEGER PRIMARY KEY, event TEXT NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);
+"""
+
+# Sort keys (see app.storage.pagination.SORT_KEYS) to their indexed column
+SORT_COLUMNS = {
+    "id": "id",
+    "hostname": "hostname_key",
+    "given_name": "given_name_key",
+    "vendor": "vendor_key",
+    "ip": "ip_key",
+    "last_seen": "last_seen",
+}
+
+# Statements are kept as module constants so sqlite3's statement cache
+# reuses the prepared form on every call.
+UPSERT_SQL = "INSERT INTO devices (id, {names}) VALUES (?, {marks}) ON CONFLICT (id) DO UPDATE SET {updates}".format(
+    names=", ".join(name for name, _ in COLUMNS),
+    marks=", ".join("?" for _ in COLUMNS),
+    updates=", ".join(f"{name} = excluded.{name}" for name, _ in COLUMNS)
+)
+# Bulk blocklist edits: the target ids go into a temp table, the effective
+# mask is updated bitwise (SQLite has no XOR, hence (x | t) - (x & t)), then
+# the JSON document is rewritten from the new mask.
+BULK_IDS_SQL = "CREATE TEMP TABLE IF NOT EXISTS bulk_ids (id INTEGER PRIMARY KEY)"
+APPLY_BLOCKLIST_SQL = """
+UPDATE devices SET
+    blocked = ((({mask} | ?1) & ~?2) | ?3) - ((({mask} | ?1) & ~?2) & ?3),
+    has_custom_blocklist = 1
+WHERE id IN (SELECT id FROM bulk_ids)
+RETURNING id
+""".format(mask=EFFECTIVE_BLOCKED_SQL)
+SYNC_BLOCKLIST_JSON_SQL = """
+UPDATE devices SET data = json_set(data, '$.has_custom_blocklist', json('true'), {fields})
+WHERE id IN (SELECT id FROM bulk_ids)
+""".format(fields=", ".join(
+    f"'$.blocklist.{field}', json(CASE WHEN blocked & {bit} THEN 'true' ELSE 'false' END)"
+    for field, bit in FIELD_BITS.items()
+))
+# Materialized so the effective mask is resolved once per row, not once per sum
+BLOCKLIST_COUNTS_SQL = (
+    "WITH effective AS MATERIALIZED (SELECT {mask} AS mask FROM devices{{where}}) "
+    "SELECT COUNT(*), {sums} FROM effective"
+).format(
+    mask=EFFECTIVE_BLOCKED_SQL,
+    sums=", ".join(f"COALESCE(SUM((mask & {bit}) != 0), 0)" for bit in FIELD_BITS.values())
+)
+
+NEXT_REVISION_SQL = "UPDATE meta SET value = value + 1 WHERE key = 'revision' RETURNING value"
+SELECT_REVISION_SQL = "SELECT value FROM meta WHERE key = 'revision'"
+INSERT_CHANGE_SQL = "INSERT INTO changes (revision, event) VALUES (?, ?)"
+TRIM_CHANGES_SQL = "DELETE FROM changes WHERE revision <= ?"
+SELECT_CHANGES_SQL = "SELECT revision, event FROM changes WHERE revision > ? ORDER BY revision LIMIT ?"
+
+ACTIVE_LAST_SEEN_SQL = "SELECT id, last_seen FROM devices WHERE is_active = 1"
+CLASSIFICATION_AGES_SQL = """
+SELECT id, json_extract(data, '$.ai_classification.last_classified'), json_extract(data, '$.ai_classification.confidence')
+FROM devices
+"""
+NEXT_ID_SQL = "SELECT COALESCE(MAX(id), 0) + 1 FROM devices"
+SELECT_BY_ID_SQL = "SELECT data FROM devices WHERE id = ?"
+SELECT_BY_MAC_SQL = "SELECT data FROM devices WHERE mac = ? ORDER BY id"
+SELECT_BY_IP_SQL = "SELECT data FROM devices WHERE ip = ? ORDER BY id"
+SELECT_SEARCH_TEXT_SQL = "SELECT id, {columns} FROM devices".format(columns=", ".join(TEXT_COLUMNS))
+RECOUNT_SQL = """
+SELECT
+    json_extract(data, '$.group.name'),
+    json_extract(data, '$.ai_classification.device_category'),
+    json_extract(data, '$.is_active')
+FROM devices
+"""
+REPAIR_SQL = """
+UPDATE devices SET
+    group_id = json_extract(data, '$.group.id'),
+    group_name = json_extract(data, '$.group.name'),
+    category = json_extract(data, '$.ai_classification.device_category'),
+    is_active = json_extract(data, '$.is_active')
+"""
+
+
+_COMMIT_SECONDS = PERSISTENCE_WRITE_SECONDS.labels("sqlite_commit")
+_WAL_SYNC_SECONDS = PERSISTENCE_WRITE_SECONDS.labels("sqlite_wal_sync")
+
+
+class SqliteDeviceRepository(DeviceRepository):
+    """
+    Devices stored in SQLite (WAL mode), one row per device.
+
+    The full device is kept as a JSON document in ``data``; the fields we
+    filter and aggregate on are denormalized into indexed columns so lookups
+    and counts run in SQL without loading the fleet. The summary is kept
+    incrementally in ``summary_counts`` by triggers on those columns.
+
+    Several processes can serve the same database. Writes take SQLite's
+    write lock up front (``BEGIN IMMEDIATE``), so read-modify-write cycles
+    are linearizable across processes; the revision counter and change log
+    are updated in the same transaction. ``PRAGMA data_version`` tells a
+    process cheaply whether anyone else committed since it last looked.
+
+    Groups live in their own table; each process caches them until the
+    revision moves and resolves the blocklist of devices without a custom
+    one from it on read.
+
+    Reads outside a transaction go through a second connection, which in WAL
+    mode sees the last commit without waiting for a writer in progress, so
+    a slow write never stalls lookups, listings or the summary.
+    """
+
+    shared = True
+
+    def __init__(self, db_path: str = config.SQLITE_PATH, change_log_size: int = config.CHANGE_LOG_SIZE):
+        self.db_path = db_path
+        self.change_log_size = change_log_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._read_lock = threading.Lock()
+        self._in_transaction = False
+        self._transaction_owner: Optional[int] = None
+        # Commits made by this process, and how many of them sync() has fsynced
+        self._commits = 0
+        self._synced_commits = 0
+        self._sync_lock = threading.Lock()
+        self._data_version: Optional[int] = None
+        self._revision = 0
+        self._groups = GroupPolicies()
+        self._groups_revision: Optional[int] = None
+
+    def load(self):
+        if self._conn is not None:
+            return
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = self._connect()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self.transaction():
+            self._migrate_schema()
+        self._reader = self._connect()
+        self.revision()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=256
+        )
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @staticmethod
+    def _statements(script: str) -> List[str]:
+        # executescript() would commit the surrounding transaction
+        return [statement.strip() for statement in script.split(";") if statement.strip()]
+
+    def _migrate_schema(self):
+        """Create the tables, or add and backfill columns missing from an older one."""
+        conn = self._conn
+        conn.execute(TABLE_SQL)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(devices)")}
+        missing = [(name, definition) for name, definition in COLUMNS if name not in existing]
+        if missing:
+            for name, definition in missing:
+                conn.execute(f"ALTER TABLE devices ADD COLUMN {name} {definition}")
+            devices = [Device.model_validate_json(row[0]) for row in conn.execute("SELECT data FROM devices")]
+            self.save_many(devices)
+        for statement in self._statements(INDEXES_SQL) + self._statements(META_SQL):
+            conn.execute(statement)
+        has_groups = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'device_groups'").fetchone()
+        conn.execute(GROUPS_TABLE_SQL)
+        if not has_groups:
+            self._seed_groups()
+        has_text = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'device_text'").fetchone()
+        conn.execute(TEXT_TABLE_SQL)
+        for statement in TEXT_TRIGGERS_SQL:
+            conn.execute(statement)
+        if not has_text:
+            conn.execute("INSERT INTO device_text (device_text) VALUES ('rebuild')")
+        has_summary = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'summary_counts'").fetchone()
+        conn.execute(SUMMARY_TABLE_SQL)
+        for statement in SUMMARY_TRIGGERS_SQL:
+            conn.execute(statement)
+        if not has_summary:
+            for statement in self._statements(RECOUNT_SUMMARY_SQL):
+                conn.execute(statement)
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex[:8],))
+        self.epoch = conn.execute("SELECT value FROM meta WHERE key = 'epoch'").fetchone()[0]
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _seed_groups(self):
+        """
+        Give every group a policy (see ``seed_policies``); devices without a
+        custom blocklist that differ from it keep theirs as a custom one.
+        """
+        conn = self._conn
+        seen = [
+            Group(id=group_id, name=name, is_default=bool(is_default))
+            for group_id, name, is_default in conn.execute(SEEN_GROUPS_SQL)
+        ]
+        policies = seed_policies(known_groups(seen), conn.execute(INHERITED_MASKS_SQL).fetchall())
+        conn.executemany(UPSERT_GROUP_SQL, [self._group_row(group) for group in policies])
+        conn.execute(PROMOTE_CUSTOM_SQL)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with self._lock:
+            if self._in_transaction:
+                yield
+                return
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            self._in_transaction = True
+            self._transaction_owner = threading.get_ident()
+            try:
+                yield
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                started = time.perf_counter()
+                conn.execute("COMMIT")
+                _COMMIT_SECONDS.observe(time.perf_counter() - started)
+                self._commits += 1
+            finally:
+                self._in_transaction = False
+                self._transaction_owner = None
+
+    @contextmanager
+    def _reading(self) -> Iterator[sqlite3.Connection]:
+        """
+        Connection for a read: the writer inside this thread's own
+        transaction (so it sees its uncommitted writes), the reader otherwise.
+        """
+        if self._transaction_owner == threading.get_ident():
+            yield self._conn
+            return
+        with self._read_lock:
+            yield self._reader
+
+    def record_change(self, event: Dict) -> int:
+        with self.transaction():
+            revision = self._conn.execute(NEXT_REVISION_SQL).fetchone()[0]
+            event["revision"] = revision
+            self._conn.execute(INSERT_CHANGE_SQL, (revision, json.dumps(event, separators=(",", ":"))))
+            if self.change_log_size:
+                self._conn.execute(TRIM_CHANGES_SQL, (revision - self.change_log_size,))
+            return revision
+
+    def revision(self) -> int:
+        with self._reading() as conn:
+            if conn is self._conn:
+                return conn.execute(SELECT_REVISION_SQL).fetchone()[0]
+            # The reader's data_version moves whenever any other connection
+            # (our writer included) commits
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._revision = conn.execute(SELECT_REVISION_SQL).fetchone()[0]
+                self._data_version = data_version
+            return self._revision
+
+    def changes_since(self, revision: int, limit: int = 1000) -> List[Tuple[int, str]]:
+        with self._reading() as conn:
+            return conn.execute(SELECT_CHANGES_SQL, (revision, limit)).fetchall()
+
+    def sync(self):
+        """
+        Commits run with ``synchronous=NORMAL``, which appends them to the WAL
+        without an fsync, so a power failure can lose the latest ones. Fsync
+        the WAL here instead: one fsync covers every commit made before it,
+        so concurrent durable writers share it and ``?durability=applied``
+        writes skip it. Frames a checkpoint already moved into the database
+        were synced with it.
+        """
+        target = self._commits
+        with self._sync_lock:
+            if self._synced_commits >= target:
+                return
+            target = self._commits
+            started = time.perf_counter()
+            try:
+                fd = os.open(f"{self.db_path}-wal", os.O_RDONLY)
+            except FileNotFoundError:
+                # Checkpointed and truncated: everything is in the synced database
+                fd = None
+            if fd is not None:
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            _WAL_SYNC_SECONDS.observe(time.perf_counter() - started)
+            self._synced_commits = target
+
+    def flush(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self._lock, self._read_lock:
+            if self._conn is None:
+                return
+            try:
+                if self._reader is not None:
+                    self._reader.close()
+                self._conn.execute("PRAGMA optimize")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                self._conn.close()
+                self._conn = None
+                self._reader = None
+
+    @staticmethod
+    def _row(device: Device) -> Tuple:
+        texts = search_texts(device)
+        return (
+            device.id,
+            normalize_mac(device.mac),
+            device.ip,
+            device.group.id,
+            device.group.name,
+            device.ai_classification.device_category,
+            int(device.is_active),
+            device.vendor.lower(),
+            int(device.has_custom_blocklist),
+            blocklist_to_mask(device.blocklist),
+            SORT_KEYS["hostname"](device),
+            SORT_KEYS["given_name"](device),
+            SORT_KEYS["ip"](device),
+            SORT_KEYS["last_seen"](device),
+            texts[3][0],
+            "\n".join(texts[4]),
+            device.model_dump_json()
+        )
+
+    @staticmethod
+    def _group_row(group: GroupPolicy) -> Tuple:
+        return (group.id, group.name, int(group.is_default), blocklist_to_mask(group.blocklist), group.model_dump_json())
+
+    def _policies(self) -> GroupPolicies:
+        """
+        The groups, cached until the revision moves (every commit that
+        changes a group also records a change). Inside this thread's own
+        transaction they are read fresh, uncommitted edits included.
+        """
+        if self._transaction_owner == threading.get_ident():
+            return GroupPolicies(GroupPolicy.model_validate_json(row[0]) for row in self._conn.execute(SELECT_GROUPS_SQL))
+        revision = self.revision()
+        if revision != self._groups_revision:
+            with self._reading() as conn:
+                rows = conn.execute(SELECT_GROUPS_SQL).fetchall()
+            self._groups = GroupPolicies(GroupPolicy.model_validate_json(row[0]) for row in rows)
+            self._groups_revision = revision
+        return self._groups
+
+    def groups(self) -> List[GroupPolicy]:
+        return self._policies().all()
+
+    def get_group(self, group_id: int) -> Optional[GroupPolicy]:
+        return self._policies().get(group_id)
+
+    def save_group(self, group: GroupPolicy):
+        with self.transaction():
+            self._conn.execute(UPSERT_GROUP_SQL, self._group_row(group))
+            self._groups_revision = None
+
+    @staticmethod
+    def _clauses(
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        vendor: Optional[str] = None,
+        has_custom_blocklist: Optional[bool] = None,
+        blocked: Iterable[str] = (),
+        allowed: Iterable[str] = ()
+    ) -> Tuple[List[str], List]:
+        clauses = []
+        params: List = []
+        if group_id is not None:
+            clauses.append("group_id = ?")
+            params.append(group_id)
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if is_active is not None:
+            clauses.append("is_active = ?")
+            params.append(int(is_active))
+        if vendor is not None:
+            clauses.append("vendor_key = ?")
+            params.append(vendor.strip().lower())
+        if has_custom_blocklist is not None:
+            clauses.append("has_custom_blocklist = ?")
+            params.append(int(has_custom_blocklist))
+        blocked_mask = fields_to_mask(blocked)
+        if blocked_mask:
+            clauses.append(f"({EFFECTIVE_BLOCKED_SQL} & ?) = ?")
+            params.extend([blocked_mask, blocked_mask])
+        allowed_mask = fields_to_mask(allowed)
+        if allowed_mask:
+            clauses.append(f"({EFFECTIVE_BLOCKED_SQL} & ?) = 0")
+            params.append(allowed_mask)
+        return clauses, params
+
+    @staticmethod
+    def _where(clauses: List[str]) -> str:
+        return " WHERE " + " AND ".join(clauses) if clauses else ""
+
+    def _devices(self, sql: str, params: Iterable = ()) -> List[Device]:
+        with self._reading() as conn:
+            rows = conn.execute(sql, tuple(params)).fetchall()
+        devices = [Device.model_validate_json(row[0]) for row in rows]
+        policies = self._policies()
+        for device in devices:
+            if not device.has_custom_blocklist:
+                policy = policies.blocklist(device.group.id)
+                if policy is not None:
+                    device.blocklist = policy
+        return devices
+
+    def next_id(self) -> int:
+        with self._reading() as conn:
+            return conn.execute(NEXT_ID_SQL).fetchone()[0]
+
+    def get(self, device_id: int) -> Optional[Device]:
+        devices = self._devices(SELECT_BY_ID_SQL, (device_id,))
+        return devices[0] if devices else None
+
+    def all(self) -> List[Device]:
+        return self._devices("SELECT data FROM devices ORDER BY id")
+
+    def find_by_mac(self, mac: str) -> List[Device]:
+        return self._devices(SELECT_BY_MAC_SQL, (normalize_mac(mac),))
+
+    def find_by_ip(self, ip: str) -> List[Device]:
+        return self._devices(SELECT_BY_IP_SQL, (ip.strip(),))
+
+    def find(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> List[Device]:
+        clauses, params = self._clauses(group_id, category, is_active)
+        return self._devices(f"SELECT data FROM devices{self._where(clauses)} ORDER BY id", params)
+
+    def count(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> int:
+        clauses, params = self._clauses(group_id, category, is_active)
+        with self._reading() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM devices{self._where(clauses)}", params).fetchone()[0]
+
+    def match_ids(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> List[int]:
+        clauses, params = self._clauses(group_id, category, is_active)
+        with self._reading() as conn:
+            rows = conn.execute(f"SELECT id FROM devices{self._where(clauses)} ORDER BY id", params).fetchall()
+        return [row[0] for row in rows]
+
+    def active_last_seen(self) -> List[Tuple[int, str]]:
+        with self._reading() as conn:
+            return conn.execute(ACTIVE_LAST_SEEN_SQL).fetchall()
+
+    def classification_ages(self) -> List[Tuple[int, str, float]]:
+        with self._reading() as conn:
+            return conn.execute(CLASSIFICATION_AGES_SQL).fetchall()
+
+    def blocklist_counts(
+        self,
+        group_id: Optional[int] = None,
+        category: Optional[str] = None,
+        is_active: Optional[bool] = None
+    ) -> Dict[str, int]:
+        clauses, params = self._clauses(group_id, category, is_active)
+        with self._reading() as conn:
+            row = conn.execute(BLOCKLIST_COUNTS_SQL.format(where=self._where(clauses)), params).fetchone()
+        return dict(zip(FIELD_BITS, row[1:]))
+
+    def apply_blocklist(self, device_ids: Iterable[int], change: BlocklistChange) -> List[int]:
+        with self.transaction():
+            conn = self._conn
+            conn.execute(BULK_IDS_SQL)
+            conn.execute("DELETE FROM bulk_ids")
+            conn.executemany("INSERT OR IGNORE INTO bulk_ids (id) VALUES (?)", ((device_id,) for device_id in device_ids))
+            updated = [row[0] for row in conn.execute(
+                APPLY_BLOCKLIST_SQL,
+                (change.set_mask, change.clear_mask, change.toggle_mask)
+            ).fetchall()]
+            conn.execute(SYNC_BLOCKLIST_JSON_SQL)
+            conn.execute("DELETE FROM bulk_ids")
+        return sorted(updated)
+
+    def query(self, query: DeviceQuery) -> DevicePage:
+        clauses, params = self._clauses(
+            group_id=query.group_id,
+            category=query.category,
+            is_active=query.is_active,
+            vendor=query.vendor,
+            has_custom_blocklist=query.has_custom_blocklist,
+            blocked=query.blocked,
+            allowed=query.allowed
+        )
+        with self._reading() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM devices{self._where(clauses)}", params).fetchone()[0]
+
+        column = SORT_COLUMNS[query.sort_key]
+        direction = "DESC" if query.descending else "ASC"
+        comparison = "<" if query.descending else ">"
+        if query.cursor:
+            value, device_id = decode_cursor(query.cursor, query.sort)
+            if column == "id":
+                clauses.append(f"id {comparison} ?")
+                params.append(device_id)
+            else:
+                clauses.append(f"({column}, id) {comparison} (?, ?)")
+                params.extend([value, device_id])
+        sql = f"SELECT data FROM devices{self._where(clauses)} ORDER BY {column} {direction}"
+        if column != "id":
+            sql += f", id {direction}"
+        if query.limit is not None:
+            sql += " LIMIT ?"
+            params.append(query.limit + 1)
+
+        devices = self._devices(sql, params)
+        next_cursor = None
+        if query.limit is not None and len(devices) > query.limit:
+            devices = devices[:query.limit]
+            next_cursor = encode_cursor(query.sort, devices[-1])
+        return DevicePage(devices=devices, next_cursor=next_cursor, total=total)
+
+    def search(self, search: DeviceSearch) -> DevicePage:
+        """
+        Narrow down in SQL (indexed MAC/IP ranges, the trigram table for
+        tokens of three or more characters), then rank the candidates with
+        the same scoring as the in-memory store.
+        """
+        clauses, params = self._clauses(search.group_id, search.category, search.is_active)
+        if search.mac is not None:
+            prefix = mac_prefix(search.mac)
+            clauses.append("mac >= ? AND mac < ?")
+            params.extend([prefix, prefix + "\uffff"])
+        if search.ip is not None:
+            clauses.append("ip_key BETWEEN ? AND ?")
+            params.extend(ip_bounds(search.ip))
+        after = decode_cursor(search.cursor, "rank") if search.cursor else None
+
+        tokens = tokenize(search.q or "")
+        if not tokens:
+            # Everything ranks 0: plain id order, paged in SQL
+            with self._reading() as conn:
+                total = conn.execute(f"SELECT COUNT(*) FROM devices{self._where(clauses)}", params).fetchone()[0]
+            if after is not None:
+                clauses.append("id > ?")
+                params.append(after[1])
+            ranked = [(0, device_id) for device_id in self._ids(
+                f"SELECT id FROM devices{self._where(clauses)} ORDER BY id LIMIT ?", params + [search.limit + 1]
+            )]
+        else:
+            long_tokens = [token for token in tokens if len(token) >= MIN_SUBSTRING]
+            if long_tokens:
+                clauses.append("id IN (SELECT rowid FROM device_text WHERE device_text MATCH ?)")
+                params.append(" AND ".join('"' + token.replace('"', '""') + '"' for token in long_tokens))
+            else:
+                # Short tokens only match word starts, which the trigram table cannot find
+                for token in tokens:
+                    pattern = "%" + token.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                    clauses.append("(" + " OR ".join(f"{name} LIKE ? ESCAPE '\\'" for name in TEXT_COLUMNS) + ")")
+                    params.extend([pattern] * len(TEXT_COLUMNS))
+            with self._reading() as conn:
+                rows = conn.execute(SELECT_SEARCH_TEXT_SQL + self._where(clauses), params).fetchall()
+            ranked = []
+            for device_id, hostname, given_name, vendor, os_name, indicators in rows:
+                texts = ((hostname,), (given_name,), (vendor,), (os_name,), tuple(indicators.split("\n")) if indicators else ())
+                rank = score(tokens, texts)
+                if rank:
+                    ranked.append((-rank, device_id))
+            total = len(ranked)
+            if after is not None:
+                ranked = [entry for entry in ranked if entry > (-after[0], after[1])]
+            ranked.sort()
+            ranked = ranked[:search.limit + 1]
+
+        page = ranked[:search.limit]
+        by_id = {device.id: device for device in self._devices(
+            "SELECT data FROM devices WHERE id IN ({})".format(", ".join("?" for _ in page)),
+            [device_id for _, device_id in page]
+        )} if page else {}
+        devices = [by_id[device_id] for _, device_id in page if device_id in by_id]
+        next_cursor = None
+        if len(ranked) > search.limit:
+            rank, device_id = page[-1]
+            next_cursor = encode_position("rank", -rank, device_id)
+        return DevicePage(devices=devices, next_cursor=next_cursor, total=total)
+
+    def _ids(self, sql: str, params: Iterable = ()) -> List[int]:
+        with self._reading() as conn:
+            return [row[0] for row in conn.execute(sql, tuple(params)).fetchall()]
+
+    def summary(self) -> Dict:
+        """Read from the trigger-maintained ``summary_counts``: a handful of rows, whatever the fleet size."""
+        summary = {"total": 0, "active": 0, "by_group": {}, "by_category": {}}
+        with self._reading() as conn:
+            rows = conn.execute(SELECT_SUMMARY_SQL).fetchall()
+        for kind, key, count in rows:
+            if kind in ("total", "active"):
+                summary[kind] = count
+            elif count:
+                summary[f"by_{kind}"][key] = count
+        return summary
+
+    def verify_summary(self, repair: bool = False) -> Dict:
+        """
+        Recount from the JSON documents and compare with the counters. A
+        repair rewrites the indexed columns from the documents and rebuilds
+        the counters from the columns.
+        """
+        actual = self.summary()
+        recount = SummaryCounters()
+        with self._reading() as conn:
+            for group_name, category, is_active in conn.execute(RECOUNT_SQL):
+                recount.add(group_name, category, bool(is_active))
+        expected = recount.snapshot()
+        drift = SummaryCounters.diff(expected, actual)
+        if drift and repair:
+            with self.transaction():
+                self._conn.execute(REPAIR_SQL)
+                for statement in self._statements(RECOUNT_SUMMARY_SQL):
+                    self._conn.execute(statement)
+        return {"ok": not drift, "drift": drift, "counters": actual, "recomputed": expected}
+
+    def save(self, device: Device):
+        with self._lock:
+            self._conn.execute(UPSERT_SQL, self._row(device))
+
+    def save_many(self, devices: Iterable[Device]):
+        rows = [self._row(device) for device in devices]
+        if not rows:
+            return
+        with self.transaction():
+            self._conn.executemany(UPSERT_SQL, rows)
@@ -0,0 +1,74 @@
+from typing import Dict, Iterable
+from app.schemas.device import Device
+
+
+class SummaryCounters:
+    """
+    Running totals behind ``/api/summary``.
+
+    The store calls ``add``/``remove`` whenever a device enters or leaves an
+    index bucket, so reading the summary never walks the fleet.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.active = 0
+        self.by_group: Dict[str, int] = {}
+        self.by_category: Dict[str, int] = {}
+
+    @staticmethod
+    def _bump(counts: Dict[str, int], key: str, delta: int):
+        value = counts.get(key, 0) + delta
+        if value:
+            counts[key] = value
+        else:
+            counts.pop(key, None)
+
+    def clear(self):
+        self.total = 0
+        self.active = 0
+        self.by_group.clear()
+        self.by_category.clear()
+
+    def add(self, group_name: str, category: str, is_active: bool):
+        self.total += 1
+        self.active += int(is_active)
+        self._bump(self.by_group, group_name, 1)
+        self._bump(self.by_category, category, 1)
+
+    def remove(self, group_name: str, category: str, is_active: bool):
+        self.total -= 1
+        self.active -= int(is_active)
+        self._bump(self.by_group, group_name, -1)
+        self._bump(self.by_category, category, -1)
+
+    def snapshot(self) -> Dict:
+        return {
+            "total": self.total,
+            "active": self.active,
+            "by_group": dict(self.by_group),
+            "by_category": dict(self.by_category)
+        }
+
+    @staticmethod
+    def recompute(devices: Iterable[Device]) -> Dict:
+        counters = SummaryCounters()
+        for device in devices:
+            counters.add(device.group.name, device.ai_classification.device_category, device.is_active)
+        return counters.snapshot()
+
+    @staticmethod
+    def diff(expected: Dict, actual: Dict) -> Dict:
+        """Return ``{key: {"expected": x, "actual": y}}`` for every mismatch."""
+        drift = {}
+        for key in ("total", "active"):
+            if expected[key] != actual[key]:
+                drift[key] = {"expected": expected[key], "actual": actual[key]}
+        for key in ("by_group", "by_category"):
+            names = set(expected[key]) | set(actual[key])
+            for name in sorted(names):
+                want = expected[key].get(name, 0)
+                got = actual[key].get(name, 0)
+                if want != got:
+                    drift[f"{key}.{name}"] = {"expected": want, "actual": got}
+        return drift
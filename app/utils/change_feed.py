@@ -0,0 +1,170 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+
+SummaryKeys = Tuple[str, str, bool]
+
+# Queued to a subscriber in place of the events it could not keep up with
+OVERFLOW = object()
+
+
+def summary_keys(device: Dict) -> SummaryKeys:
+    """The summary counter keys of a device's ``model_dump()``."""
+    return device["group"]["name"], device["ai_classification"]["device_category"], device["is_active"]
+
+
+def device_changes(before: Dict, after: Dict) -> Dict:
+    """
+    Fields that differ between two ``model_dump()`` of the same device.
+    Nested models (group, blocklist, ...) only carry their changed keys.
+    """
+    changes = {}
+    for field, value in after.items():
+        old = before.get(field)
+        if value == old:
+            continue
+        if isinstance(value, dict) and isinstance(old, dict):
+            changes[field] = {key: item for key, item in value.items() if old.get(key) != item}
+        else:
+            changes[field] = value
+    return changes
+
+
+def summary_delta(transitions: Iterable[Tuple[Optional[SummaryKeys], Optional[SummaryKeys]]]) -> Dict:
+    """
+    Net change to the ``/api/summary`` counters for a set of
+    ``(old keys, new keys)`` transitions (``None`` for a device that did not
+    exist before / no longer exists). Zero entries are left out.
+    """
+    totals = {"total": 0, "active": 0}
+    by_group: Dict[str, int] = {}
+    by_category: Dict[str, int] = {}
+    for old, new in transitions:
+        if old == new:
+            continue
+        for keys, sign in ((old, -1), (new, 1)):
+            if keys is None:
+                continue
+            group_name, category, is_active = keys
+            totals["total"] += sign
+            if is_active:
+                totals["active"] += sign
+            by_group[group_name] = by_group.get(group_name, 0) + sign
+            by_category[category] = by_category.get(category, 0) + sign
+    delta = {key: value for key, value in totals.items() if value}
+    by_group = {key: value for key, value in by_group.items() if value}
+    by_category = {key: value for key, value in by_category.items() if value}
+    if by_group:
+        delta["by_group"] = by_group
+    if by_category:
+        delta["by_category"] = by_category
+    return delta
+
+
+class Subscriber:
+    """
+    One connected client. Events are handed over with
+    ``loop.call_soon_threadsafe`` so publishing never blocks on (or runs in)
+    the consumer; a consumer whose queue fills up is cut off with ``OVERFLOW``
+    instead of slowing the publisher or the other subscribers down.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def offer(self, item: Tuple[int, str]):
+        try:
+            self.loop.call_soon_threadsafe(self._put, item)
+        except RuntimeError:
+            # Event loop already closed; the stream is gone
+            pass
+
+    def _put(self, item: Tuple[int, str]):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+
+class ChangeFeed:
+    """
+    Fan-out of revisioned change events with a bounded replay buffer.
+
+    Each event is serialized once at publish time and the same string is
+    shared by every subscriber and by the replay buffer. A client resuming
+    from revision ``n`` gets every buffered event after ``n`` followed by the
+    live stream, or ``None`` as backlog if ``n`` has already fallen out of
+    the buffer (it must then refetch full state).
+    """
+
+    def __init__(self, buffer_size: int = 1024, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._buffer: Deque[Tuple[int, str]] = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+        # Revision of the newest event published (or of the state the feed started from)
+        self.head = 0
+        self.published = 0
+        self.overflows = 0
+
+    def publish(self, revision: int, event: Dict):
+        self.publish_json(revision, json.dumps(event, separators=(",", ":")))
+
+    def publish_json(self, revision: int, data: str):
+        """Publish an event that is already serialized (e.g. read back from a change log)."""
+        item = (revision, data)
+        with self._lock:
+            self._buffer.append(item)
+            self.head = max(self.head, revision)
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            subscriber.offer(item)
+
+    def subscribe(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        since: Optional[int] = None
+    ) -> Tuple[Subscriber, Optional[List[Tuple[int, str]]]]:
+        """
+        Register a subscriber and return it with the backlog after ``since``.
+        Registration and the backlog snapshot happen under one lock, so no
+        event is missed or delivered twice.
+        """
+        subscriber = Subscriber(loop, self.max_queue)
+        with self._lock:
+            backlog: Optional[List[Tuple[int, str]]] = []
+            if since is not None and since < self.head:
+                oldest = self._buffer[0][0] if self._buffer else None
+                if oldest is None or since < oldest - 1:
+                    backlog = None
+                else:
+                    backlog = [item for item in self._buffer if item[0] > since]
+            self._subscribers.add(subscriber)
+        return subscriber, backlog
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if subscriber.overflowed:
+                self.overflows += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "buffered": len(self._buffer),
+                "oldest_revision": self._buffer[0][0] if self._buffer else None,
+                "published": self.published,
+                "overflows": self.overflows
+            }
@@ -0,0 +1,88 @@
+import re
+from typing import Dict, List, Tuple
+
+
+# (device_type, category, field, pattern, weight, indicator): a device is
+# scored per type on the rules it matches; fields are the lowercased vendor,
+# hostname, user agents and OS CPEs
+RULES = [
+    ("Gateway", "Network Infrastructure", "user_agent", r"suricata|unbound|dnsmasq|pfsense|opnsense|openwrt", 0.6, "Router services in user agent"),
+    ("Gateway", "Network Infrastructure", "hostname", r"^(gw|gateway|router|firewall|fw)\b|[-_.](gw|gateway|router)\b", 0.5, "Router hostname"),
+    ("Access Point", "Network Infrastructure", "user_agent", r"unifi|uap/|edgeos|omada|aruba|meraki", 0.6, "Access point firmware in user agent"),
+    ("Access Point", "Network Infrastructure", "hostname", r"^w?ap[-_\d]|[-_.]w?ap\b", 0.4, "Access point hostname"),
+    ("Access Point", "Network Infrastructure", "vendor", r"ubiquiti|aruba|ruckus|meraki|tp-link", 0.3, "Wireless vendor"),
+    ("Access Point", "Network Infrastructure", "os_cpe", r"cpe:/o:ubnt", 0.4, "Ubiquiti OS CPE"),
+    ("Network attached storage", "Network Infrastructure", "user_agent", r"synology|dsm/|qnap|truenas", 0.6, "NAS software in user agent"),
+    ("Network attached storage", "Network Infrastructure", "vendor", r"synology|qnap|western digital", 0.5, "Storage vendor"),
+    ("Network attached storage", "Network Infrastructure", "hostname", r"^nas|[-_.]nas\b", 0.4, "NAS hostname"),
+    ("Server", "Network Infrastructure", "user_agent", r"apt-http|yum/|dnf/|docker|kube", 0.4, "Server package manager in user agent"),
+    ("Server", "Network Infrastructure", "hostname", r"^(srv|server|node|vm|db|web)[-_\d]", 0.4, "Server hostname"),
+    ("Server", "Network Infrastructure", "vendor", r"dell|supermicro|\bhpe\b", 0.2, "Server vendor"),
+    ("Server", "Network Infrastructure", "os_cpe", r"ubuntu|debian|centos|rhel|windows_server", 0.3, "Server OS CPE"),
+    ("Workstation", "Workstation", "user_agent", r"macintosh|windows nt|x11; linux|edge/|cfnetwork|microsoft-cryptoapi", 0.5, "Desktop browser or OS service in user agent"),
+    ("Workstation", "Workstation", "os_cpe", r"cpe:/o:apple:mac_?os|cpe:/o:microsoft:windows_1[01]", 0.5, "Desktop OS CPE"),
+    ("Workstation", "Workstation", "hostname", r"^(mac|laptop|desktop|pc|ws|workstation)|macbook|[-_.](mac|pc|laptop)\b", 0.4, "Workstation hostname"),
+    ("Smartphone", "Mobile", "user_agent", r"android|iphone|ipad|mobile safari|okhttp", 0.5, "Mobile browser or app in user agent"),
+    ("Smartphone", "Mobile", "os_cpe", r"android|iphone_os|cpe:/o:apple:ios", 0.5, "Mobile OS CPE"),
+    ("Smartphone", "Mobile", "hostname", r"iphone|ipad|pixel|galaxy|android", 0.5, "Phone hostname"),
+    ("Smart TV", "IoT", "user_agent", r"smart-?tv|tizen|webos|roku|netflix|samsungbrowser|bravia|chromecast", 0.5, "TV platform in user agent"),
+    ("Smart TV", "IoT", "os_cpe", r"tizen|webos|roku", 0.5, "TV OS CPE"),
+    ("Smart TV", "IoT", "hostname", r"^tv[-_\d]|[-_.]tv\b|roku|chromecast", 0.4, "TV hostname"),
+    ("IP Camera", "IoT", "user_agent", r"rtsp|hikvision|dahua|onvif|-webs", 0.6, "Camera firmware in user agent"),
+    ("IP Camera", "IoT", "vendor", r"hikvision|dahua|axis|reolink|amcrest", 0.5, "Camera vendor"),
+    ("IP Camera", "IoT", "hostname", r"^(cam|ipcam|camera)|[-_.]cam\b", 0.4, "Camera hostname"),
+    ("Printer", "Printer", "user_agent", r"chaisoe|ipp/|cups|jetdirect|printer", 0.6, "Print service in user agent"),
+    ("Printer", "Printer", "vendor", r"^(hp|brother|epson|canon|lexmark|xerox)\b", 0.2, "Printer vendor"),
+    ("Printer", "Printer", "hostname", r"print|^prn|^npi", 0.5, "Printer hostname")
+]
+
+_COMPILED = [(device_type, category, field, re.compile(pattern), weight, indicator) for device_type, category, field, pattern, weight, indicator in RULES]
+
+UNKNOWN = {"device_type": "Unknown", "device_category": "Unknown", "confidence": 0.0, "reasoning": "No classification rule matched", "indicators": []}
+
+
+def features(vendor: str, hostname: str, user_agent: List[str], os_cpe: List[str]) -> Dict[str, str]:
+    """What the rules look at of a device, lowercased; small and picklable for the worker processes."""
+    return {
+        "vendor": vendor.lower(),
+        "hostname": hostname.lower(),
+        "user_agent": "\n".join(user_agent).lower(),
+        "os_cpe": "\n".join(os_cpe).lower()
+    }
+
+
+def classify(device: Dict[str, str]) -> Dict:
+    """
+    The ``AIClassification`` fields (without ``last_classified``) for a
+    device's ``features``. Each type scores the noisy-or of the weights of
+    the rules it matched; confidence is the best score less half the
+    runner-up's, so conflicting evidence lowers it.
+    """
+    scores: Dict[str, float] = {}
+    matched: Dict[str, List[str]] = {}
+    categories: Dict[str, str] = {}
+    for device_type, category, field, pattern, weight, indicator in _COMPILED:
+        if pattern.search(device[field]):
+            scores[device_type] = 1 - (1 - scores.get(device_type, 0.0)) * (1 - weight)
+            matched.setdefault(device_type, []).append(indicator)
+            categories[device_type] = category
+    if not scores:
+        return dict(UNKNOWN, indicators=[])
+    ranked = sorted(scores, key=scores.__getitem__, reverse=True)
+    best = ranked[0]
+    runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+    reasoning = f"Rule-based: {len(matched[best])} indicator(s) for {best}"
+    if len(ranked) > 1:
+        reasoning += f", also matched {', '.join(ranked[1:])}"
+    return {
+        "device_type": best,
+        "device_category": categories[best],
+        "confidence": round(max(scores[best] - runner_up / 2, 0.0), 2),
+        "reasoning": reasoning,
+        "indicators": matched[best]
+    }
+
+
+def classify_batch(batch: List[Tuple[int, Dict[str, str]]]) -> List[Tuple[int, Dict]]:
+    """``classify`` over ``(id, features)`` pairs; the unit of work sent to a worker process."""
+    return [(device_id, classify(device)) for device_id, device in batch]
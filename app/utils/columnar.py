@@ -0,0 +1,199 @@
+import gc
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+from app.schemas.device import AIClassification, Device
+from app.storage.blocklist_bits import BLOCKLIST_FIELDS
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+FORMAT = "chimera.columnar/1"
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _raw(values: List) -> List:
+    return values
+
+
+def _flags(values: List[bool]) -> Dict:
+    return {"flags": [1 if value else 0 for value in values]}
+
+
+def _dictionary(values: List[str]) -> Dict:
+    index: Dict[str, int] = {}
+    codes = [index.setdefault(value, len(index)) for value in values]
+    return {"dict": list(index), "codes": codes}
+
+
+def _dictionary_lists(values: List[List[str]]) -> Dict:
+    # Whole lists repeat (same user agents, CPEs, indicators per device model)
+    index: Dict[tuple, int] = {}
+    codes = [index.setdefault(tuple(items), len(index)) for items in values]
+    return {"dict": [list(items) for items in index], "codes": codes}
+
+
+def _times(values: List[str]) -> Any:
+    # Naive ISO timestamps as microseconds since the epoch; a column with
+    # anything unparsable stays as strings
+    try:
+        return {"us": [(datetime.fromisoformat(value) - _EPOCH) // _MICROSECOND for value in values]}
+    except (TypeError, ValueError):
+        return values
+
+
+_group_key = attrgetter("id", "name", "is_default")
+_blocklist_key = attrgetter(*BLOCKLIST_FIELDS)
+
+
+def _groups(values: List) -> Dict:
+    index: Dict[tuple, int] = {}
+    codes = [index.setdefault(key, len(index)) for key in map(_group_key, values)]
+    return {
+        "dict": [{"id": group_id, "name": name, "is_default": is_default} for group_id, name, is_default in index],
+        "codes": codes
+    }
+
+
+def _blocklists(values: List) -> Dict:
+    # Few distinct blocklists exist, so each combination is turned into a mask once
+    masks: Dict[tuple, int] = {}
+    for key in set(map(_blocklist_key, values)):
+        masks[key] = sum(1 << index for index, value in enumerate(key) if value)
+    return {"bits": list(BLOCKLIST_FIELDS), "masks": [masks[key] for key in map(_blocklist_key, values)]}
+
+
+def _classifications(values: List[AIClassification]) -> Dict:
+    return {"columns": _encode(values, CLASSIFICATION_ENCODERS)}
+
+
+# How each field is laid out. Low-cardinality strings (vendor, OS, category,
+# group) become a dictionary plus integer codes, the 13 blocklist booleans a
+# bitmask, timestamps integers; identifiers stay as plain lists.
+CLASSIFICATION_ENCODERS: Dict[str, Callable[[List], Any]] = {
+    "device_type": _dictionary,
+    "device_category": _dictionary,
+    "confidence": _raw,
+    "reasoning": _dictionary,
+    "indicators": _dictionary_lists,
+    "last_classified": _times,
+}
+
+DEVICE_ENCODERS: Dict[str, Callable[[List], Any]] = {
+    "id": _raw,
+    "mac": _raw,
+    "hostname": _raw,
+    "vendor": _dictionary,
+    "given_name": _raw,
+    "ip": _raw,
+    "user_agent": _dictionary_lists,
+    "is_active": _flags,
+    "has_custom_blocklist": _flags,
+    "group": _groups,
+    "first_seen": _times,
+    "last_seen": _times,
+    "is_mac_universal": _flags,
+    "os_name": _dictionary,
+    "os_accuracy": _raw,
+    "os_type": _dictionary,
+    "os_vendor": _dictionary,
+    "os_family": _dictionary,
+    "os_gen": _dictionary,
+    "os_cpe": _dictionary_lists,
+    "os_last_updated": _times,
+    "blocklist": _blocklists,
+    "ai_classification": _classifications,
+}
+
+
+def _encode(items: Sequence, encoders: Dict[str, Callable[[List], Any]], include: Optional[Set[str]] = None) -> Dict:
+    names = [name for name in encoders if include is None or name in include]
+    if not items:
+        return {name: encoders[name]([]) for name in names}
+    # One pass over the models pulls out every field, then rows become columns
+    if len(names) == 1:
+        columns = [list(map(attrgetter(names[0]), items))]
+    else:
+        columns = list(zip(*map(attrgetter(*names), items)))
+    return {name: encoders[name](list(values)) for name, values in zip(names, columns)}
+
+
+@contextmanager
+def _gc_paused():
+    # Encoding allocates a tuple per device and per key; with a large fleet
+    # each burst would otherwise trigger collections that rescan them all
+    # (see app.storage.snapshot.bulk_load). Nothing built here forms cycles.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def encode_devices(devices: Sequence[Device], include: Optional[Set[str]] = None) -> Dict:
+    """
+    The devices as one column per field, read straight off the models (no
+    ``model_dump``). ``include`` limits the top-level fields like the
+    ``fields`` projection; ``id`` is always present.
+    """
+    with _gc_paused():
+        columns = _encode(devices, DEVICE_ENCODERS, None if include is None else {"id", *include})
+    return {"format": FORMAT, "count": len(devices), "columns": columns}
+
+
+def _decode_column(column: Any, count: int) -> List:
+    if isinstance(column, list):
+        return column
+    if "flags" in column:
+        return [bool(flag) for flag in column["flags"]]
+    if "us" in column:
+        return [(_EPOCH + value * _MICROSECOND).isoformat() for value in column["us"]]
+    if "masks" in column:
+        bits = column["bits"]
+        return [{field: bool(mask >> index & 1) for index, field in enumerate(bits)} for mask in column["masks"]]
+    if "columns" in column:
+        return _decode_rows(column["columns"], count)
+    dictionary = column["dict"]
+    return [
+        [dictionary[item] for item in code] if isinstance(code, list) else dictionary[code]
+        for code in column["codes"]
+    ]
+
+
+def _decode_rows(columns: Dict[str, Any], count: int) -> List[Dict]:
+    decoded = {name: _decode_column(column, count) for name, column in columns.items()}
+    return [{name: values[index] for name, values in decoded.items()} for index in range(count)]
+
+
+def decode_devices(document: Dict) -> List[Dict]:
+    """Turn an ``encode_devices`` document back into per-device dicts (for clients and tests)."""
+    if document.get("format") != FORMAT:
+        raise ValueError(f"Not a {FORMAT} document")
+    return _decode_rows(document["columns"], document["count"])
+
+
+def dumps(document: Dict, media_type: str) -> bytes:
+    """Serialize a columnar document as compact JSON or, with ``msgpack`` installed, MessagePack."""
+    if media_type == MSGPACK_MEDIA_TYPE:
+        if msgpack is None:
+            raise RuntimeError("MessagePack output needs the msgpack package")
+        return msgpack.packb(document, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(document)
+    return json.dumps(document, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,79 @@
+import gzip
+from typing import Callable, Dict, Iterable, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _gzip(body: bytes) -> bytes:
+    # mtime=0 keeps the output (and so the cached copy) deterministic
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def _brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=5)
+
+
+def _zstd(body: bytes) -> bytes:
+    # Compressor objects are not thread-safe; they are cheap to create
+    return zstandard.ZstdCompressor(level=3).compress(body)
+
+
+# Content-Encoding -> compressor, for the codecs importable here. brotli and
+# zstd need the optional ``brotli`` / ``zstandard`` packages.
+CODECS: Dict[str, Callable[[bytes], bytes]] = {"gzip": _gzip}
+if brotli is not None:
+    CODECS["br"] = _brotli
+if zstandard is not None:
+    CODECS["zstd"] = _zstd
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    """``Accept-Encoding`` as ``{coding: q}``; malformed q-values count as 0."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(accept_encoding: Optional[str], preference: Iterable[str]) -> Optional[str]:
+    """
+    The content coding to answer with: the one the client rates highest
+    among ``preference`` (server order breaks ties; ``*`` covers codings not
+    listed), or ``None`` for identity.
+    """
+    if not accept_encoding:
+        return None
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for coding in preference:
+        if coding not in CODECS:
+            continue
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    return CODECS[coding](body)
@@ -0,0 +1,101 @@
+import heapq
+import threading
+from datetime import timezone
+from typing import Dict, List, Optional, Tuple
+from app.utils.sighting_buffer import parse_timestamp
+
+
+# Devices expired per commit (and change event)
+EXPIRY_BATCH = 10000
+
+
+def epoch_seconds(timestamp: str) -> Optional[float]:
+    """A stored timestamp (``last_seen``, naive UTC ISO) as epoch seconds, ``None`` if unparsable."""
+    parsed = parse_timestamp(timestamp)
+    return None if parsed is None else parsed.replace(tzinfo=timezone.utc).timestamp()
+
+
+class DeadlineHeap:
+    """
+    When each device is next due, as a min-heap of ``(deadline, id)``: idle
+    expiry of active devices, re-classification of stale ones.
+
+    Deadlines mostly move forward (a device keeps being seen, or was just
+    classified), so ``schedule`` just records the later deadline in a dict
+    and leaves the device's heap entry alone: when that entry comes up,
+    ``pop_due`` finds the deadline moved and pushes the device back once, at
+    its current deadline. Each device has a single live entry however often
+    it is rescheduled, and finding what is due costs O(log n) per popped
+    entry instead of a scan of the fleet. Due devices come out most overdue
+    first.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        # id -> [current deadline, deadline of its live heap entry]
+        self._timers: Dict[int, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+            self._timers.clear()
+
+    def schedule(self, device_id: int, deadline: float):
+        with self._lock:
+            self._schedule(device_id, deadline)
+
+    def schedule_many(self, deadlines: List[Tuple[int, float]]):
+        with self._lock:
+            for device_id, deadline in deadlines:
+                self._schedule(device_id, deadline)
+
+    def _schedule(self, device_id: int, deadline: float):
+        timer = self._timers.get(device_id)
+        if timer is None:
+            self._timers[device_id] = [deadline, deadline]
+            heapq.heappush(self._heap, (deadline, device_id))
+        elif deadline > timer[0]:
+            timer[0] = deadline
+        elif deadline < timer[0]:
+            # Moving a deadline back needs an earlier entry; the old one goes stale
+            timer[0] = timer[1] = deadline
+            heapq.heappush(self._heap, (deadline, device_id))
+
+    def cancel(self, device_id: int):
+        with self._lock:
+            self._timers.pop(device_id, None)
+
+    def next_deadline(self) -> Optional[float]:
+        """Earliest heap entry; may be a deadline that has since moved forward."""
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float, limit: int) -> List[int]:
+        """Up to ``limit`` devices whose deadline is at or before ``now``; they are no longer scheduled."""
+        due = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now and len(due) < limit:
+                queued, device_id = heapq.heappop(heap)
+                timer = self._timers.get(device_id)
+                if timer is None or timer[1] != queued:
+                    continue
+                if timer[0] <= now:
+                    del self._timers[device_id]
+                    due.append(device_id)
+                else:
+                    timer[1] = timer[0]
+                    heapq.heappush(heap, (timer[0], device_id))
+        return due
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "scheduled": len(self._timers),
+                "heap_entries": len(self._heap),
+                "next_deadline": self._heap[0][0] if self._heap else None
+            }
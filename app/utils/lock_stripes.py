@@ -0,0 +1,36 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+
+class LockStripes:
+    """
+    A fixed pool of locks shared out by key (device id), so operations on
+    the same device are serialized while different devices proceed in
+    parallel, without one lock object per device.
+
+    ``hold`` takes every stripe the keys map to in ascending stripe order,
+    so overlapping multi-key holders cannot deadlock each other.
+    """
+
+    def __init__(self, count: int = 64):
+        self._locks = [threading.Lock() for _ in range(count)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def stripe(self, key: int) -> int:
+        return hash(key) % len(self._locks)
+
+    @contextmanager
+    def hold(self, keys: Iterable[int]) -> Iterator[None]:
+        stripes = sorted({self.stripe(key) for key in keys})
+        acquired = []
+        try:
+            for stripe in stripes:
+                self._locks[stripe].acquire()
+                acquired.append(stripe)
+            yield
+        finally:
+            for stripe in reversed(acquired):
+                self._locks[stripe].release()
@@ -0,0 +1,333 @@
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Seconds; request latencies range from sub-millisecond lookups to full listings
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shards:
+    """
+    Per-thread arrays of floats. Each thread only ever writes its own array,
+    so updates are plain list stores with no lock; collection sums the
+    arrays. A lock is taken only the first time a thread touches the metric.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._arrays: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def mine(self) -> List[float]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0.0] * self._size
+            with self._lock:
+                self._arrays.append(values)
+            self._local.values = values
+            return values
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            arrays = list(self._arrays)
+        totals = [0.0] * self._size
+        for values in arrays:
+            for index, value in enumerate(values):
+                totals[index] += value
+        return totals
+
+
+class CounterChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1.0):
+        self._shards.mine()[0] += amount
+
+    def value(self) -> float:
+        return self._shards.totals()[0]
+
+
+class GaugeChild(CounterChild):
+    """Moves up and down; ``set`` is only meaningful for a gauge written by one thread."""
+
+    def dec(self, amount: float = 1.0):
+        self._shards.mine()[0] -= amount
+
+    def set(self, value: float):
+        # Fold the other threads' deltas into this thread's slot
+        values = self._shards.mine()
+        values[0] += value - self.value()
+
+
+class HistogramChild:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # One slot per bucket, then +Inf, sum and count
+        self._shards = _Shards(len(self.buckets) + 3)
+
+    def observe(self, value: float):
+        values = self._shards.mine()
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """Cumulative bucket counts (+Inf last), sum and count."""
+        totals = self._shards.totals()
+        cumulative = []
+        running = 0.0
+        for count in totals[:-2]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-2], totals[-1]
+
+
+class Metric:
+    """
+    A metric family. Children (one per label-value tuple) are created once
+    and cached; hot paths should keep the child ``labels()`` returns rather
+    than resolve it per call.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return list(self._children.items())
+
+    @property
+    def exposed_name(self) -> str:
+        """The family name in the HELP and TYPE lines."""
+        return self.name
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def _labels(self, values: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    @property
+    def exposed_name(self) -> str:
+        # The text format (unlike OpenMetrics) names a counter family after its samples
+        return self.name + "_total"
+
+    def samples(self):
+        for values, child in self.children():
+            yield self.exposed_name, self._labels(values), child.value()
+
+
+class Gauge(Metric):
+    """A gauge that is either updated directly or, with ``function``, read at collection time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def _new_child(self):
+        return GaugeChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                value = math.nan
+            yield self.name, {}, value
+            return
+        for values, child in self.children():
+            yield self.name, self._labels(values), child.value()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self):
+        for values, child in self.children():
+            labels = self._labels(values)
+            cumulative, total, count = child.snapshot()
+            for bound, bucket_count in zip((*self.buckets, math.inf), cumulative):
+                yield self.name + "_bucket", {**labels, "le": _format_value(bound)}, bucket_count
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, count
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value)) if value else "0"
+    return repr(value)
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape(value: str) -> str:
+    """A label value: HELP escapes plus double quotes."""
+    return _escape_help(value).replace('"', '\\"')
+
+
+class MetricsRegistry:
+    """Metric families rendered together in the Prometheus text format (0.0.4)."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.exposed_name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.exposed_name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    rendered = ",".join(f'{key}="{_escape(str(item))}"' for key, item in labels.items())
+                    lines.append(f"{name}{{{rendered}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "chimera_http_request_duration_seconds",
+    "Time from request start to the end of the response body, by route template",
+    ("method", "route")
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "chimera_http_requests",
+    "Requests served, by route template and status class",
+    ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "chimera_http_requests_in_flight",
+    "Requests currently being served (open change streams included)",
+    ("method",)
+)
+PERSISTENCE_WRITE_SECONDS = REGISTRY.histogram(
+    "chimera_persistence_write_duration_seconds",
+    "Time spent writing to storage (journal batch incl. fsync, snapshot, SQLite commit)",
+    ("kind",)
+)
+PERSISTENCE_WRITTEN_BYTES = REGISTRY.counter(
+    "chimera_persistence_written_bytes",
+    "Bytes written to the journal and snapshots",
+    ("kind",)
+)
+RESPONSE_BODY_BYTES = REGISTRY.counter(
+    "chimera_response_body_bytes",
+    "Bytes of cached listing/summary bodies sent, by format and content coding",
+    ("format", "encoding")
+)
+LOAD_SECONDS = REGISTRY.gauge(
+    "chimera_load_duration_seconds",
+    "Time the last load of the device store took"
+)
+SIGHTINGS_RECEIVED = REGISTRY.counter(
+    "chimera_ingest_sightings",
+    "Sightings accepted by /api/sightings"
+)
+SIGHTINGS_FLUSHED = REGISTRY.counter(
+    "chimera_ingest_flushed_devices",
+    "Devices named by flushed sightings, by outcome (created, updated, unchanged)",
+    ("result",)
+)
+SIGHTINGS_FLUSH_SECONDS = REGISTRY.histogram(
+    "chimera_ingest_flush_duration_seconds",
+    "Time to apply and persist one flush of buffered sightings"
+)
+DEVICES_EXPIRED = REGISTRY.counter(
+    "chimera_idle_expired_devices",
+    "Devices marked inactive after CHIMERA_IDLE_TIMEOUT seconds without a sighting"
+)
+DEVICES_CLASSIFIED = REGISTRY.counter(
+    "chimera_classified_devices",
+    "Devices run through the background classifier, by outcome (changed, refreshed, kept)",
+    ("result",)
+)
+CLASSIFY_BATCH_SECONDS = REGISTRY.histogram(
+    "chimera_classify_batch_duration_seconds",
+    "Time to classify one batch in a worker and write its results back"
+)
+CLASSIFY_THROUGHPUT = REGISTRY.gauge(
+    "chimera_classify_devices_per_second",
+    "Devices classified per second by the last re-classification pass"
+)
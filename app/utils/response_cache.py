@@ -0,0 +1,100 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+
+
+class ResponseCache:
+    """
+    Serialized response bodies keyed by ``(revision, shape)``.
+
+    ``shape`` identifies the request (route plus normalized query string).
+    Entries are evicted least-recently-used once either the entry or the
+    byte budget is exceeded. Entries of older revisions are never looked up
+    once requests see a newer one, so they are the first to age out; they
+    are not dropped outright, since concurrent requests may still see
+    different revisions for a moment (or, with a shared backend, for as
+    long as processes lag each other).
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[int, str], CachedResponse]" = OrderedDict()
+        self._revision: Optional[int] = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    @staticmethod
+    def etag(epoch: str, revision: int, shape: str) -> str:
+        digest = hashlib.blake2b(shape.encode("utf-8"), digest_size=8).hexdigest()
+        return f'"{epoch}-{revision}-{digest}"'
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate == "*":
+                return True
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == etag:
+                return True
+        return False
+
+    def get(self, revision: int, shape: str) -> Optional[CachedResponse]:
+        key = (revision, shape)
+        with self._lock:
+            self._revision = max(self._revision or 0, revision)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, revision: int, shape: str, body: bytes, headers: Dict[str, str]):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        key = (revision, shape)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous.body)
+            self._entries[key] = CachedResponse(body=body, headers=headers)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self.evictions += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "revision": self._revision,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+            }
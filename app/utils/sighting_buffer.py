@@ -0,0 +1,119 @@
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.schemas.device import Sighting
+
+
+# Sighting fields merged by recency: the newest sighting carrying a value wins
+MERGED_FIELDS = ("ip", "hostname", "os_name", "os_accuracy", "os_type", "os_vendor", "os_family", "os_gen", "os_cpe")
+OS_FIELDS = tuple(field for field in MERGED_FIELDS if field.startswith("os_"))
+
+# User agents kept per device, most recently seen last
+MAX_USER_AGENTS = 32
+
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """A stored ISO timestamp as a naive UTC datetime, ``None`` if unparsable."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+class PendingDevice:
+    """What the buffered sightings of one MAC say about its device."""
+
+    __slots__ = ("mac", "first_seen", "last_seen", "sightings", "values", "user_agents")
+
+    def __init__(self, mac: str, timestamp: datetime):
+        self.mac = mac
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.sightings = 0
+        # field -> (timestamp, value) of the newest sighting that carried it
+        self.values: Dict[str, Tuple[datetime, Any]] = {}
+        # user agent -> when it was last seen
+        self.user_agents: Dict[str, datetime] = {}
+
+    def merge(self, sighting: Sighting, timestamp: datetime):
+        self.sightings += 1
+        if timestamp < self.first_seen:
+            self.first_seen = timestamp
+        if timestamp > self.last_seen:
+            self.last_seen = timestamp
+        values = self.values
+        for field in MERGED_FIELDS:
+            value = getattr(sighting, field)
+            if value is not None:
+                current = values.get(field)
+                if current is None or timestamp >= current[0]:
+                    values[field] = (timestamp, value)
+        agent = sighting.user_agent
+        if agent:
+            seen = self.user_agents.get(agent)
+            if seen is None or timestamp > seen:
+                self.user_agents[agent] = timestamp
+
+    def os_updated(self) -> Optional[datetime]:
+        """Newest timestamp among the OS fields carried, ``None`` without any."""
+        return max((self.values[field][0] for field in OS_FIELDS if field in self.values), default=None)
+
+    def agents(self) -> List[str]:
+        """User agents seen, oldest first."""
+        return sorted(self.user_agents, key=self.user_agents.__getitem__)
+
+
+class SightingBuffer:
+    """
+    Sightings waiting to be applied, merged per MAC as they arrive, so a
+    device seen a thousand times between two flushes costs one state change
+    and one write. ``drain`` hands the merged devices to the flush and
+    starts an empty window.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, PendingDevice] = {}
+        self._lock = threading.Lock()
+        self._sightings = 0
+        self.received = 0
+        self.flushes = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, sightings: Iterable[Sighting], received: datetime) -> int:
+        """Merge ``sightings`` (those without a timestamp were seen at ``received``); returns the devices now pending."""
+        count = 0
+        with self._lock:
+            pending = self._pending
+            for sighting in sightings:
+                timestamp = sighting.timestamp or received
+                device = pending.get(sighting.mac)
+                if device is None:
+                    device = pending[sighting.mac] = PendingDevice(sighting.mac, timestamp)
+                device.merge(sighting, timestamp)
+                count += 1
+            self._sightings += count
+            self.received += count
+            return len(pending)
+
+    def drain(self) -> List[PendingDevice]:
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending = {}
+            self._sightings = 0
+            if pending:
+                self.flushes += 1
+        return pending
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "pending_devices": len(self._pending),
+                "pending_sightings": self._sightings,
+                "received": self.received,
+                "flushes": self.flushes
+            }
@@ -0,0 +1,283 @@
+import io
+import json
+import math
+import os
+import threading
+from typing import IO, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.storage.journal import release_process_lock, try_process_lock, write_atomic
+
+
+# name -> (seconds per bucket, buckets kept): a day of minutes, a month of
+# hours, two years of days
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "1m": (60, 1440),
+    "1h": (3600, 720),
+    "1d": (86400, 730)
+}
+
+AGGREGATES = ("avg", "min", "max", "last")
+
+HISTORY_FORMAT = 1
+
+# Series kept at most; when a new label would exceed it, the series of labels
+# gone from the summary are evicted, longest unused first
+MAX_SERIES = 256
+
+# Series that are always kept
+_FIXED_SERIES = ("total", "active")
+
+# Per-bucket statistics, in this order along the last axis
+_MIN, _MAX, _LAST, _SUM = range(4)
+
+
+def summary_series(summary: Dict) -> Dict[str, float]:
+    """Flatten a ``get_summary()`` dict into named series values."""
+    values = {"total": summary["total"], "active": summary["active"]}
+    for name, count in summary["by_group"].items():
+        values[f"group:{name}"] = count
+    for name, count in summary["by_category"].items():
+        values[f"category:{name}"] = count
+    return values
+
+
+class _Ring:
+    """
+    Fixed number of time buckets of one resolution. Bucket ``i`` holds the
+    samples whose timestamp falls in ``[starts[i], starts[i] + step)``; a
+    bucket is reused (and reset) when time wraps around to it.
+    """
+
+    def __init__(self, step: int, slots: int, keys: int):
+        self.step = step
+        self.slots = slots
+        self.starts = np.full(slots, -1, dtype=np.int64)
+        self.counts = np.zeros(slots, dtype=np.int32)
+        self.stats = np.zeros((slots, keys, 4), dtype=np.float64)
+
+    def add_keys(self, count: int):
+        # A series that did not exist yet was 0 in every earlier bucket
+        self.stats = np.concatenate([self.stats, np.zeros((self.slots, count, 4))], axis=1)
+
+    def drop_keys(self, columns: List[int]):
+        self.stats = np.delete(self.stats, columns, axis=1)
+
+    def last_used(self, column: int) -> int:
+        """Start of the newest bucket in which the series was not 0 (-1 if none)."""
+        used = (self.starts >= 0) & np.any(self.stats[:, column, :] != 0, axis=1)
+        return int(self.starts[used].max()) if used.any() else -1
+
+    def record(self, timestamp: float, values: np.ndarray):
+        start = int(timestamp // self.step) * self.step
+        index = (start // self.step) % self.slots
+        if start < self.starts[index]:
+            # Older than what this slot already holds (clock stepped back)
+            return
+        bucket = self.stats[index]
+        if self.starts[index] != start:
+            self.starts[index] = start
+            self.counts[index] = 1
+            bucket[:, _MIN] = values
+            bucket[:, _MAX] = values
+            bucket[:, _LAST] = values
+            bucket[:, _SUM] = values
+            return
+        self.counts[index] += 1
+        np.minimum(bucket[:, _MIN], values, out=bucket[:, _MIN])
+        np.maximum(bucket[:, _MAX], values, out=bucket[:, _MAX])
+        bucket[:, _LAST] = values
+        bucket[:, _SUM] += values
+
+
+class SummaryHistory:
+    """
+    Summary counters over time, at several resolutions (``RESOLUTIONS``).
+
+    Every sample updates one bucket per resolution in place (min, max, last
+    and sum of each series), so the rollups never need a separate pass and
+    memory is fixed by the bucket counts and the number of series (total,
+    active, one per group and category, at most ``MAX_SERIES``).
+
+    Persisted as a compressed ``.npz`` by one process at a time: with
+    several workers on one database each keeps its own history (they all
+    sample the same counters), but only the one holding ``<path>.lock``
+    writes the file; the others take over the lock once it is released.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.keys: List[str] = []
+        self._columns: Dict[str, int] = {}
+        self._rings = {name: _Ring(step, slots, 0) for name, (step, slots) in RESOLUTIONS.items()}
+        self._lock = threading.Lock()
+        self._file_lock: Optional[IO] = None
+        self.samples = 0
+        self.dropped_series = 0
+
+    def _vector(self, values: Dict[str, float]) -> np.ndarray:
+        new = [key for key in values if key not in self._columns]
+        if new:
+            overflow = len(self.keys) + len(new) - MAX_SERIES
+            if overflow > 0:
+                self._evict(overflow, values)
+                room = MAX_SERIES - len(self.keys)
+                self.dropped_series += max(len(new) - room, 0)
+                new = new[:max(room, 0)]
+            for key in new:
+                self._columns[key] = len(self.keys)
+                self.keys.append(key)
+            for ring in self._rings.values():
+                ring.add_keys(len(new))
+        vector = np.zeros(len(self.keys))
+        for key, value in values.items():
+            column = self._columns.get(key)
+            if column is not None:
+                vector[column] = value
+        return vector
+
+    def _evict(self, count: int, live: Dict[str, float]):
+        """Drop up to ``count`` series not in ``live``, those last non-zero longest ago first."""
+        candidates = [key for key in self.keys if key not in live and key not in _FIXED_SERIES]
+        last_used = {key: max(ring.last_used(self._columns[key]) for ring in self._rings.values()) for key in candidates}
+        evicted = sorted(candidates, key=last_used.__getitem__)[:count]
+        if not evicted:
+            return
+        columns = [self._columns[key] for key in evicted]
+        for ring in self._rings.values():
+            ring.drop_keys(columns)
+        self.keys = [key for key in self.keys if key not in set(evicted)]
+        self._columns = {key: index for index, key in enumerate(self.keys)}
+
+    def record(self, timestamp: float, summary: Dict):
+        """Add a sample of ``summary`` (a ``get_summary()`` dict) taken at ``timestamp`` (epoch seconds)."""
+        with self._lock:
+            vector = self._vector(summary_series(summary))
+            for ring in self._rings.values():
+                ring.record(timestamp, vector)
+            self.samples += 1
+
+    @staticmethod
+    def pick_resolution(start: float, end: float) -> str:
+        """The finest resolution whose retention still reaches back to ``start``."""
+        for name, (step, slots) in RESOLUTIONS.items():
+            if end - start <= step * (slots - 1):
+                return name
+        return list(RESOLUTIONS)[-1]
+
+    def query(
+        self,
+        start: float,
+        end: float,
+        resolution: Optional[str] = None,
+        keys: Optional[Sequence[str]] = None,
+        points: int = 500,
+        aggregate: str = "avg"
+    ) -> Dict:
+        """
+        The buckets between ``start`` and ``end`` as columnar series, merged
+        down to at most ``points`` points. Each point is the ``aggregate`` of
+        the samples it covers. Raises ``ValueError`` for unknown series or
+        parameters.
+        """
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"aggregate must be one of {', '.join(AGGREGATES)}")
+        resolution = resolution or self.pick_resolution(start, end)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+        with self._lock:
+            keys = list(keys) if keys else list(self.keys)
+            unknown = [key for key in keys if key not in self._columns]
+            if unknown:
+                raise ValueError(f"Unknown series: {', '.join(unknown)}")
+            columns = [self._columns[key] for key in keys]
+            ring = self._rings[resolution]
+            first = int(start // ring.step) * ring.step
+            selected = np.nonzero((ring.starts >= first) & (ring.starts <= end))[0]
+            selected = selected[np.argsort(ring.starts[selected])]
+            starts = ring.starts[selected]
+            counts = ring.counts[selected].astype(np.float64)
+            stats = ring.stats[selected][:, columns, :]
+
+        group = max(1, math.ceil(len(selected) / points)) if len(selected) else 1
+        bounds = np.arange(0, len(selected), group)
+        if len(selected):
+            if aggregate == "avg":
+                values = np.add.reduceat(stats[:, :, _SUM], bounds) / np.add.reduceat(counts, bounds)[:, None]
+            elif aggregate == "min":
+                values = np.minimum.reduceat(stats[:, :, _MIN], bounds)
+            elif aggregate == "max":
+                values = np.maximum.reduceat(stats[:, :, _MAX], bounds)
+            else:
+                ends = np.minimum(bounds + group, len(selected)) - 1
+                values = stats[ends, :, _LAST]
+        else:
+            values = np.zeros((0, len(keys)))
+        return {
+            "resolution": resolution,
+            "step": RESOLUTIONS[resolution][0] * group,
+            "aggregate": aggregate,
+            "start": start,
+            "end": end,
+            "timestamps": starts[bounds].tolist() if len(selected) else [],
+            "series": {key: np.round(values[:, index], 3).tolist() for index, key in enumerate(keys)}
+        }
+
+    def owns_file(self) -> bool:
+        """Whether this process writes ``path``, taking the lock if no other process holds it."""
+        if self._file_lock is None and self.path:
+            self._file_lock = try_process_lock(f"{self.path}.lock")
+        return self._file_lock is not None
+
+    def close(self):
+        release_process_lock(self._file_lock)
+        self._file_lock = None
+
+    def save(self):
+        """Atomically write the history to ``path`` (no-op without one, or if another process owns it)."""
+        if not self.path or not self.owns_file():
+            return
+        with self._lock:
+            arrays = {}
+            for name, ring in self._rings.items():
+                arrays[f"{name}_starts"] = ring.starts.copy()
+                arrays[f"{name}_counts"] = ring.counts.copy()
+                arrays[f"{name}_stats"] = ring.stats.copy()
+            meta = {"format": HISTORY_FORMAT, "keys": self.keys, "resolutions": RESOLUTIONS}
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8), **arrays)
+        write_atomic(self.path, buffer.getvalue())
+
+    def load(self):
+        """Restore a saved history; resolutions whose layout changed start empty."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                meta = json.loads(data["meta"].tobytes())
+                if meta.get("format") != HISTORY_FORMAT:
+                    return
+                with self._lock:
+                    self.keys = list(meta["keys"])
+                    self._columns = {key: index for index, key in enumerate(self.keys)}
+                    for name, (step, slots) in RESOLUTIONS.items():
+                        ring = _Ring(step, slots, len(self.keys))
+                        if list(meta["resolutions"].get(name, ())) == [step, slots]:
+                            ring.starts = data[f"{name}_starts"].astype(np.int64)
+                            ring.counts = data[f"{name}_counts"].astype(np.int32)
+                            ring.stats = data[f"{name}_stats"].astype(np.float64)
+                        self._rings[name] = ring
+        except Exception as e:
+            print(f"Error loading summary history {self.path}: {e}")
+            with self._lock:
+                self.keys = []
+                self._columns = {}
+                self._rings = {name: _Ring(step, slots, 0) for name, (step, slots) in RESOLUTIONS.items()}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "series": len(self.keys),
+                "dropped_series": self.dropped_series,
+                "samples": self.samples,
+                "bytes": sum(ring.stats.nbytes + ring.starts.nbytes + ring.counts.nbytes for ring in self._rings.values())
+            }
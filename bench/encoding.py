@@ -0,0 +1,96 @@
+"""
+Encoding benchmark: bytes on the wire and CPU to produce a device listing,
+for every response format and content coding the server supports.
+
+    python -m bench.encoding [--sizes 1000 100000] [--repeat 3]
+
+For each fleet size the whole fleet is encoded the way ``GET /api/devices``
+does it (``format=json``: pydantic's ``dump_json``; ``format=columnar`` /
+``msgpack``: ``app.utils.columnar``), then compressed with each available
+coding. Times are the best of ``--repeat`` runs, in milliseconds; ``ratio``
+is the size relative to plain JSON. Codecs whose optional package is not
+installed (brotli, zstandard, msgpack) are skipped. Results are printed as
+JSON for comparing runs.
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List, Tuple
+from pydantic import TypeAdapter
+from bench.fleet import generate_devices
+from app.schemas.device import Device
+from app.storage.snapshot import bulk_load
+from app.utils import columnar
+from app.utils.compression import CODECS
+
+
+_device_list_adapter = TypeAdapter(List[Device])
+
+
+def _formats() -> Dict[str, Callable[[List[Device]], bytes]]:
+    formats = {
+        "json": _device_list_adapter.dump_json,
+        "columnar": lambda devices: columnar.dumps(columnar.encode_devices(devices), columnar.JSON_MEDIA_TYPE),
+    }
+    if columnar.msgpack is not None:
+        formats["msgpack"] = lambda devices: columnar.dumps(columnar.encode_devices(devices), columnar.MSGPACK_MEDIA_TYPE)
+    return formats
+
+
+def _best(function: Callable[[], bytes], repeat: int) -> Tuple[bytes, float]:
+    best = float("inf")
+    result = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def measure(devices: List[Device], repeat: int) -> List[Dict]:
+    rows = []
+    baseline = None
+    for name, encode in _formats().items():
+        body, encode_seconds = _best(lambda: encode(devices), repeat)
+        if baseline is None:
+            baseline = len(body)
+        for coding in ("identity", *CODECS):
+            if coding == "identity":
+                wire, compress_seconds = body, 0.0
+            else:
+                wire, compress_seconds = _best(lambda: CODECS[coding](body), repeat)
+            rows.append({
+                "format": name,
+                "encoding": coding,
+                "bytes": len(wire),
+                "ratio": round(len(wire) / baseline, 4),
+                "encode_ms": round(encode_seconds * 1000, 1),
+                "compress_ms": round(compress_seconds * 1000, 1),
+                "total_ms": round((encode_seconds + compress_seconds) * 1000, 1)
+            })
+    return rows
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Compare response size and encode CPU across formats and codings")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    results = []
+    for size in args.sizes:
+        # Built like the server builds its store, so GC behaves the same
+        with bulk_load():
+            devices = [Device(**record) for record in generate_devices(size, args.seed)]
+        results.append({"devices": size, "results": measure(devices, args.repeat)})
+        del devices
+    print(json.dumps({
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "codings": list(CODECS),
+        "sizes": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
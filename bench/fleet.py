@@ -0,0 +1,145 @@
+"""
+Seeded synthetic fleets for benchmarks.
+
+    python -m bench.fleet --devices 100000 --seed 42 --out /tmp/fleet.json
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+from app.storage.blocklist_bits import BLOCKLIST_FIELDS
+
+
+GROUPS = [
+    {"id": 1, "name": "Default Group", "is_default": True},
+    {"id": 2, "name": "Staff", "is_default": False},
+    {"id": 3, "name": "Guests", "is_default": False},
+    {"id": 4, "name": "IoT", "is_default": False}
+]
+
+# (vendor, OUIs, hostname prefix, os_name, os_type, os_vendor, os_family, os_gen, device_type, category,
+#  user agents, share of randomized MACs, relative frequency, usual group ids)
+PROFILES = [
+    ("Raspberry Pi", ["B8:27:EB", "DC:A6:32"], "pi", "Linux 6.1", "embedded", "Linux", "Linux", "6.X", "Gateway", "Network Infrastructure", ["Suricata/7.0", "unbound/1.19.0"], 0.0, 1, [1]),
+    ("Ubiquiti", ["24:5A:4C", "78:8A:20"], "ap", "EdgeOS 2.x", "embedded", "Ubiquiti", "Linux", "4.X", "Access Point", "Network Infrastructure", ["UniFi/7.4"], 0.0, 2, [1]),
+    ("Apple", ["3C:22:FB", "A4:83:E7"], "mac", "macOS 14.5", "general purpose", "Apple", "macOS", "14.X", "Workstation", "Workstation", ["Safari/17.5", "CFNetwork/1494"], 0.3, 12, [2, 3]),
+    ("Google", ["3C:28:6D", "F4:F5:D8"], "pixel", "Android 14", "mobile", "Google", "Android", "14.X", "Smartphone", "Mobile", ["Chrome/126.0", "okhttp/4.12"], 0.8, 25, [2, 3]),
+    ("Samsung", ["8C:79:F5", "64:1C:AE"], "tv", "Tizen 7.0", "iot", "Samsung", "Tizen", "7.X", "Smart TV", "IoT", ["SamsungBrowser/5.0", "Netflix/8.0"], 0.0, 8, [4]),
+    ("Synology", ["00:11:32"], "nas", "Linux 4.4", "embedded", "Synology", "Linux", "4.X", "Network attached storage", "Network Infrastructure", ["DSM/7.2"], 0.0, 2, [1, 2]),
+    ("Hikvision", ["44:19:B6", "C0:56:E3"], "cam", "Linux 3.10", "iot", "Hikvision", "Linux", "3.X", "IP Camera", "IoT", ["Hikvision-Webs"], 0.0, 10, [4]),
+    ("HP", ["3C:D9:2B", "94:57:A5"], "printer", "Embedded RTOS", "printer", "HP", "RTOS", "1.X", "Printer", "Printer", ["HP-ChaiSOE/1.0"], 0.0, 4, [2]),
+    ("Dell", ["14:18:77", "F8:BC:12"], "srv", "Linux 5.15 (Ubuntu 22.04)", "general purpose", "Linux", "Linux", "5.X", "Server", "Network Infrastructure", ["apt-http/2.4", "curl/7.81"], 0.0, 4, [1, 2]),
+    ("Lenovo", ["54:EE:75", "8C:16:45"], "laptop", "Windows 11", "general purpose", "Microsoft", "Windows", "11", "Workstation", "Workstation", ["Edge/126.0", "Microsoft-CryptoAPI/10.0"], 0.2, 20, [2, 3])
+]
+PROFILE_WEIGHTS = [profile[12] for profile in PROFILES]
+
+# Blocklist fields each group enables by default; devices with a custom
+# blocklist flip a few of them
+GROUP_BLOCKLISTS = {
+    1: {"ads_trackers", "safesearch"},
+    2: {"ads_trackers", "gambling", "porn", "safesearch"},
+    3: {"ads_trackers", "gambling", "porn", "streaming", "netflix", "youtube", "tiktok", "safesearch"},
+    4: {"ads_trackers", "social_media", "facebook", "instagram", "tiktok", "gaming", "ai"}
+}
+
+EPOCH = datetime(2025, 8, 1)
+
+
+def _timestamp(rng: random.Random, start: datetime, days: float) -> datetime:
+    return start + timedelta(seconds=rng.uniform(0, days * 86400))
+
+
+def _mac(rng: random.Random, ouis: List[str], randomized: bool) -> str:
+    if randomized:
+        # Locally administered, unicast: what phones and laptops use for privacy
+        first = (rng.randrange(256) | 0x02) & 0xFE
+        octets = [f"{first:02X}", *(f"{rng.randrange(256):02X}" for _ in range(5))]
+    else:
+        octets = [*rng.choice(ouis).split(":"), *(f"{rng.randrange(256):02X}" for _ in range(3))]
+    return ":".join(octets)
+
+
+def _blocklist(rng: random.Random, group_id: int, custom: bool) -> Dict[str, bool]:
+    enabled = set(GROUP_BLOCKLISTS[group_id])
+    if custom:
+        enabled ^= set(rng.sample(BLOCKLIST_FIELDS, rng.randint(1, 3)))
+    return {field: field in enabled for field in BLOCKLIST_FIELDS}
+
+
+def generate_device(rng: random.Random, device_id: int) -> Dict:
+    """
+    One device drawn from a weighted mix of profiles: vendor OUIs (or
+    randomized MACs for phones/laptops), each group in its own /12 with one
+    address per device, and the group's default blocklist unless customized.
+    """
+    (vendor, ouis, prefix, os_name, os_type, os_vendor, os_family, os_gen, device_type, category,
+     agents, randomized_share, _, group_ids) = rng.choices(PROFILES, PROFILE_WEIGHTS)[0]
+    universal = rng.random() >= randomized_share
+    group = GROUPS[rng.choice(group_ids) - 1] if rng.random() < 0.9 else rng.choice(GROUPS)
+    custom = rng.random() < 0.3
+    first_seen = _timestamp(rng, EPOCH, 30)
+    last_seen = _timestamp(rng, first_seen, 14)
+    return {
+        "id": device_id,
+        "mac": _mac(rng, ouis, not universal),
+        "hostname": f"{prefix}-{device_id:06d}",
+        "vendor": vendor,
+        "given_name": f"{device_type} {device_id}",
+        "ip": f"10.{group['id'] * 16 + ((device_id >> 16) & 15)}.{(device_id >> 8) & 255}.{device_id & 255}",
+        "user_agent": list(agents),
+        "is_active": rng.random() < 0.6,
+        "has_custom_blocklist": custom,
+        "group": dict(group),
+        "first_seen": first_seen.isoformat(),
+        "last_seen": last_seen.isoformat(),
+        "is_mac_universal": universal,
+        "os_name": os_name,
+        "os_accuracy": rng.randint(60, 100),
+        "os_type": os_type,
+        "os_vendor": os_vendor,
+        "os_family": os_family,
+        "os_gen": os_gen,
+        "os_cpe": [f"cpe:/o:{os_vendor.lower()}:{os_family.lower()}"],
+        "os_last_updated": last_seen.isoformat(),
+        "blocklist": _blocklist(rng, group["id"], custom),
+        "ai_classification": {
+            "device_type": device_type,
+            "device_category": category,
+            "confidence": round(rng.uniform(0.5, 1.0), 2),
+            "reasoning": f"{vendor} OUI and {os_family} fingerprint",
+            "indicators": [vendor, os_family],
+            "last_classified": last_seen.isoformat()
+        }
+    }
+
+
+def generate_devices(count: int, seed: int = 42) -> Iterator[Dict]:
+    rng = random.Random(seed)
+    for device_id in range(1, count + 1):
+        yield generate_device(rng, device_id)
+
+
+def write_fleet(path: str, count: int, seed: int = 42):
+    """Write ``count`` devices as a JSON array without holding them all in memory."""
+    with open(path, "w") as f:
+        f.write("[")
+        for index, device in enumerate(generate_devices(count, seed)):
+            if index:
+                f.write(",")
+            f.write("\n")
+            f.write(json.dumps(device))
+        f.write("\n]\n")
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic device fleet")
+    parser.add_argument("--devices", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args(argv)
+    write_fleet(args.out, args.devices, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Ingest benchmark: sustained sighting throughput of ``POST /api/sightings``
+and what the flush window turns it into, against a seeded synthetic fleet.
+
+    python -m bench.ingest [--sizes 10000 100000] [--backends json sqlite]
+                           [--flush-intervals 0 1] [--sightings 200000] [--batch 500] [--concurrency 4]
+
+Each (size, backend, flush interval) runs in a fresh interpreter, since the
+app reads its configuration at import time. Requests go through
+``httpx.ASGITransport`` like ``bench.load``, so the numbers include body
+validation, buffering and the flushes running alongside. Sightings repeat a
+hot fifth of the fleet (a few devices far more often than the rest) and
+bring ``--new-share`` of previously unseen MACs, each seen several times.
+
+A flush interval of 0 applies every batch as it arrives (merging only
+within the batch), the baseline the coalescing window is measured against.
+Reported per run: ``sightings_per_second`` accepted, the number of flushes,
+devices written (``state_changes``) and ``sightings_per_write``, plus flush
+latency percentiles. Results are printed as JSON for comparing runs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+from bench.fleet import generate_devices, write_fleet
+from bench.load import BACKENDS, latency_summary
+
+
+def _sightings(devices: List[Dict], count: int, new_share: float, seed: int) -> List[Dict]:
+    """``count`` sightings of a skewed hot set of ``devices`` plus some new MACs, one second apart per thousand."""
+    rng = random.Random(seed)
+    hot = rng.sample(devices, max(1, len(devices) // 5))
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(len(hot))]
+    unseen = [f"02:BE:{index >> 16 & 255:02X}:{index >> 8 & 255:02X}:{index & 255:02X}:00" for index in range(max(1, int(count * new_share / 4)))]
+    started = datetime(2025, 9, 1)
+    picks = rng.choices(hot, weights, k=count)
+    sightings = []
+    for index, device in enumerate(picks):
+        timestamp = (started + timedelta(milliseconds=index)).isoformat()
+        if rng.random() < new_share:
+            sightings.append({"mac": rng.choice(unseen), "user_agent": "okhttp/4.12", "timestamp": timestamp})
+            continue
+        sighting = {"mac": device["mac"], "ip": device["ip"], "timestamp": timestamp}
+        if rng.random() < 0.2:
+            sighting["hostname"] = device["hostname"]
+        if rng.random() < 0.1:
+            sighting["user_agent"] = rng.choice(device["user_agent"])
+        sightings.append(sighting)
+    return sightings
+
+
+async def drive(client, sightings: List[Dict], batch: int, concurrency: int) -> Dict:
+    """Post ``sightings`` in ``batch``-sized requests from ``concurrency`` concurrent clients."""
+    batches = [sightings[start:start + batch] for start in range(0, len(sightings), batch)]
+    latencies: List[float] = []
+    errors = [0]
+    remaining = list(reversed(batches))
+
+    async def client_loop():
+        while remaining:
+            body = {"sightings": remaining.pop()}
+            started = time.perf_counter()
+            response = await client.post("/api/sightings", json=body)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 202:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return {
+        "elapsed_s": time.perf_counter() - started,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "latency": latency_summary(latencies)
+    }
+
+
+def _child(backend: str, devices: int, args: argparse.Namespace) -> Dict:
+    """Runs in a fresh interpreter whose ``CHIMERA_*`` environment points at the fleet."""
+    import httpx
+    from main import app
+    from app.routes.device_routes import device_controller
+
+    sightings = _sightings(list(generate_devices(devices, args.seed)), args.sightings, args.new_share, args.seed)
+    flushes: List[Dict] = []
+    flush = device_controller.sightings.flush
+
+    def timed_flush(durable: bool = True) -> Dict:
+        result = flush(durable)
+        if result["devices"]:
+            flushes.append(result)
+        return result
+
+    device_controller.sightings.flush = timed_flush
+
+    async def run_all() -> Dict:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await drive(client, sightings, args.batch, args.concurrency)
+
+    try:
+        result = asyncio.run(run_all())
+        started = time.perf_counter()
+        timed_flush()
+        drained_s = time.perf_counter() - started
+        written = sum(entry["created"] + entry["updated"] for entry in flushes)
+        return {
+            "backend": backend,
+            "devices": devices,
+            "flush_interval_s": float(os.environ["CHIMERA_INGEST_FLUSH_INTERVAL"]),
+            "sightings": len(sightings),
+            "batch": args.batch,
+            "concurrency": args.concurrency,
+            "elapsed_s": round(result["elapsed_s"], 3),
+            "drain_s": round(drained_s, 3),
+            "sightings_per_second": round(len(sightings) / result["elapsed_s"], 1),
+            "errors": result["errors"],
+            "request_latency": result["latency"],
+            "flushes": len(flushes),
+            "created": sum(entry["created"] for entry in flushes),
+            "state_changes": written,
+            "sightings_per_write": round(len(sightings) / written, 1) if written else 0.0,
+            "flush_latency": latency_summary([entry["elapsed_ms"] / 1000 for entry in flushes]),
+            "fleet_after": device_controller.count_devices()
+        }
+    finally:
+        device_controller.close()
+
+
+def _run_child(fleet: str, workdir: str, backend: str, devices: int, interval: float, args: argparse.Namespace) -> Dict:
+    env = dict(
+        os.environ,
+        CHIMERA_STORAGE_BACKEND=backend,
+        CHIMERA_SUMMARY_HISTORY_FILE="",
+        CHIMERA_METRICS="0",
+        CHIMERA_INGEST_FLUSH_INTERVAL=str(interval)
+    )
+    if backend == "sqlite":
+        from app.storage.migrate import migrate_json_to_sqlite
+        database = os.path.join(workdir, "devices.db")
+        migrate_json_to_sqlite(fleet, database)
+        env["CHIMERA_SQLITE_PATH"] = database
+    else:
+        data_file = os.path.join(workdir, "devices.json")
+        shutil.copyfile(fleet, data_file)
+        env["CHIMERA_DATA_FILE"] = data_file
+    command = [
+        sys.executable, "-m", "bench.ingest", "--child", backend, str(devices),
+        "--sightings", str(args.sightings),
+        "--batch", str(args.batch),
+        "--concurrency", str(args.concurrency),
+        "--new-share", str(args.new_share),
+        "--seed", str(args.seed)
+    ]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(args: argparse.Namespace) -> List[Dict]:
+    results = []
+    workdir = tempfile.mkdtemp(prefix="chimera-ingest-")
+    try:
+        for size in args.sizes:
+            fleet = os.path.join(workdir, f"fleet-{size}.json")
+            write_fleet(fleet, size, args.seed)
+            for backend in args.backends:
+                for interval in args.flush_intervals:
+                    rundir = tempfile.mkdtemp(dir=workdir)
+                    result = _run_child(fleet, rundir, backend, size, interval, args)
+                    results.append(result)
+                    print(json.dumps({key: result[key] for key in result if key != "request_latency"}), file=sys.stderr)
+                    shutil.rmtree(rundir, ignore_errors=True)
+            os.remove(fleet)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Measure sighting ingest throughput and flush coalescing")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--flush-intervals", type=float, nargs="+", default=[0, 1], help="Seconds; 0 applies every batch on arrival")
+    parser.add_argument("--sightings", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=500, help="Sightings per request")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--new-share", type=float, default=0.01, help="Share of sightings naming a MAC not in the fleet")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", nargs=2, metavar=("BACKEND", "DEVICES"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        backend, devices = args.child
+        print(json.dumps(_child(backend, int(devices), args)))
+        return
+    print(json.dumps({
+        "seed": args.seed,
+        "sightings": args.sightings,
+        "batch": args.batch,
+        "concurrency": args.concurrency,
+        "results": run(args)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Load benchmark: throughput and latency percentiles of every API route
+against a seeded synthetic fleet, driven in-process through the ASGI app.
+
+    python -m bench.load [--sizes 10000 100000] [--backends json sqlite]
+                         [--workloads read write mixed] [--concurrency 16] [--requests 2000]
+
+Each (size, backend) runs in a fresh interpreter, since the app reads its
+configuration at import time. Requests go through ``httpx.ASGITransport``,
+so the numbers include routing, validation, the controller, storage and
+serialization, but no sockets. Workloads:
+
+- read: lookups, filtered pages, summary and stats (95% reads)
+- write: single and bulk updates/actions (90% writes)
+- mixed: 70% reads, 30% writes
+
+The full ``GET /api/devices`` listing is only exercised for fleets of at most
+``FULL_LIST_MAX`` devices, and ``/api/summary/verify`` (a full recount) only
+rarely. The change stream is long-lived and not load-tested here.
+Results are printed as JSON for comparing runs.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from bench.fleet import GROUPS, write_fleet
+from app.storage.blocklist_bits import BLOCKLIST_FIELDS
+
+
+BACKENDS = ("json", "sqlite")
+FULL_LIST_MAX = 100000
+CATEGORIES = ["Network Infrastructure", "Workstation", "Mobile", "IoT", "Printer"]
+SORTS = ["id", "hostname", "-last_seen", "vendor", "ip"]
+
+# A request: (method, url, json body)
+Request = Tuple[str, str, Optional[Dict]]
+
+
+class Targets:
+    """Ids, MACs and IPs sampled from the loaded fleet for lookups."""
+
+    def __init__(self, devices: int, macs: List[str], ips: List[str]):
+        self.devices = devices
+        self.macs = macs
+        self.ips = ips
+
+    def device_id(self, rng: random.Random) -> int:
+        return rng.randint(1, self.devices)
+
+
+def _list_page(rng: random.Random, targets: Targets) -> Request:
+    params = [f"limit={rng.choice([25, 100, 500])}", f"sort={rng.choice(SORTS)}"]
+    if rng.random() < 0.5:
+        params.append(f"group_id={rng.choice(GROUPS)['id']}")
+    if rng.random() < 0.3:
+        params.append(f"blocked={rng.choice(BLOCKLIST_FIELDS)}")
+    if rng.random() < 0.3:
+        params.append("fields=id,hostname,ip,is_active")
+    return "GET", "/api/devices?" + "&".join(params), None
+
+
+def _list_all(rng: random.Random, targets: Targets) -> Request:
+    return "GET", "/api/devices", None
+
+
+def _by_id(rng: random.Random, targets: Targets) -> Request:
+    return "GET", f"/api/devices/{targets.device_id(rng)}", None
+
+
+def _by_mac(rng: random.Random, targets: Targets) -> Request:
+    return "GET", f"/api/devices/by-mac/{rng.choice(targets.macs)}", None
+
+
+def _by_ip(rng: random.Random, targets: Targets) -> Request:
+    return "GET", f"/api/devices/by-ip/{rng.choice(targets.ips)}", None
+
+
+def _summary(rng: random.Random, targets: Targets) -> Request:
+    return "GET", "/api/summary", None
+
+
+def _summary_verify(rng: random.Random, targets: Targets) -> Request:
+    return "GET", "/api/summary/verify", None
+
+
+def _blocklist_stats(rng: random.Random, targets: Targets) -> Request:
+    query = f"?group_id={rng.choice(GROUPS)['id']}" if rng.random() < 0.5 else ""
+    return "GET", f"/api/blocklist/stats{query}", None
+
+
+def _cache_stats(rng: random.Random, targets: Targets) -> Request:
+    return "GET", "/api/cache/stats", None
+
+
+def _changes_stats(rng: random.Random, targets: Targets) -> Request:
+    return "GET", "/api/changes/stats", None
+
+
+def _update(rng: random.Random, targets: Targets) -> Request:
+    body = rng.choice([
+        {"given_name": f"bench-{rng.randrange(1 << 20)}"},
+        {"group_id": rng.choice(GROUPS)["id"]},
+        {rng.choice(BLOCKLIST_FIELDS): rng.random() < 0.5}
+    ])
+    return "PATCH", f"/api/devices/{targets.device_id(rng)}", body
+
+
+def _action(rng: random.Random, targets: Targets) -> Request:
+    action = rng.choice(["isolate", "release", "toggle_block", "toggle_block"])
+    body = {"action": action}
+    if action == "toggle_block":
+        body["category"] = rng.choice(BLOCKLIST_FIELDS)
+    return "POST", f"/api/devices/{targets.device_id(rng)}/actions", body
+
+
+def _bulk_ids(rng: random.Random, targets: Targets) -> List[int]:
+    return [targets.device_id(rng) for _ in range(rng.choice([10, 100]))]
+
+
+def _bulk_update(rng: random.Random, targets: Targets) -> Request:
+    body = {"device_ids": _bulk_ids(rng, targets), "update": {rng.choice(BLOCKLIST_FIELDS): rng.random() < 0.5}}
+    if rng.random() < 0.3:
+        body["update"] = {"group_id": rng.choice(GROUPS)["id"]}
+    return "PATCH", "/api/devices/bulk", body
+
+
+def _bulk_action(rng: random.Random, targets: Targets) -> Request:
+    body = {"device_ids": _bulk_ids(rng, targets), "action": rng.choice(["isolate", "release"])}
+    if rng.random() < 0.05:
+        # Selector over a whole group and category: the expensive end of bulk
+        body = {"selector": {"group_id": rng.choice(GROUPS)["id"], "category": rng.choice(CATEGORIES)}, "action": "release"}
+    return "POST", "/api/devices/bulk/actions", body
+
+
+# name -> request factory
+OPERATIONS: Dict[str, Callable[[random.Random, Targets], Request]] = {
+    "GET /devices?limit": _list_page,
+    "GET /devices": _list_all,
+    "GET /devices/{id}": _by_id,
+    "GET /devices/by-mac/{mac}": _by_mac,
+    "GET /devices/by-ip/{ip}": _by_ip,
+    "GET /summary": _summary,
+    "GET /summary/verify": _summary_verify,
+    "GET /blocklist/stats": _blocklist_stats,
+    "GET /cache/stats": _cache_stats,
+    "GET /changes/stats": _changes_stats,
+    "PATCH /devices/{id}": _update,
+    "POST /devices/{id}/actions": _action,
+    "PATCH /devices/bulk": _bulk_update,
+    "POST /devices/bulk/actions": _bulk_action
+}
+
+READS = {
+    "GET /devices?limit": 20,
+    "GET /devices": 1,
+    "GET /devices/{id}": 30,
+    "GET /devices/by-mac/{mac}": 15,
+    "GET /devices/by-ip/{ip}": 10,
+    "GET /summary": 15,
+    "GET /summary/verify": 0.2,
+    "GET /blocklist/stats": 5,
+    "GET /cache/stats": 2,
+    "GET /changes/stats": 2
+}
+WRITES = {
+    "PATCH /devices/{id}": 45,
+    "POST /devices/{id}/actions": 45,
+    "PATCH /devices/bulk": 5,
+    "POST /devices/bulk/actions": 5
+}
+
+
+def _mix(read_share: float) -> Dict[str, float]:
+    reads = sum(READS.values())
+    writes = sum(WRITES.values())
+    mix = {name: weight / reads * read_share for name, weight in READS.items()}
+    mix.update({name: weight / writes * (1 - read_share) for name, weight in WRITES.items()})
+    return mix
+
+
+WORKLOADS = {
+    "read": _mix(0.95),
+    "write": _mix(0.10),
+    "mixed": _mix(0.70)
+}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0
+    }
+
+
+async def drive(
+    client,
+    targets: Targets,
+    workload: str,
+    concurrency: int,
+    requests: int,
+    seed: int
+) -> Dict:
+    """Issue ``requests`` requests from ``concurrency`` concurrent clients and time each one."""
+    mix = dict(WORKLOADS[workload])
+    if targets.devices > FULL_LIST_MAX:
+        mix.pop("GET /devices")
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    remaining = [requests]
+
+    async def client_loop(index: int):
+        rng = random.Random(seed * 1000 + index)
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            name = rng.choices(names, weights)[0]
+            method, url, body = OPERATIONS[name](rng, targets)
+            started = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            await response.aread()
+            latencies[name].append(time.perf_counter() - started)
+            if response.status_code >= 400 and response.status_code != 404:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    samples = [value for values in latencies.values() for value in values]
+    return {
+        "workload": workload,
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "errors": sum(errors.values()),
+        "latency": latency_summary(samples),
+        "routes": {
+            name: {
+                "requests": len(values),
+                "errors": errors[name],
+                "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+                **latency_summary(values)
+            }
+            for name, values in latencies.items() if values
+        }
+    }
+
+
+def _child(backend: str, devices: int, workloads: List[str], concurrency: int, requests: int, seed: int) -> Dict:
+    """Runs in a fresh interpreter whose ``CHIMERA_*`` environment points at the fleet."""
+    import httpx
+    from main import app
+    from app.routes.device_routes import device_controller
+
+    sample = random.Random(seed).sample(range(1, devices + 1), min(devices, 1000))
+    picked = [device_controller.get_device_by_id(device_id) for device_id in sample]
+    targets = Targets(devices, [device.mac for device in picked], [device.ip for device in picked])
+
+    async def run_all() -> List[Dict]:
+        transport = httpx.ASGITransport(app=app)
+        results = []
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for workload in workloads:
+                result = await drive(client, targets, workload, concurrency, requests, seed)
+                results.append({"backend": backend, "devices": devices, **result})
+        return results
+
+    try:
+        return {"results": asyncio.run(run_all())}
+    finally:
+        device_controller.close()
+
+
+def _run_child(fleet: str, workdir: str, backend: str, devices: int, args: argparse.Namespace) -> List[Dict]:
+    env = dict(os.environ, CHIMERA_STORAGE_BACKEND=backend, CHIMERA_SUMMARY_HISTORY_FILE="")
+    if backend == "sqlite":
+        from app.storage.migrate import migrate_json_to_sqlite
+        database = os.path.join(workdir, "devices.db")
+        migrate_json_to_sqlite(fleet, database)
+        env["CHIMERA_SQLITE_PATH"] = database
+    else:
+        data_file = os.path.join(workdir, "devices.json")
+        shutil.copyfile(fleet, data_file)
+        env["CHIMERA_DATA_FILE"] = data_file
+    command = [
+        sys.executable, "-m", "bench.load", "--child", backend, str(devices),
+        "--workloads", *args.workloads,
+        "--concurrency", str(args.concurrency),
+        "--requests", str(args.requests),
+        "--seed", str(args.seed)
+    ]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])["results"]
+
+
+def run(args: argparse.Namespace) -> List[Dict]:
+    results = []
+    workdir = tempfile.mkdtemp(prefix="chimera-load-")
+    try:
+        for size in args.sizes:
+            fleet = os.path.join(workdir, f"fleet-{size}.json")
+            write_fleet(fleet, size, args.seed)
+            for backend in args.backends:
+                rundir = tempfile.mkdtemp(dir=workdir)
+                for result in _run_child(fleet, rundir, backend, size, args):
+                    results.append(result)
+                    print(json.dumps({key: result[key] for key in result if key != "routes"}), file=sys.stderr)
+                shutil.rmtree(rundir, ignore_errors=True)
+            os.remove(fleet)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Measure API throughput and latency percentiles under synthetic load")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per workload")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", nargs=2, metavar=("BACKEND", "DEVICES"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        backend, devices = args.child
+        result = _child(backend, int(devices), args.workloads, args.concurrency, args.requests, args.seed)
+        print(json.dumps(result))
+        return
+    print(json.dumps({
+        "seed": args.seed,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "results": run(args)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Startup benchmark: time-to-ready and peak RSS of loading a fleet.
+
+    python -m bench.startup [--sizes 10000 100000 1000000] [--modes legacy validated trusted streamed]
+
+Each measurement runs in a fresh interpreter so peak RSS is not shared
+between runs. Modes:
+
+- legacy: ``json.load`` + ``Device(**record)`` per device (the original path)
+- validated: whole-array ``validate_json`` from bytes (files we did not write)
+- trusted: a snapshot + manifest written by the server, loaded without revalidation
+- streamed: element-at-a-time parsing (``CHIMERA_LOAD_STREAM_BYTES``), validated
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+from bench.fleet import write_fleet
+
+
+MODES = ("legacy", "validated", "trusted", "streamed")
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _child(path: str, mode: str) -> Dict:
+    from app.schemas.device import Device
+    from app.storage.device_store import DeviceStore
+    from app.storage.json_repository import JsonDeviceRepository
+    baseline = _peak_rss_mb()
+    started = time.perf_counter()
+    if mode == "legacy":
+        store = DeviceStore()
+        with open(path, "r") as f:
+            store.load(Device(**device) for device in json.load(f))
+        devices = len(store)
+    else:
+        repository = JsonDeviceRepository(
+            data_file_path=path,
+            compact_every=0,
+            stream_threshold=1 if mode == "streamed" else 0
+        )
+        repository.load()
+        devices = repository.count()
+    return {
+        "mode": mode,
+        "devices": devices,
+        "time_to_ready_s": round(time.perf_counter() - started, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+        "baseline_rss_mb": baseline
+    }
+
+
+def _run_child(path: str, mode: str) -> Dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "bench.startup", "--child", path, mode],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _write_trusted_snapshot(source: str, target: str):
+    """Let the server itself rewrite ``source`` so it carries a manifest."""
+    shutil.copyfile(source, target)
+    subprocess.run(
+        [sys.executable, "-c",
+         "import sys; from app.storage.json_repository import JsonDeviceRepository as R; "
+         "r = R(data_file_path=sys.argv[1], compact_every=0, stream_threshold=0); r.load(); r.flush(); r.close()",
+         target],
+        check=True
+    )
+
+
+def run(sizes: List[int], modes: List[str], seed: int = 42) -> List[Dict]:
+    results = []
+    workdir = tempfile.mkdtemp(prefix="chimera-startup-")
+    try:
+        for size in sizes:
+            fleet = os.path.join(workdir, f"fleet-{size}.json")
+            write_fleet(fleet, size, seed)
+            trusted = os.path.join(workdir, f"trusted-{size}.json")
+            if "trusted" in modes:
+                _write_trusted_snapshot(fleet, trusted)
+            for mode in modes:
+                result = _run_child(trusted if mode == "trusted" else fleet, mode)
+                result["file_mb"] = round(os.path.getsize(trusted if mode == "trusted" else fleet) / (1024 * 1024), 1)
+                results.append(result)
+                print(json.dumps(result), file=sys.stderr)
+            for path in os.listdir(workdir):
+                os.remove(os.path.join(workdir, path))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Measure time-to-ready and peak RSS of loading a device fleet")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--child", nargs=2, metavar=("PATH", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        print(json.dumps(_child(*args.child)))
+        return
+    print(json.dumps({"seed": args.seed, "results": run(args.sizes, args.modes, args.seed)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -38,8 +38,9 @@ import {
   CheckCircle,
   Close,
 } from '@mui/icons-material';
-import type { Device, DeviceUpdate } from '../types/device';
+import type { Device, DeviceUpdate, GroupPolicy } from '../types/device';
 import { useDeviceContext } from '../context/DeviceContext';
+import { deviceApi } from '../services/api';
 
 interface DeviceDetailsDialogProps {
   open: boolean;
@@ -58,9 +59,11 @@ const DeviceDetailsDialog: React.FC<DeviceDetailsDialogProps> = ({
   const [editData, setEditData] = useState<DeviceUpdate>({});
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [groups, setGroups] = useState<GroupPolicy[]>([]);
 
   const handleEdit = () => {
     setIsEditing(true);
+    deviceApi.getGroups().then(setGroups).catch(() => setGroups([]));
     setEditData({
       given_name: device.given_name,
       group_id: device.group.id,
@@ -195,10 +198,9 @@ const DeviceDetailsDialog: React.FC<DeviceDetailsDialogProps> = ({
                   },
                 }}
               >
-                <MenuItem value={1}>Default Group</MenuItem>
-                <MenuItem value={2}>Staff</MenuItem>
-                <MenuItem value={3}>Guests</MenuItem>
-                <MenuItem value={4}>IoT</MenuItem>
+                {(groups.length ? groups : [device.group]).map(group => (
+                  <MenuItem key={group.id} value={group.id}>{group.name}</MenuItem>
+                ))}
               </Select>
             </FormControl>
           ) : (
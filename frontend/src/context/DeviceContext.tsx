@@ -1,6 +1,6 @@
-import  React, { createContext, useContext, useState, useEffect } from 'react';
+import  React, { createContext, useContext, useState, useEffect, useRef } from 'react';
 import type { ReactNode } from 'react';
-import type { Device, Summary, DeviceUpdate, DeviceAction } from '../types/device';
+import type { Device, Summary, DeviceUpdate, DeviceAction, ChangeEvent, SummaryDelta } from '../types/device';
 import { deviceApi } from '../services/api';
 
 interface DeviceContextType {
@@ -24,6 +24,51 @@ export const useDeviceContext = () => {
   return context;
 };
 
+const addCounts = (counts: Record<string, number>, delta: Record<string, number> = {}) => {
+  const next = { ...counts };
+  for (const [key, value] of Object.entries(delta)) {
+    next[key] = (next[key] ?? 0) + value;
+    if (next[key] === 0) delete next[key];
+  }
+  return next;
+};
+
+const applySummaryDelta = (summary: Summary, delta: SummaryDelta): Summary => ({
+  total: summary.total + (delta.total ?? 0),
+  active: summary.active + (delta.active ?? 0),
+  by_group: addCounts(summary.by_group, delta.by_group),
+  by_category: addCounts(summary.by_category, delta.by_category),
+});
+
+const applyDeviceChanges = (device: Device, changes: Record<string, unknown>): Device => {
+  const next: Record<string, unknown> = { ...device };
+  for (const [field, value] of Object.entries(changes)) {
+    const current = next[field];
+    next[field] = value && typeof value === 'object' && !Array.isArray(value) && current && typeof current === 'object'
+      ? { ...current, ...value }
+      : value;
+  }
+  return next as unknown as Device;
+};
+
+const applyBlocklistChange = (device: Device, event: Extract<ChangeEvent, { type: 'devices.blocklist' }>): Device => {
+  const blocklist = { ...device.blocklist };
+  event.set.forEach(field => { blocklist[field] = true; });
+  event.clear.forEach(field => { blocklist[field] = false; });
+  event.toggle.forEach(field => { blocklist[field] = !blocklist[field]; });
+  return { ...device, blocklist, has_custom_blocklist: true };
+};
+
+// Devices without a custom blocklist follow their group's policy
+const applyGroupChange = (device: Device, event: Extract<ChangeEvent, { type: 'group.updated' }>): Device => {
+  const { blocklist, ...group } = event.group;
+  return {
+    ...device,
+    group,
+    blocklist: device.has_custom_blocklist ? device.blocklist : { ...blocklist },
+  };
+};
+
 interface DeviceProviderProps {
   children: ReactNode;
 }
@@ -33,6 +78,10 @@ export const DeviceProvider: React.FC<DeviceProviderProps> = ({ children }) => {
   const [summary, setSummary] = useState<Summary | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const changeStream = useRef<EventSource | null>(null);
+
+  // With the change feed connected, summary deltas arrive as events
+  const streamConnected = () => changeStream.current?.readyState === EventSource.OPEN;
 
   const refreshDevices = async () => {
     try {
@@ -64,7 +113,7 @@ export const DeviceProvider: React.FC<DeviceProviderProps> = ({ children }) => {
       setDevices(prev => prev.map(device => 
         device.id === deviceId ? updatedDevice : device
       ));
-      await refreshSummary();
+      if (!streamConnected()) await refreshSummary();
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to update device');
       throw err;
@@ -78,7 +127,7 @@ export const DeviceProvider: React.FC<DeviceProviderProps> = ({ children }) => {
       setDevices(prev => prev.map(device => 
         device.id === deviceId ? updatedDevice : device
       ));
-      await refreshSummary();
+      if (!streamConnected()) await refreshSummary();
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to perform action');
       throw err;
@@ -92,6 +141,45 @@ export const DeviceProvider: React.FC<DeviceProviderProps> = ({ children }) => {
     initializeData();
   }, []);
 
+  useEffect(() => {
+    const applyChange = (event: ChangeEvent) => {
+      if (event.type === 'devices.updated') {
+        const changes = new Map(event.devices.map(entry => [entry.id, entry.changes]));
+        setDevices(prev => prev.map(device =>
+          changes.has(device.id) ? applyDeviceChanges(device, changes.get(device.id)!) : device
+        ));
+      } else if (event.type === 'devices.created') {
+        const created = event.devices;
+        setDevices(prev => {
+          const known = new Set(prev.map(device => device.id));
+          return [...prev, ...created.filter(device => !known.has(device.id))];
+        });
+      } else if (event.type === 'devices.blocklist') {
+        const ids = new Set(event.ids);
+        setDevices(prev => prev.map(device =>
+          ids.has(device.id) ? applyBlocklistChange(device, event) : device
+        ));
+      } else if (event.type === 'group.updated') {
+        setDevices(prev => prev.map(device =>
+          device.group.id === event.group.id ? applyGroupChange(device, event) : device
+        ));
+      }
+      if (event.type === 'summary.repaired') {
+        setSummary(event.summary);
+      } else if (event.summary) {
+        const delta = event.summary;
+        setSummary(prev => prev && applySummaryDelta(prev, delta));
+      }
+    };
+    const resync = () => Promise.all([refreshDevices(), refreshSummary()]);
+
+    changeStream.current = deviceApi.openChangeStream(applyChange, resync);
+    return () => {
+      changeStream.current?.close();
+      changeStream.current = null;
+    };
+  }, []);
+
   const value: DeviceContextType = {
     devices,
     summary,
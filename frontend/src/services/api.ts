@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { Device, DeviceUpdate, DeviceAction, Summary } from '../types/device';
+import type { Device, DeviceUpdate, DeviceAction, Summary, SummaryHistory, SummaryHistoryParams, DeviceQueryParams, DeviceSearchParams, DevicePage, ChangeEvent, GroupPolicy, GroupCreate, GroupUpdate } from '../types/device';
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
 
@@ -16,10 +16,33 @@ export const deviceApi = {
     return response.data;
   },
 
+  getDevicesPage: async (params: DeviceQueryParams): Promise<DevicePage> => {
+    const response = await api.get('/api/devices', { params });
+    return {
+      devices: response.data,
+      nextCursor: response.headers['x-next-cursor'] ?? null,
+      total: Number(response.headers['x-total-count'] ?? response.data.length),
+    };
+  },
+
+  searchDevices: async (params: DeviceSearchParams): Promise<DevicePage> => {
+    const response = await api.get('/api/devices/search', { params });
+    return {
+      devices: response.data,
+      nextCursor: response.headers['x-next-cursor'] ?? null,
+      total: Number(response.headers['x-total-count'] ?? response.data.length),
+    };
+  },
+
   getSummary: async (): Promise<Summary> => {
     const response = await api.get('/api/summary');
     return response.data;
   },
+
+  getSummaryHistory: async (params: SummaryHistoryParams = {}): Promise<SummaryHistory> => {
+    const response = await api.get('/api/summary/history', { params });
+    return response.data;
+  },
   updateDevice: async (deviceId: number, updateData: DeviceUpdate): Promise<Device> => {
     const response = await api.patch(`/api/devices/${deviceId}`, updateData);
     return response.data;
@@ -28,6 +51,28 @@ export const deviceApi = {
     const response = await api.post(`/api/devices/${deviceId}/actions`, actionData);
     return response.data;
   },
+  getGroups: async (): Promise<GroupPolicy[]> => {
+    const response = await api.get('/api/groups');
+    return response.data;
+  },
+  createGroup: async (groupData: GroupCreate): Promise<GroupPolicy> => {
+    const response = await api.post('/api/groups', groupData);
+    return response.data;
+  },
+  updateGroup: async (groupId: number, updateData: GroupUpdate): Promise<GroupPolicy> => {
+    const response = await api.patch(`/api/groups/${groupId}`, updateData);
+    return response.data;
+  },
+  openChangeStream: (
+    onChange: (event: ChangeEvent) => void,
+    onReset: () => void,
+  ): EventSource => {
+    // EventSource reconnects on its own and resumes via Last-Event-ID
+    const source = new EventSource(`${API_BASE_URL}/api/changes/stream`);
+    source.onmessage = (message) => onChange(JSON.parse(message.data));
+    source.addEventListener('reset', () => onReset());
+    return source;
+  },
 };
 
 export default api;
@@ -20,6 +20,17 @@ export interface Blocklist {
   safesearch: boolean;
 }
 
+export interface GroupPolicy extends Group {
+  blocklist: Blocklist;
+}
+
+export interface GroupCreate {
+  name: string;
+  blocklist?: Blocklist;
+}
+
+export type GroupUpdate = { name?: string } & Partial<Blocklist>;
+
 export interface AIClassification {
   device_type: string;
   device_category: string;
@@ -58,6 +69,7 @@ export interface Device {
 export interface DeviceUpdate {
   given_name?: string;
   group_id?: number;
+  has_custom_blocklist?: boolean;
   ads_trackers?: boolean;
   gambling?: boolean;
   social_media?: boolean;
@@ -84,3 +96,98 @@ export interface Summary {
   by_group: Record<string, number>;
   by_category: Record<string, number>;
 }
+
+export interface SummaryHistoryParams {
+  start?: number;
+  end?: number;
+  resolution?: '1m' | '1h' | '1d';
+  series?: string;
+  points?: number;
+  aggregate?: 'avg' | 'min' | 'max' | 'last';
+}
+
+export interface SummaryHistory {
+  resolution: '1m' | '1h' | '1d';
+  step: number;
+  aggregate: string;
+  start: number;
+  end: number;
+  timestamps: number[];
+  series: Record<string, number[]>;
+}
+
+export interface DeviceQueryParams {
+  group_id?: number;
+  category?: string;
+  is_active?: boolean;
+  vendor?: string;
+  has_custom_blocklist?: boolean;
+  blocked?: string;
+  allowed?: string;
+  sort?: string;
+  limit?: number;
+  cursor?: string;
+  fields?: string;
+}
+
+export interface DeviceSearchParams {
+  q?: string;
+  mac?: string;
+  ip?: string;
+  group_id?: number;
+  category?: string;
+  is_active?: boolean;
+  limit?: number;
+  cursor?: string;
+  fields?: string;
+}
+
+export interface DevicePage {
+  devices: Partial<Device>[];
+  nextCursor: string | null;
+  total: number;
+}
+
+export interface SummaryDelta {
+  total?: number;
+  active?: number;
+  by_group?: Record<string, number>;
+  by_category?: Record<string, number>;
+}
+
+export type ChangeEvent =
+  | {
+      type: 'devices.updated';
+      revision: number;
+      devices: { id: number; changes: Partial<Record<keyof Device, unknown>> }[];
+      summary?: SummaryDelta;
+    }
+  | {
+      type: 'devices.created';
+      revision: number;
+      devices: Device[];
+      summary?: SummaryDelta;
+    }
+  | {
+      type: 'devices.blocklist';
+      revision: number;
+      ids: number[];
+      set: (keyof Blocklist)[];
+      clear: (keyof Blocklist)[];
+      toggle: (keyof Blocklist)[];
+    }
+  | {
+      type: 'group.created';
+      revision: number;
+      group: GroupPolicy;
+    }
+  | {
+      type: 'group.updated';
+      revision: number;
+      group: GroupPolicy;
+    }
+  | {
+      type: 'summary.repaired';
+      revision: number;
+      summary: Summary;
+    };
@@ -1,6 +1,20 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes.device_routes import router as device_router
+from app import config
+from app.middlewares.metrics import MetricsMiddleware
+from app.routes.device_routes import router as device_router, device_controller
+from app.routes.metrics_routes import router as metrics_router, profiler
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.PROFILER_ENABLED:
+        profiler.start()
+    yield
+    profiler.stop()
+    device_controller.close()
+
 
 app = FastAPI(
     title="Chimera Device Management API",
@@ -24,7 +38,8 @@ app = FastAPI(
 
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -33,9 +48,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag"],
 )
 
+if config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(device_router)
+app.include_router(metrics_router)
 
 @app.get("/")
 async def root():
@@ -44,9 +64,22 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "GET /api/devices": "Get all devices",
+            "GET /api/devices/search": "Search devices",
+            "GET /api/devices/{id}": "Get device by ID",
+            "GET /api/devices/by-mac/{mac}": "Get device by MAC",
+            "GET /api/devices/by-ip/{ip}": "Get devices by IP",
             "GET /api/summary": "Get summary statistics",
+            "GET /api/changes/stream": "Change feed (server-sent events)",
             "PATCH /api/devices/{id}": "Update device",
-            "POST /api/devices/{id}/actions": "Perform device action"
+            "POST /api/devices/{id}/actions": "Perform device action",
+            "PATCH /api/devices/bulk": "Bulk update devices",
+            "POST /api/devices/bulk/actions": "Bulk device action",
+            "POST /api/sightings": "Ingest device sightings",
+            "POST /api/classifications/run": "Re-classify due devices",
+            "GET /api/groups": "Get groups and their blocklist policies",
+            "POST /api/groups": "Create group",
+            "PATCH /api/groups/{id}": "Update group name or policy",
+            "GET /metrics": "Prometheus metrics"
         }
     }
 
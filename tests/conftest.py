@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+
+# The app reads its configuration at import: point it at scratch data before
+# anything imports app.config
+_APP_DATA = tempfile.mkdtemp(prefix="chimera-tests-")
+shutil.copyfile("app/data/devices.sample.json", os.path.join(_APP_DATA, "devices.json"))
+os.environ.update(
+    CHIMERA_STORAGE_BACKEND="json",
+    CHIMERA_DATA_FILE=os.path.join(_APP_DATA, "devices.json"),
+    CHIMERA_SUMMARY_HISTORY_FILE="",
+    CHIMERA_INGEST_FLUSH_INTERVAL="0",
+    # Forking worker processes from the (multi-threaded) test process is unsafe
+    CHIMERA_CLASSIFY_WORKERS="0"
+)
+
+import pytest
+from app.storage.json_repository import JsonDeviceRepository
+from app.storage.sqlite_repository import SqliteDeviceRepository
+
+SAMPLE = "app/data/devices.sample.json"
+
+
+@pytest.fixture
+def data_file(tmp_path) -> str:
+    """A private copy of the sample fleet (10 devices)."""
+    path = tmp_path / "devices.json"
+    shutil.copyfile(SAMPLE, path)
+    return str(path)
+
+
+@pytest.fixture
+def json_repository(data_file):
+    repository = JsonDeviceRepository(data_file_path=data_file)
+    repository.load()
+    yield repository
+    repository.close()
+
+
+@pytest.fixture
+def sqlite_repository(tmp_path, json_repository):
+    repository = SqliteDeviceRepository(db_path=str(tmp_path / "devices.db"))
+    repository.load()
+    for group in json_repository.groups():
+        repository.save_group(group)
+    repository.save_many(json_repository.all())
+    yield repository
+    repository.close()
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def repository(request):
+    """Each backend, loaded with the sample fleet."""
+    return request.getfixturevalue(f"{request.param}_repository")
+
+
+@pytest.fixture
+def controller(data_file):
+    """A controller of its own over a private copy of the sample fleet (JSON backend)."""
+    from app.controllers.device_controller import DeviceController
+    device_controller = DeviceController(JsonDeviceRepository(data_file_path=data_file))
+    yield device_controller
+    device_controller.close()
+
+
+@pytest.fixture
+def api(controller, monkeypatch):
+    """The API over ``controller`` instead of the app's shared one, for tests that change the fleet."""
+    from fastapi.testclient import TestClient
+    from main import app
+    from app.routes import device_routes
+    from app.utils.response_cache import ResponseCache
+    monkeypatch.setattr(device_routes, "device_controller", controller)
+    monkeypatch.setattr(device_routes, "response_cache", ResponseCache())
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The API over a scratch copy of the sample fleet, shared by the tests that only read it."""
+    from fastapi.testclient import TestClient
+    from main import app
+    from app.routes.device_routes import device_controller
+    with TestClient(app) as test_client:
+        yield test_client
+    device_controller.close()
@@ -0,0 +1,117 @@
+import shutil
+import numpy as np
+from app.schemas.device import Blocklist
+from app.storage.blocklist_bits import (
+    ALL_FIELDS_MASK, BLOCKLIST_FIELDS, CUSTOM_BIT, FIELD_BITS, SAFESEARCH_BIT, BlocklistChange, BlocklistColumn,
+    blocklist_to_mask, device_mask, fields_to_mask, mask_to_blocklist, mask_to_fields
+)
+from app.storage.device_store import DeviceStore
+from app.storage.json_repository import JsonDeviceRepository
+from app.storage.snapshot import load_devices
+
+
+def test_masks_round_trip():
+    for field in BLOCKLIST_FIELDS:
+        blocklist = Blocklist(**{name: name == field for name in BLOCKLIST_FIELDS})
+        assert blocklist_to_mask(blocklist) == FIELD_BITS[field]
+        assert mask_to_blocklist(FIELD_BITS[field]) == blocklist
+
+    every = Blocklist(**{name: True for name in BLOCKLIST_FIELDS})
+    assert blocklist_to_mask(every) == ALL_FIELDS_MASK
+    assert mask_to_fields(fields_to_mask(["tiktok", "safesearch"])) == \
+        [field for field in BLOCKLIST_FIELDS if field in ("tiktok", "safesearch")]
+
+
+def test_custom_bit_sits_outside_the_blocklist_fields(data_file):
+    assert not CUSTOM_BIT & ALL_FIELDS_MASK
+    assert CUSTOM_BIT <= np.iinfo(np.uint16).max
+    # The custom bit never leaks into a Blocklist
+    assert mask_to_blocklist(CUSTOM_BIT | SAFESEARCH_BIT) == mask_to_blocklist(SAFESEARCH_BIT)
+
+    device = next(iter(load_devices(data_file)))
+    custom = device.model_copy(update={"has_custom_blocklist": True})
+    inherited = device.model_copy(update={"has_custom_blocklist": False})
+    assert device_mask(custom) == blocklist_to_mask(device.blocklist) | CUSTOM_BIT
+    assert device_mask(inherited) == blocklist_to_mask(device.blocklist)
+
+
+def test_changes():
+    assert BlocklistChange.for_action("isolate").apply(0) == ALL_FIELDS_MASK | CUSTOM_BIT
+    assert BlocklistChange.for_action("release").apply(ALL_FIELDS_MASK) == SAFESEARCH_BIT | CUSTOM_BIT
+    toggle = BlocklistChange.for_action("toggle_block", "tiktok")
+    assert toggle.apply(toggle.apply(0)) == CUSTOM_BIT
+    assert BlocklistChange.for_action("toggle_block", "no_such_category") is None
+    assert BlocklistChange.for_fields({"tiktok": True, "safesearch": False}).apply(SAFESEARCH_BIT) == \
+        FIELD_BITS["tiktok"] | CUSTOM_BIT
+
+
+def test_column_follows_group_policies():
+    column = BlocklistColumn(capacity=2)
+    column.set(1, 0, group_id=3)
+    column.set(2, FIELD_BITS["tiktok"] | CUSTOM_BIT, group_id=3)
+    column.set(3, FIELD_BITS["gambling"], group_id=4)
+    assert column.ids_matching(require_mask=FIELD_BITS["tiktok"]).tolist() == [2]
+
+    column.set_policy(3, SAFESEARCH_BIT)
+    assert column.get(1) == SAFESEARCH_BIT
+    # Custom rows and rows of groups without a policy keep their own mask
+    assert column.get(2) == FIELD_BITS["tiktok"] | CUSTOM_BIT
+    assert column.get(3) == FIELD_BITS["gambling"]
+    assert column.ids_matching(require_mask=SAFESEARCH_BIT).tolist() == [1]
+    assert column.ids_matching(forbid_mask=CUSTOM_BIT).tolist() == [1, 3]
+    assert column.field_counts()["safesearch"] == 1
+
+    # An edit starts from the inherited policy and makes the row custom
+    column.apply(column.rows_for([1]), BlocklistChange(toggle_mask=FIELD_BITS["tiktok"]))
+    assert column.get(1) == SAFESEARCH_BIT | FIELD_BITS["tiktok"] | CUSTOM_BIT
+    column.set_policy(3, None)
+    assert column.get(1) == SAFESEARCH_BIT | FIELD_BITS["tiktok"] | CUSTOM_BIT
+
+
+def test_vectorized_edits_are_materialized_lazily(data_file):
+    store = DeviceStore()
+    store.load(load_devices(data_file))
+    before = store.by_id[2]
+
+    assert sorted(store.apply_blocklist([2, 5, 999], BlocklistChange(set_mask=FIELD_BITS["gambling"]))) == [2, 5]
+    assert store.blocklists.dirty_count == 2 and sorted(store.blocklists.dirty_ids()) == [2, 5]
+    # Nothing was rewritten yet, but counts and filters already see the edit
+    assert store.by_id[2] is before
+    assert store.blocklist_counts([2, 5])["gambling"] == 2
+    assert {2, 5} <= set(store.match_ids(blocked=["gambling"]))
+
+    device = store.get(2)
+    assert device is not before and device.blocklist.gambling and device.has_custom_blocklist
+    assert store.by_id[2] is device and not store.blocklists.is_dirty(2)
+    assert store.blocklists.dirty_count == 1
+    assert store.get(2) is device
+
+    store.all()
+    assert store.blocklists.dirty_count == 0 and store.by_id[5].blocklist.gambling
+
+
+def test_replayed_toggles_are_idempotent(data_file):
+    repository = JsonDeviceRepository(data_file_path=data_file)
+    repository.load()
+    toggled = not repository.get(4).blocklist.tiktok
+    repository.apply_blocklist([4], BlocklistChange.for_action("toggle_block", "tiktok"))
+    repository.sync()
+    journal = f"{data_file}.journal"
+    shutil.copyfile(journal, f"{journal}.kept")
+
+    # A snapshot that already covers the toggle, with its journal records
+    # still around, as a crash before the journal is truncated leaves them
+    repository.flush()
+    repository.close()
+    shutil.copyfile(f"{journal}.kept", journal)
+
+    for _ in range(2):
+        reopened = JsonDeviceRepository(data_file_path=data_file)
+        reopened.load()
+        try:
+            assert reopened.replayed_records >= 1
+            assert reopened.get(4).blocklist.tiktok is toggled
+            assert reopened.get(4).has_custom_blocklist
+        finally:
+            reopened.close()
+        shutil.copyfile(f"{journal}.kept", journal)
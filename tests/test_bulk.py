@@ -0,0 +1,66 @@
+import pytest
+
+
+@pytest.fixture
+def commits(controller):
+    """Journal records and revisions since the fixture was set up."""
+    journal = controller.repository.journal
+    start = (journal.appended_seq, controller.revision)
+    return lambda: (journal.appended_seq - start[0], controller.revision - start[1])
+
+
+def test_bulk_action_is_one_commit_with_per_device_results(api, commits):
+    response = api.post("/api/devices/bulk/actions", json={"device_ids": [3, 4, 999], "action": "isolate"})
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["updated"], result["failed"], result["not_found"]) == (2, 0, 1)
+    assert [(item["id"], item["status"]) for item in result["results"]] == [(3, "updated"), (4, "updated"), (999, "not_found")]
+    assert commits() == (1, 1)
+    for device_id in (3, 4):
+        device = api.get(f"/api/devices/{device_id}").json()
+        assert all(device["blocklist"].values()) and device["has_custom_blocklist"]
+
+
+def test_bulk_toggle_of_unknown_category_fails_without_changing_anything(api, commits):
+    before = api.get("/api/devices/3").json()
+    response = api.post("/api/devices/bulk/actions", json={"device_ids": [3, 999], "action": "toggle_block", "category": "nope"})
+    result = response.json()
+    assert (result["updated"], result["failed"], result["not_found"]) == (0, 1, 1)
+    assert result["results"][0] == {"id": 3, "status": "failed", "reason": "Unknown blocklist category 'nope'"}
+    assert commits() == (0, 0)
+    assert api.get("/api/devices/3").json() == before
+
+
+def test_single_action_on_unknown_category_is_rejected(api):
+    response = api.post("/api/devices/3/actions", json={"action": "toggle_block", "category": "nope"})
+    assert response.status_code == 400
+
+
+def test_bulk_patch_by_selector(api, commits):
+    response = api.patch("/api/devices/bulk", json={"selector": {"group_id": 4}, "update": {"group_id": 2}})
+    result = response.json()
+    assert result["updated"] == 3 and [item["id"] for item in result["results"]] == [2, 5, 8]
+    assert commits() == (1, 1)
+    assert api.get("/api/devices", params={"group_id": 4}).headers["X-Total-Count"] == "0"
+    assert api.get("/api/summary").json()["by_group"]["Staff"] == 7
+
+
+def test_bulk_blocklist_patch_is_one_vectorized_edit(api, commits):
+    response = api.patch("/api/devices/bulk", json={"device_ids": [1, 2, 3], "update": {"tiktok": True, "gaming": False}})
+    assert response.json()["updated"] == 3
+    assert commits() == (1, 1)
+    for device_id in (1, 2, 3):
+        blocklist = api.get(f"/api/devices/{device_id}").json()["blocklist"]
+        assert blocklist["tiktok"] and not blocklist["gaming"]
+
+
+def test_bulk_patch_to_unknown_group_changes_nothing(api, commits):
+    response = api.patch("/api/devices/bulk", json={"device_ids": [1, 2], "update": {"group_id": 99}})
+    assert response.status_code == 400
+    assert commits() == (0, 0)
+
+
+def test_bulk_target_is_ids_or_selector(api):
+    both = {"device_ids": [1], "selector": {"group_id": 1}, "action": "isolate"}
+    assert api.post("/api/devices/bulk/actions", json=both).status_code == 422
+    assert api.post("/api/devices/bulk/actions", json={"action": "isolate"}).status_code == 422
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import pytest
+from starlette.requests import Request
+from app.routes import device_routes
+from app.schemas.device import DeviceUpdate
+from app.utils.change_feed import OVERFLOW, ChangeFeed, device_changes, summary_delta
+
+
+def test_device_changes_and_summary_delta():
+    before = {"given_name": "a", "is_active": True, "group": {"id": 1, "name": "Default Group"}}
+    after = {"given_name": "b", "is_active": True, "group": {"id": 2, "name": "Staff"}}
+    assert device_changes(before, after) == {"given_name": "b", "group": {"id": 2, "name": "Staff"}}
+    assert summary_delta([
+        (("Default Group", "IoT", True), ("Staff", "IoT", False)),
+        (None, ("Staff", "Mobile", True)),
+        (("Guests", "IoT", True), ("Guests", "IoT", True)),
+    ]) == {"total": 1, "by_group": {"Default Group": -1, "Staff": 2}, "by_category": {"Mobile": 1}}
+
+
+def test_backlog_replays_after_the_requested_revision():
+    feed = ChangeFeed(buffer_size=3)
+    loop = asyncio.new_event_loop()
+    try:
+        for revision in range(1, 6):
+            feed.publish(revision, {"n": revision})
+        # Revisions 3-5 are buffered: resuming after 2 still sees everything
+        assert [revision for revision, _ in feed.subscribe(loop, since=2)[1]] == [3, 4, 5]
+        assert feed.subscribe(loop, since=4)[1] == [(5, '{"n":5}')]
+        assert feed.subscribe(loop, since=5)[1] == []
+        assert feed.subscribe(loop)[1] == []
+        # Revision 2 has fallen out of the buffer
+        assert feed.subscribe(loop, since=1)[1] is None
+        assert feed.stats()["subscribers"] == 5 and feed.stats()["oldest_revision"] == 3
+    finally:
+        loop.close()
+
+
+def test_slow_subscribers_are_cut_off():
+    feed = ChangeFeed(max_queue=2)
+    loop = asyncio.new_event_loop()
+    try:
+        slow, _ = feed.subscribe(loop)
+        for revision in range(1, 4):
+            feed.publish(revision, {"n": revision})
+        feed.publish(4, {"n": 4})
+        loop.run_until_complete(asyncio.sleep(0))
+        assert slow.overflowed
+        assert slow.queue.get_nowait() is OVERFLOW and slow.queue.empty()
+        feed.unsubscribe(slow)
+        assert feed.stats() == {**feed.stats(), "subscribers": 0, "overflows": 1, "published": 4}
+    finally:
+        loop.close()
+
+
+@pytest.fixture
+def feed_controller(controller, monkeypatch):
+    monkeypatch.setattr(device_routes, "device_controller", controller)
+    return controller
+
+
+def _rename(controller, device_id, name):
+    controller.update_device(device_id, DeviceUpdate(given_name=name), durable=False)
+
+
+def _parse(chunk: str):
+    fields = {}
+    for line in chunk.strip("\n").split("\n"):
+        name, _, value = line.partition(": ")
+        fields[name] = value
+    return fields
+
+
+def _stream(headers=None, since=None, count=10, between=None):
+    """Up to ``count`` SSE messages (retry and keep-alive lines left out), calling ``between`` after each."""
+    async def read():
+        request = Request({
+            "type": "http",
+            "method": "GET",
+            "path": "/api/changes/stream",
+            "query_string": b"",
+            "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+        })
+        response = await device_routes.stream_changes(request, since=since)
+        iterator = response.body_iterator
+        messages = []
+        try:
+            while len(messages) < count:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), 0.5)
+                except (StopAsyncIteration, asyncio.TimeoutError):
+                    break
+                if chunk.startswith(("retry:", ":")):
+                    continue
+                messages.append(_parse(chunk))
+                if between is not None:
+                    between(messages[-1])
+        finally:
+            await iterator.aclose()
+        return messages
+    return asyncio.run(read())
+
+
+def test_stream_resumes_from_last_event_id(feed_controller):
+    epoch = feed_controller.epoch
+    _rename(feed_controller, 3, "first")
+    resume_from = feed_controller.revision
+    _rename(feed_controller, 3, "second")
+    _rename(feed_controller, 4, "third")
+
+    messages = _stream(headers={"Last-Event-ID": f"{epoch}:{resume_from}"}, count=3)
+    assert messages[0]["event"] == "hello"
+    assert json.loads(messages[0]["data"]) == {"epoch": epoch, "revision": resume_from + 2}
+    assert [message["id"] for message in messages[1:]] == [f"{epoch}:{resume_from + 1}", f"{epoch}:{resume_from + 2}"]
+    assert [json.loads(message["data"])["devices"] for message in messages[1:]] == [
+        [{"id": 3, "changes": {"given_name": "second"}}],
+        [{"id": 4, "changes": {"given_name": "third"}}]
+    ]
+    # Last-Event-ID wins over since
+    assert len(_stream(headers={"Last-Event-ID": f"{epoch}:{resume_from + 1}"}, since=0, count=3)) == 2
+
+
+def test_live_events_follow_the_backlog(feed_controller):
+    start = feed_controller.revision
+    _rename(feed_controller, 3, "buffered")
+    renamed = []
+
+    def rename_once(message):
+        if not renamed:
+            renamed.append(1)
+            _rename(feed_controller, 5, "live")
+
+    messages = _stream(since=start, count=3, between=rename_once)
+    assert [json.loads(message["data"])["devices"][0]["id"] for message in messages[1:]] == [3, 5]
+    assert [int(message["id"].split(":")[1]) for message in messages[1:]] == [start + 1, start + 2]
+
+
+def test_stream_resets_when_it_cannot_resume(feed_controller):
+    stale = _stream(headers={"Last-Event-ID": f"not-{feed_controller.epoch}:1"}, count=2)
+    assert stale[1]["event"] == "reset" and json.loads(stale[1]["data"])["reason"] == "epoch_changed"
+
+    feed_controller.changes.feed = ChangeFeed(buffer_size=2)
+    feed_controller.changes.feed.head = start = feed_controller.revision
+    for name in ("a", "b", "c"):
+        _rename(feed_controller, 3, name)
+    gap = _stream(since=start, count=2)
+    assert gap[1]["event"] == "reset" and json.loads(gap[1]["data"])["reason"] == "not_buffered"
+    assert len(_stream(since=start + 1, count=3)) == 3
+
+
+def test_slow_stream_is_reset_and_closed(feed_controller):
+    feed_controller.changes.feed = ChangeFeed(max_queue=2)
+    feed_controller.changes.feed.head = feed_controller.revision
+
+    def flood(message):
+        if message.get("event") == "hello":
+            for name in ("a", "b", "c", "d"):
+                _rename(feed_controller, 3, name)
+
+    messages = _stream(count=10, between=flood)
+    assert [message.get("event") for message in messages] == ["hello", "reset"]
+    assert json.loads(messages[1]["data"])["reason"] == "slow_consumer"
+    assert feed_controller.changes.feed.stats()["overflows"] == 1
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import time
+from app import config
+from app.utils.classifier import classify, classify_batch, features
+
+
+def test_rules_pick_the_best_matching_type():
+    gateway = classify(features("Netgate", "gw-main", ["pfSense/2.7 unbound"], []))
+    assert (gateway["device_type"], gateway["device_category"]) == ("Gateway", "Network Infrastructure")
+    assert gateway["indicators"] == ["Router services in user agent", "Router hostname"]
+    # Noisy-or of the two matched weights
+    assert gateway["confidence"] == round(1 - 0.4 * 0.5, 2)
+
+    phone = classify(features("Google", "pixel-8", ["okhttp/4.9"], ["cpe:/o:google:android:14"]))
+    assert (phone["device_type"], phone["device_category"]) == ("Smartphone", "Mobile")
+
+
+def test_conflicting_evidence_lowers_confidence():
+    printer = classify(features("", "printer-2", [], []))
+    conflicted = classify(features("", "printer-2", ["Roku/DVP-12"], []))
+    assert printer["confidence"] == 0.5
+    assert conflicted["confidence"] == 0.25
+    assert "also matched" in conflicted["reasoning"]
+
+
+def test_nothing_matched_is_unknown():
+    result = classify(features("Unknown", "", [], []))
+    assert result["device_type"] == "Unknown" and result["confidence"] == 0.0
+    assert classify_batch([(7, features("Unknown", "", [], []))]) == [(7, result)]
+
+
+def test_run_classifies_on_demand_with_the_background_pass_off(client):
+    total = client.get("/api/summary").json()["total"]
+    assert config.CLASSIFY_INTERVAL == 0
+    result = client.post("/api/classifications/run").json()
+    assert result["devices"] == total
+    assert client.post("/api/classifications/run").json()["devices"] == 0
+    assert client.get("/api/classifications/stats").json()["scheduled"] == total
+
+
+def test_more_confident_classifications_are_kept_and_rescheduled(controller):
+    now = time.time()
+    result = controller.classifier.run(now=now)
+    # The sample's stored classifications all beat the rules
+    assert (result["devices"], result["kept"], result["changed"]) == (10, 10, 0)
+    assert controller.classifier.run(now=now)["devices"] == 0
+
+    stats = controller.classifier.stats()
+    assert stats["scheduled"] == 10
+    # The least confident stored classification (Printer, 0.88) is due first
+    assert stats["next_due"] >= now + config.CLASSIFY_MAX_AGE * 0.88 - 1
+    assert controller.classifier.run(now=now + config.CLASSIFY_MAX_AGE + 1)["devices"] == 10
+
+
+def test_category_change_moves_summary_counters(controller):
+    device = controller.get_device_by_id(6)
+    stale = device.ai_classification.model_copy(update={"device_category": "IoT", "confidence": 0.1})
+    controller.repository.save(device.model_copy(update={"ai_classification": stale}))
+    before = controller.get_summary()["by_category"]
+    revision = controller.revision
+
+    result = controller.classifier.run()
+    assert result["changed"] == 1
+
+    after = controller.get_summary()["by_category"]
+    assert after["IoT"] == before["IoT"] - 1
+    assert after["Network Infrastructure"] == before["Network Infrastructure"] + 1
+    assert controller.verify_summary()["ok"]
+    reclassified = controller.get_device_by_id(6).ai_classification
+    assert (reclassified.device_type, reclassified.device_category) == ("Network attached storage", "Network Infrastructure")
+
+    loop = asyncio.new_event_loop()
+    try:
+        subscriber, backlog = controller.changes.feed.subscribe(loop, since=revision)
+        controller.changes.feed.unsubscribe(subscriber)
+    finally:
+        loop.close()
+    events = [json.loads(data) for _, data in backlog]
+    assert [event["summary"] for event in events] == [{"by_category": {"IoT": -1, "Network Infrastructure": 1}}]
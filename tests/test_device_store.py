@@ -0,0 +1,74 @@
+from app.schemas.device import Group
+from app.storage.blocklist_bits import FIELD_BITS, BlocklistChange
+from app.storage.json_repository import JsonDeviceRepository
+
+
+def test_lookups(repository):
+    assert [device.id for device in repository.find_by_mac("b8:27:eb:10:22:33")] == [2]
+    assert [device.id for device in repository.find_by_ip("192.168.69.2")] == [2]
+    assert repository.find_by_mac("00:00:00:00:00:00") == []
+    assert repository.match_ids(group_id=4) == [2, 5, 8]
+    assert repository.count(is_active=True) == 8
+    assert repository.get(2).hostname == "ap-lobby"
+    assert repository.get(999) is None
+
+
+def test_moving_a_device_keeps_indexes_and_summary_consistent(repository):
+    device = repository.get(2)
+    staff = repository.get_group(2)
+    repository.save(device.model_copy(update={
+        "group": Group(id=staff.id, name=staff.name, is_default=False),
+        "is_active": False,
+        "ip": "192.168.69.250"
+    }))
+
+    assert repository.match_ids(group_id=4) == [5, 8]
+    assert 2 in repository.match_ids(group_id=2)
+    assert 2 in [device.id for device in repository.find(group_id=2, is_active=False)]
+    assert 2 not in repository.match_ids(is_active=True)
+    assert repository.find_by_ip("192.168.69.2") == []
+    assert [device.id for device in repository.find_by_ip("192.168.69.250")] == [2]
+    summary = repository.summary()
+    assert summary["active"] == 7
+    assert summary["by_group"]["IoT"] == 2
+    assert summary["by_group"]["Staff"] == 5
+    assert repository.verify_summary()["ok"]
+
+
+def test_apply_blocklist(repository):
+    before = repository.blocklist_counts(group_id=4)
+    changed = repository.apply_blocklist([2, 5, 999], BlocklistChange(toggle_mask=FIELD_BITS["tiktok"]))
+    assert sorted(changed) == [2, 5]
+
+    after = repository.blocklist_counts(group_id=4)
+    flipped = [repository.get(device_id).blocklist.tiktok for device_id in (2, 5)]
+    assert after["tiktok"] == before["tiktok"] + sum(1 if on else -1 for on in flipped)
+    assert {field: count for field, count in after.items() if field != "tiktok"} == \
+        {field: count for field, count in before.items() if field != "tiktok"}
+    assert all(repository.get(device_id).has_custom_blocklist for device_id in (2, 5))
+
+
+def test_isolate_and_release(repository):
+    repository.apply_blocklist([3], BlocklistChange.for_action("isolate"))
+    assert all(repository.get(3).blocklist.model_dump().values())
+    repository.apply_blocklist([3], BlocklistChange.for_action("release"))
+    blocklist = repository.get(3).blocklist.model_dump()
+    assert [field for field, on in blocklist.items() if on] == ["safesearch"]
+
+
+def test_json_changes_survive_a_restart(json_repository, data_file):
+    device = json_repository.get(4)
+    json_repository.save(device.model_copy(update={"given_name": "Renamed"}))
+    json_repository.apply_blocklist([4], BlocklistChange.for_action("isolate"))
+    json_repository.sync()
+    json_repository.close()
+
+    reopened = JsonDeviceRepository(data_file_path=data_file)
+    reopened.load()
+    try:
+        assert reopened.get(4).given_name == "Renamed"
+        assert all(reopened.get(4).blocklist.model_dump().values())
+        assert reopened.summary() == json_repository.summary()
+        assert reopened.verify_summary()["ok"]
+    finally:
+        reopened.close()
@@ -0,0 +1,54 @@
+import errno
+import os
+import time
+from fastapi.testclient import TestClient
+from app.storage import journal as journal_module
+
+
+def test_durable_write_fails_when_the_journal_cannot_sync(client, monkeypatch):
+    from app.routes.device_routes import device_controller
+    journal = device_controller.repository.journal
+    monkeypatch.setattr(journal_module, "RETRY_SECONDS", 0.01)
+    real_fsync = os.fsync
+    failures = [1]
+
+    def fsync(fd):
+        if failures[0]:
+            failures[0] -= 1
+            raise OSError(errno.EIO, "injected fsync failure")
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    failing_client = TestClient(client.app, raise_server_exceptions=False)
+    response = failing_client.patch("/api/devices/3?durability=durable", json={"given_name": "Not on disk"})
+    assert response.status_code == 500
+
+    deadline = time.monotonic() + 5
+    while journal.error is not None:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+    response = client.patch("/api/devices/3?durability=durable", json={"given_name": "On disk"})
+    assert response.status_code == 200
+    assert response.headers["X-Durability"] == "durable"
+
+
+def test_durability_modes(api, controller, monkeypatch):
+    syncs = []
+    sync = controller.repository.sync
+    monkeypatch.setattr(controller.repository, "sync", lambda: syncs.append(1) or sync())
+
+    response = api.patch("/api/devices/3", json={"given_name": "Durable"})
+    assert response.headers["X-Durability"] == "durable" and syncs == [1]
+
+    response = api.patch("/api/devices/3?durability=applied", json={"given_name": "Applied"})
+    assert response.status_code == 200 and response.headers["X-Durability"] == "applied"
+    assert syncs == [1]
+    # Applied is visible at once; it reaches the disk in the background
+    assert api.get("/api/devices/3").json()["given_name"] == "Applied"
+
+    response = api.post("/api/devices/3/actions?durability=applied", json={"action": "isolate"})
+    assert response.headers["X-Durability"] == "applied" and syncs == [1]
+    response = api.post("/api/groups", json={"name": "Lab"})
+    assert response.status_code == 201 and response.headers["X-Durability"] == "durable" and syncs == [1, 1]
+
+    assert api.patch("/api/devices/3?durability=eventually", json={"given_name": "x"}).status_code == 422
@@ -0,0 +1,102 @@
+import gzip
+import json
+import pytest
+from app.storage.snapshot import load_devices
+from app.utils import columnar, compression
+from app.utils.compression import compress, negotiate
+
+
+@pytest.fixture
+def all_codecs(monkeypatch):
+    """Negotiate as if brotli and zstandard were installed."""
+    monkeypatch.setattr(compression, "CODECS", {"gzip": gzip.compress, "br": bytes, "zstd": bytes})
+
+
+def test_negotiation(all_codecs):
+    preference = ["zstd", "br", "gzip"]
+    assert negotiate(None, preference) is None
+    assert negotiate("", preference) is None
+    assert negotiate("gzip, deflate, br", preference) == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5", preference) == "gzip"
+    assert negotiate("br;q=0, gzip;q=0.1", preference) == "gzip"
+    assert negotiate("*", preference) == "zstd"
+    assert negotiate("*;q=0.5, zstd;q=0", preference) == "br"
+    assert negotiate("identity", preference) is None
+    assert negotiate("GZIP;Q=0.5", preference) == "gzip"
+    assert negotiate("gzip;q=oops", preference) is None
+    # Only what the server is configured for
+    assert negotiate("zstd, br", ["gzip"]) is None
+
+
+def test_codings_that_are_not_installed_are_skipped(monkeypatch):
+    monkeypatch.setattr(compression, "CODECS", {"gzip": gzip.compress})
+    assert negotiate("zstd, br, gzip;q=0.1", ["zstd", "br", "gzip"]) == "gzip"
+    assert negotiate("zstd, br", ["zstd", "br", "gzip"]) is None
+
+
+def test_compressed_bodies_round_trip():
+    body = json.dumps([{"id": index, "name": "device"} for index in range(200)]).encode()
+    compressed = compress(body, "gzip")
+    assert len(compressed) < len(body) and gzip.decompress(compressed) == body
+    # Deterministic, so a cached copy and a fresh one are byte-identical
+    assert compress(body, "gzip") == compressed
+
+
+@pytest.mark.parametrize("coding, module, decompress", [
+    ("br", "brotli", lambda brotli, data: brotli.decompress(data)),
+    ("zstd", "zstandard", lambda zstandard, data: zstandard.ZstdDecompressor().decompress(data)),
+])
+def test_optional_codings_round_trip(coding, module, decompress):
+    library = pytest.importorskip(module)
+    body = b"chimera " * 500
+    assert decompress(library, compress(body, coding)) == body
+
+
+def test_columnar_round_trip(data_file):
+    devices = list(load_devices(data_file))
+    document = columnar.encode_devices(devices)
+    assert document["format"] == columnar.FORMAT and document["count"] == len(devices)
+    expected = [device.model_dump(mode="json") for device in devices]
+    assert columnar.decode_devices(document) == expected
+    assert columnar.decode_devices(json.loads(columnar.dumps(document, columnar.JSON_MEDIA_TYPE))) == expected
+
+    projected = columnar.decode_devices(columnar.encode_devices(devices, {"hostname", "blocklist"}))
+    assert projected == [
+        {"id": device["id"], "hostname": device["hostname"], "blocklist": device["blocklist"]} for device in expected
+    ]
+    assert columnar.decode_devices(columnar.encode_devices([])) == []
+    with pytest.raises(ValueError):
+        columnar.decode_devices({"format": "something/else"})
+
+
+def test_msgpack_round_trip(data_file):
+    msgpack = pytest.importorskip("msgpack")
+    devices = list(load_devices(data_file))
+    document = columnar.encode_devices(devices)
+    packed = columnar.dumps(document, columnar.MSGPACK_MEDIA_TYPE)
+    assert columnar.decode_devices(msgpack.unpackb(packed)) == [device.model_dump(mode="json") for device in devices]
+
+
+def test_listing_is_compressed_per_accept_encoding(client):
+    plain = client.get("/api/devices", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers and plain.headers["Vary"] == "Accept-Encoding"
+
+    compressed = client.get("/api/devices", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    # httpx decodes the body transparently
+    assert compressed.json() == plain.json()
+    assert compressed.headers["ETag"] != plain.headers["ETag"]
+    assert client.get(
+        "/api/devices", headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]}
+    ).status_code == 200
+
+    document = client.get("/api/devices", params={"format": "columnar"}, headers={"Accept-Encoding": "gzip"}).json()
+    assert columnar.decode_devices(document) == plain.json()
+
+
+def test_msgpack_needs_the_package(client):
+    response = client.get("/api/devices", params={"format": "msgpack"})
+    if columnar.msgpack is None:
+        assert response.status_code == 406
+    else:
+        assert columnar.decode_devices(columnar.msgpack.unpackb(response.content)) == client.get("/api/devices").json()
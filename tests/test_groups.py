@@ -0,0 +1,117 @@
+import json
+import os
+from app.schemas.device import Blocklist
+from app.storage.blocklist_bits import blocklist_to_mask
+from app.storage.group_policies import DEFAULT_POLICY
+from app.storage.json_repository import JsonDeviceRepository
+
+
+def _devices(api, **params):
+    return {device["id"]: device for device in api.get("/api/devices", params={"limit": 100, **params}).json()}
+
+
+def test_policy_change_reaches_inheriting_devices(api):
+    staff = api.get("/api/groups/2").json()
+    before = _devices(api, group_id=2)
+    # Device 4 is the only one following its group's policy
+    assert [device_id for device_id, device in before.items() if not device["has_custom_blocklist"]] == [4]
+    assert before[4]["blocklist"] == staff["blocklist"]
+
+    tiktok = not staff["blocklist"]["tiktok"]
+    updated = api.patch("/api/groups/2", json={"tiktok": tiktok}).json()
+    assert updated["blocklist"]["tiktok"] is tiktok
+
+    after = _devices(api, group_id=2)
+    assert after[4]["blocklist"] == updated["blocklist"]
+    assert api.get("/api/devices/4").json()["blocklist"]["tiktok"] is tiktok
+    # Devices with a custom blocklist keep it
+    assert all(after[device_id]["blocklist"] == before[device_id]["blocklist"] for device_id in (3, 7, 10))
+
+
+def test_editing_an_inherited_blocklist_makes_it_custom(api):
+    policy = api.get("/api/groups/2").json()["blocklist"]
+    device = api.patch("/api/devices/4", json={"gaming": not policy["gaming"]}).json()
+    assert device["has_custom_blocklist"] and device["blocklist"]["gaming"] is not policy["gaming"]
+    # The shared policy itself is untouched
+    assert api.get("/api/groups/2").json()["blocklist"] == policy
+
+    api.patch("/api/groups/2", json={"youtube": not policy["youtube"]})
+    assert api.get("/api/devices/4").json()["blocklist"]["youtube"] is policy["youtube"]
+
+    device = api.patch("/api/devices/4", json={"has_custom_blocklist": False}).json()
+    assert not device["has_custom_blocklist"]
+    assert device["blocklist"] == api.get("/api/groups/2").json()["blocklist"]
+
+
+def test_moving_an_inheriting_device_follows_the_new_group(api):
+    guests = api.patch("/api/groups/3", json={"porn": True, "tiktok": True}).json()
+    device = api.patch("/api/devices/4", json={"group_id": 3}).json()
+    assert device["group"] == {"id": 3, "name": "Guests", "is_default": False}
+    assert device["blocklist"] == guests["blocklist"] and not device["has_custom_blocklist"]
+
+    guests = api.patch("/api/groups/3", json={"tiktok": False}).json()
+    assert api.get("/api/devices/4").json()["blocklist"] == guests["blocklist"]
+
+
+def test_rename_rewrites_the_groups_devices(api, controller, data_file):
+    assert api.patch("/api/groups/4", json={"name": "Staff"}).status_code == 409
+
+    renamed = api.patch("/api/groups/4", json={"name": "Smart Home"}).json()
+    assert renamed["name"] == "Smart Home"
+    devices = _devices(api, group_id=4)
+    assert sorted(devices) == [2, 5, 8]
+    assert {device["group"]["name"] for device in devices.values()} == {"Smart Home"}
+    by_group = api.get("/api/summary").json()["by_group"]
+    assert by_group["Smart Home"] == 3 and "IoT" not in by_group
+
+    controller.close()
+    reopened = JsonDeviceRepository(data_file_path=data_file)
+    reopened.load()
+    try:
+        assert reopened.get_group(4).name == "Smart Home"
+        assert reopened.get(5).group.name == "Smart Home"
+        assert reopened.verify_summary()["ok"]
+    finally:
+        reopened.close()
+
+
+def test_groups_are_seeded_on_first_load(data_file):
+    # Staff devices 3 and 4 share settings, 7 and 10 differ from them
+    with open(data_file) as f:
+        devices = json.load(f)
+    for device in devices:
+        if device["id"] in (3, 7, 10):
+            device["has_custom_blocklist"] = False
+    with open(data_file, "w") as f:
+        json.dump(devices, f)
+    assert not os.path.exists(f"{data_file}.groups")
+
+    repository = JsonDeviceRepository(data_file_path=data_file)
+    repository.load()
+    try:
+        assert [group.name for group in repository.groups()] == ["Default Group", "Staff", "Guests", "IoT"]
+        staff = repository.get_group(2).blocklist
+        assert staff.model_dump() == repository.get(3).blocklist.model_dump()
+        assert repository.get_group(3).blocklist == DEFAULT_POLICY
+        # The odd ones out keep their settings, now as custom blocklists
+        assert not repository.get(3).has_custom_blocklist and not repository.get(4).has_custom_blocklist
+        for device_id in (7, 10):
+            device = repository.get(device_id)
+            assert device.has_custom_blocklist
+            assert blocklist_to_mask(device.blocklist) == next(
+                blocklist_to_mask(Blocklist(**raw["blocklist"])) for raw in devices if raw["id"] == device_id
+            )
+        repository.save_group(repository.get_group(3).model_copy(update={"blocklist": staff}))
+        repository.sync()
+    finally:
+        repository.close()
+    assert os.path.exists(f"{data_file}.groups")
+
+    # Seeded once: later loads keep the saved policies
+    reopened = JsonDeviceRepository(data_file_path=data_file)
+    reopened.load()
+    try:
+        assert reopened.get_group(3).blocklist == staff
+        assert reopened.get(7).has_custom_blocklist
+    finally:
+        reopened.close()
@@ -0,0 +1,82 @@
+import time
+import pytest
+from app import config
+from app.controllers.device_controller import DeviceController
+from app.schemas.device import Sighting
+from app.storage.json_repository import JsonDeviceRepository
+from app.utils.deadlines import epoch_seconds
+
+TIMEOUT = 3600
+
+
+@pytest.fixture
+def idle_controller(data_file, monkeypatch):
+    """A controller expiring devices after an hour; the background check never comes round during a test."""
+    monkeypatch.setattr(config, "IDLE_TIMEOUT", TIMEOUT)
+    monkeypatch.setattr(config, "IDLE_CHECK_INTERVAL", 3600)
+    device_controller = DeviceController(JsonDeviceRepository(data_file_path=data_file))
+    yield device_controller
+    device_controller.close()
+
+
+def _last_seen(controller, device_id):
+    return epoch_seconds(controller.get_device_by_id(device_id).last_seen)
+
+
+def test_devices_expire_once_their_deadline_passes(idle_controller):
+    active = idle_controller.repository.match_ids(is_active=True)
+    assert len(active) == 8 and len(idle_controller.expiry.timers) == 8
+    # Device 5 was seen first (00:59:31), device 8 next (01:05:31)
+    now = _last_seen(idle_controller, 5) + TIMEOUT + 1
+    assert now < _last_seen(idle_controller, 8) + TIMEOUT
+    revision = idle_controller.revision
+
+    assert idle_controller.expiry.expire(now=now) == 1
+    assert not idle_controller.get_device_by_id(5).is_active
+    assert idle_controller.revision == revision + 1
+    assert idle_controller.get_summary()["active"] == 7
+    assert idle_controller.expiry.expire(now=now) == 0
+
+    assert idle_controller.expiry.expire(now=_last_seen(idle_controller, 1) + TIMEOUT) == 7
+    assert idle_controller.get_summary()["active"] == 0 and len(idle_controller.expiry.timers) == 0
+    assert idle_controller.verify_summary()["ok"]
+
+
+def test_a_sighting_moves_the_deadline_on(idle_controller):
+    old_deadline = _last_seen(idle_controller, 2) + TIMEOUT
+    idle_controller.sightings.ingest([Sighting(mac="B8:27:EB:10:22:33")])
+    seen = _last_seen(idle_controller, 2)
+    assert seen > old_deadline - TIMEOUT
+
+    # Every other device is due, device 2 is re-checked and rescheduled
+    assert idle_controller.expiry.expire(now=seen + TIMEOUT - 1) == 7
+    assert idle_controller.get_device_by_id(2).is_active
+    assert idle_controller.expiry.timers.next_deadline() == pytest.approx(seen + TIMEOUT)
+
+    assert idle_controller.expiry.expire(now=seen + TIMEOUT) == 1
+    assert not idle_controller.get_device_by_id(2).is_active
+
+
+def test_a_sighting_reactivates_and_reschedules(idle_controller):
+    idle_controller.expiry.expire(now=time.time())
+    assert not idle_controller.get_device_by_id(2).is_active
+    assert idle_controller.expiry.timers.next_deadline() is None
+
+    idle_controller.sightings.ingest([Sighting(mac="B8:27:EB:10:22:33")])
+    assert idle_controller.get_device_by_id(2).is_active
+    assert idle_controller.expiry.timers.next_deadline() == pytest.approx(_last_seen(idle_controller, 2) + TIMEOUT)
+
+
+def test_expiry_runs_in_the_background(data_file, monkeypatch):
+    monkeypatch.setattr(config, "IDLE_TIMEOUT", 0.2)
+    monkeypatch.setattr(config, "IDLE_CHECK_INTERVAL", 0.01)
+    device_controller = DeviceController(JsonDeviceRepository(data_file_path=data_file))
+    try:
+        device_controller.sightings.ingest([Sighting(mac="B8:27:EB:10:22:33")])
+        deadline = time.monotonic() + 5
+        while device_controller.get_summary()["active"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert not device_controller.get_device_by_id(2).is_active
+    finally:
+        device_controller.close()
@@ -0,0 +1,133 @@
+import errno
+import json
+import os
+import time
+import pytest
+from app.storage import journal as journal_module
+from app.storage.journal import DeviceJournal
+
+
+def _write(path, *lines: bytes):
+    with open(path, "ab") as f:
+        f.write(b"".join(lines))
+
+
+def test_replay_stops_at_torn_tail(tmp_path):
+    path = tmp_path / "devices.json.journal"
+    _write(path, b'{"seq":1}\n', b'{"seq":2}\n', b'{"seq":')
+    assert list(DeviceJournal.replay(str(path))) == [{"seq": 1}, {"seq": 2}]
+
+
+def test_reopen_cuts_torn_tail_before_appending(tmp_path):
+    path = tmp_path / "devices.json.journal"
+    _write(path, b'{"seq":1}\n', b'{"seq":2}\n', b'{"seq":3,"dev')
+    journal = DeviceJournal(str(path))
+    assert journal.records == 2 and journal.appended_seq == 2
+    journal.write({"seq": 3})
+    journal.write({"seq": 4})
+    journal.close()
+    assert list(DeviceJournal.replay(str(path))) == [{"seq": 1}, {"seq": 2}, {"seq": 3}, {"seq": 4}]
+    assert path.read_bytes().endswith(b'{"seq":4}\n')
+
+
+def test_reopen_cuts_unparsable_line_and_everything_after(tmp_path):
+    path = tmp_path / "devices.json.journal"
+    _write(path, b'{"seq":1}\n', b'garbage\n', b'{"seq":9}\n')
+    journal = DeviceJournal(str(path))
+    journal.write({"seq": 2})
+    journal.close()
+    assert list(DeviceJournal.replay(str(path))) == [{"seq": 1}, {"seq": 2}]
+
+
+def test_compaction_after_cut_drops_only_covered_records(tmp_path):
+    path = tmp_path / "devices.json.journal"
+    _write(path, b'{"seq":1}\n', b'{"seq":2}\n', b'{"se')
+    journal = DeviceJournal(str(path), compact=lambda: 3)
+    for seq in (3, 4):
+        journal.write({"seq": seq})
+    journal.request_compaction(wait=True)
+    assert journal.records == 1
+    journal.write({"seq": 5})
+    journal.close()
+    assert list(DeviceJournal.replay(str(path))) == [{"seq": 4}, {"seq": 5}]
+
+
+def test_group_commit_acknowledges_only_synced_records(tmp_path):
+    path = tmp_path / "devices.json.journal"
+    journal = DeviceJournal(str(path), commit_delay=0.01)
+    seqs = [journal.append({"seq": seq}) for seq in range(1, 51)]
+    journal.commit(seqs[-1])
+    assert [json.loads(line)["seq"] for line in path.read_bytes().splitlines()] == list(range(1, 51))
+    assert journal.fsyncs < 50
+    journal.close()
+
+
+def _failing_fsync(monkeypatch, failures: int):
+    """Make the next ``failures`` fsyncs raise ``OSError`` (every one if negative)."""
+    real_fsync = os.fsync
+    left = [failures]
+
+    def fsync(fd):
+        if left[0]:
+            left[0] -= 1
+            raise OSError(errno.EIO, "injected fsync failure")
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+
+
+def _wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_failed_fsync_is_retried_without_a_gap(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal_module, "RETRY_SECONDS", 0.01)
+    path = tmp_path / "devices.json.journal"
+    journal = DeviceJournal(str(path))
+    journal.write({"seq": 1})
+    _failing_fsync(monkeypatch, 1)
+    seq = journal.append({"seq": 2})
+    with pytest.raises(OSError):
+        journal.commit(seq)
+
+    _wait_until(lambda: journal.error is None)
+    journal.commit(seq)
+    journal.write({"seq": 3})
+    assert not journal.failed
+    journal.close()
+    assert list(DeviceJournal.replay(str(path))) == [{"seq": 1}, {"seq": 2}, {"seq": 3}]
+
+
+def test_records_after_a_failed_batch_are_not_acknowledged_before_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal_module, "RETRY_SECONDS", 0.05)
+    path = tmp_path / "devices.json.journal"
+    journal = DeviceJournal(str(path))
+    _failing_fsync(monkeypatch, 1)
+    first = journal.append({"seq": 1})
+    _wait_until(lambda: journal.error is not None)
+    second = journal.append({"seq": 2})
+    with pytest.raises(OSError):
+        journal.commit(second)
+
+    _wait_until(lambda: journal.error is None)
+    journal.commit(second)
+    journal.commit(first)
+    journal.close()
+    assert list(DeviceJournal.replay(str(path))) == [{"seq": 1}, {"seq": 2}]
+
+
+def test_journal_that_cannot_be_cut_back_fails_for_good(tmp_path, monkeypatch):
+    path = tmp_path / "devices.json.journal"
+    journal = DeviceJournal(str(path))
+    journal.write({"seq": 1})
+    _failing_fsync(monkeypatch, -1)
+    with pytest.raises(OSError):
+        journal.write({"seq": 2})
+    _wait_until(lambda: journal.failed)
+    with pytest.raises(RuntimeError):
+        journal.append({"seq": 3})
+    journal.request_compaction(wait=True)
+    journal.close()
@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.lock_stripes import LockStripes
+
+
+def test_same_key_is_serialized():
+    stripes = LockStripes(4)
+    inside = []
+    overlaps = []
+
+    def hold(key):
+        with stripes.hold([key]):
+            inside.append(key)
+            overlaps.append(len(inside))
+            time.sleep(0.005)
+            inside.remove(key)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(hold, [7] * 16))
+    assert max(overlaps) == 1
+
+
+def _can_hold(stripes, keys) -> bool:
+    """Whether another thread gets ``keys`` within a second."""
+    acquired = threading.Event()
+
+    def hold():
+        with stripes.hold(keys):
+            acquired.set()
+
+    thread = threading.Thread(target=hold, daemon=True)
+    thread.start()
+    return acquired.wait(1)
+
+
+def test_different_stripes_proceed_in_parallel():
+    stripes = LockStripes(4)
+    assert stripes.stripe(1) != stripes.stripe(2)
+    with stripes.hold([1]):
+        assert _can_hold(stripes, [2, 6])
+        assert not _can_hold(stripes, [5])
+
+
+def test_overlapping_multi_key_holders_do_not_deadlock():
+    stripes = LockStripes(8)
+    counter = [0]
+
+    def hold(keys):
+        for _ in range(200):
+            with stripes.hold(keys):
+                counter[0] += 1
+
+    key_sets = [[1, 2, 3], [3, 2, 1], [5, 1], [1, 5, 9], list(range(20))]
+    with ThreadPoolExecutor(len(key_sets)) as pool:
+        assert all(future.result(timeout=30) is None for future in [pool.submit(hold, keys) for keys in key_sets])
+    assert counter[0] == 200 * len(key_sets)
+
+
+def test_locks_are_released_when_the_body_raises():
+    stripes = LockStripes(2)
+    try:
+        with stripes.hold([0, 1]):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert _can_hold(stripes, [0, 1])
+
+
+def test_concurrent_toggles_on_one_device_all_apply(controller):
+    before = controller.get_device_by_id(3).blocklist.tiktok
+
+    def toggle(_):
+        controller.perform_device_action(3, "toggle_block", "tiktok", durable=False)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(toggle, range(40)))
+    # An even number of read-modify-write toggles: none was lost
+    assert controller.get_device_by_id(3).blocklist.tiktok is before
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(toggle, range(41)))
+    assert controller.get_device_by_id(3).blocklist.tiktok is not before
@@ -0,0 +1,145 @@
+import math
+import re
+import threading
+from app.utils.metrics import MetricsRegistry
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"(?:,|$)')
+SUFFIXES = {"counter": ("",), "gauge": ("",), "histogram": ("_bucket", "_sum", "_count")}
+
+
+def parse(text: str):
+    """
+    Parse the Prometheus text format strictly: every sample must belong to
+    the family of the TYPE line before it. Returns ``{family: (kind, help,
+    [(name, labels, value)])}``.
+    """
+    assert text.endswith("\n")
+    families = {}
+    family = None
+    for line in text.splitlines():
+        if line.startswith("# HELP "):
+            name, _, documentation = line[7:].partition(" ")
+            assert name not in families
+            # HELP text only escapes backslashes and line feeds
+            assert re.fullmatch(r'(?:[^\\]|\\[\\n])*', documentation)
+            families[name] = [None, documentation, []]
+            family = name
+        elif line.startswith("# TYPE "):
+            name, _, kind = line[7:].partition(" ")
+            assert name == family and families[name][0] is None and kind in SUFFIXES
+            families[name][0] = kind
+        else:
+            match = SAMPLE.match(line)
+            assert match, line
+            name, labels, value = match.groups()
+            kind = families[family][0]
+            assert name in {family + suffix for suffix in SUFFIXES[kind]}, (family, name)
+            parsed = {}
+            if labels:
+                assert "".join(item.group(0) for item in LABEL.finditer(labels)) == labels
+                parsed = {key: re.sub(r'\\(.)', lambda m: "\n" if m.group(1) == "n" else m.group(1), raw)
+                          for key, raw in LABEL.findall(labels)}
+            families[family][2].append((name, parsed, float(value)))
+    return {name: tuple(family) for name, family in families.items()}
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("app_requests", 'Requests "served"\nby path \\ method', ("path",))
+    requests.labels('/a"b\\c\nd').inc(2)
+    requests.labels("/plain").inc()
+    registry.gauge("app_temperature", "Degrees").set(-1.5)
+    registry.gauge("app_broken", "Raises", function=lambda: 1 / 0)
+    latency = registry.histogram("app_latency_seconds", "Latency", ("route",), buckets=(1.0, 0.1, 0.5))
+    for value in (0.05, 0.1, 0.3, 2.0):
+        latency.labels("/x").observe(value)
+
+    families = parse(registry.render())
+    kind, documentation, samples = families["app_requests_total"]
+    assert kind == "counter" and documentation == 'Requests "served"\\nby path \\\\ method'
+    assert samples == [("app_requests_total", {"path": '/a"b\\c\nd'}, 2.0), ("app_requests_total", {"path": "/plain"}, 1.0)]
+    assert families["app_temperature"][2] == [("app_temperature", {}, -1.5)]
+    assert math.isnan(families["app_broken"][2][0][2])
+
+    kind, _, samples = families["app_latency_seconds"]
+    buckets = [(labels["le"], value) for name, labels, value in samples if name.endswith("_bucket")]
+    # Sorted bounds, cumulative counts (le is inclusive), +Inf equal to the count
+    assert buckets == [("0.1", 2.0), ("0.5", 3.0), ("1", 3.0), ("+Inf", 4.0)]
+    totals = {name: value for name, _, value in samples if not name.endswith("_bucket")}
+    assert totals == {"app_latency_seconds_sum": 2.45, "app_latency_seconds_count": 4.0}
+    assert all(labels["route"] == "/x" for _, labels, _ in samples)
+
+
+def test_registering_twice_returns_the_same_family():
+    registry = MetricsRegistry()
+    first = registry.counter("app_things", "Things")
+    assert registry.counter("app_things", "Things again") is first
+    first.inc()
+    assert registry.render().count("# TYPE app_things_total counter") == 1
+
+
+def test_sharded_updates_from_many_threads_add_up():
+    registry = MetricsRegistry()
+    counter = registry.counter("app_events", "Events", ("kind",)).labels("a")
+    gauge = registry.gauge("app_open", "Open things")
+    histogram = registry.histogram("app_size", "Sizes", buckets=(10, 100)).labels()
+    start = threading.Barrier(8)
+
+    def work(index):
+        start.wait()
+        for value in range(1000):
+            counter.inc()
+            gauge.inc()
+            histogram.observe(value % 200)
+        gauge.dec(500)
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The threads are gone; what they counted is kept
+    assert counter.value() == 8000
+    assert gauge.labels().value() == 8 * 500
+    cumulative, total, count = histogram.snapshot()
+    assert count == 8000 and cumulative == [8 * 55, 8 * 505, 8000]
+    assert total == 8 * 5 * sum(range(200))
+
+    gauge.set(3)
+    assert gauge.labels().value() == 3
+
+
+def test_request_metrics(client):
+    def requests(route, status):
+        families = parse(client.get("/metrics").text)
+        return sum(
+            value for _, labels, value in families["chimera_http_requests_total"][2]
+            if labels == {"method": "GET", "route": route, "status": status}
+        )
+
+    before = requests("/api/devices/{device_id}", "2xx")
+    missing = requests("/api/devices/{device_id}", "4xx")
+    unmatched = requests("unmatched", "4xx")
+    assert client.get("/api/devices/3").status_code == 200
+    assert client.get("/api/devices/9999").status_code == 404
+    assert client.get("/no/such/path").status_code == 404
+    assert requests("/api/devices/{device_id}", "2xx") == before + 1
+    assert requests("/api/devices/{device_id}", "4xx") == missing + 1
+    assert requests("unmatched", "4xx") == unmatched + 1
+
+    response = client.get("/metrics")
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    families = parse(response.text)
+    latency = families["chimera_http_request_duration_seconds"]
+    assert latency[0] == "histogram"
+    counts = {
+        labels["route"]: value for name, labels, value in latency[2]
+        if name.endswith("_count") and labels["method"] == "GET"
+    }
+    assert counts["/api/devices/{device_id}"] >= 2
+    in_flight = {labels["method"]: value for _, labels, value in families["chimera_http_requests_in_flight"][2]}
+    # Only the /metrics request itself
+    assert in_flight["GET"] == 1
+    assert families["chimera_fleet_devices"][2][0][2] >= 10
@@ -0,0 +1,42 @@
+import os
+import warnings
+from app.storage.journal import DeviceJournal
+from app.storage.json_repository import JsonDeviceRepository
+from app.storage.migrate import migrate_json_to_sqlite
+from app.storage.snapshot import load_devices
+from app.storage.sqlite_repository import SqliteDeviceRepository
+
+
+def _files(directory):
+    return {path.name: path.read_bytes() for path in directory.iterdir() if path.is_file() and path.suffix != ".lock"}
+
+
+def test_migration_leaves_the_source_untouched(data_file, tmp_path):
+    # A journaled edit the snapshot doesn't have yet, and no groups file
+    device = next(device for device in load_devices(data_file) if device.id == 3)
+    journal = DeviceJournal(f"{data_file}.journal")
+    journal.write({"op": "upsert", "device": device.model_copy(update={"given_name": "Journaled"}).model_dump()})
+    journal.close()
+    assert not os.path.exists(f"{data_file}.groups")
+    before = _files(tmp_path)
+
+    target = str(tmp_path / "target" / "devices.db")
+    os.makedirs(os.path.dirname(target))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", ResourceWarning)
+        assert migrate_json_to_sqlite(data_file, target) == 10
+    assert _files(tmp_path) == before
+
+    imported = SqliteDeviceRepository(db_path=target)
+    imported.load()
+    try:
+        assert imported.get(3).given_name == "Journaled"
+        assert {group.name for group in imported.groups()} == {"Default Group", "Staff", "Guests", "IoT"}
+        assert imported.verify_summary()["ok"]
+    finally:
+        imported.close()
+
+    # The source's lock was released
+    reopened = JsonDeviceRepository(data_file_path=data_file)
+    reopened.load()
+    reopened.close()
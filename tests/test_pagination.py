@@ -0,0 +1,66 @@
+import base64
+import json
+import pytest
+from app.schemas.device import DeviceQuery
+from app.storage.pagination import SORT_KEYS, decode_cursor, encode_position
+
+SORTS = [prefix + key for key in SORT_KEYS for prefix in ("", "-")]
+
+
+def _forge(*payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(payload)).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("sort", SORTS)
+def test_pages_walk_every_device_once_in_order(repository, sort):
+    key = SORT_KEYS[sort.lstrip("-")]
+    expected = sorted(repository.all(), key=lambda device: (key(device), device.id), reverse=sort.startswith("-"))
+    seen, cursor = [], None
+    while True:
+        page = repository.query(DeviceQuery(sort=sort, limit=3, cursor=cursor))
+        assert page.total == len(expected)
+        seen += [device.id for device in page.devices]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == [device.id for device in expected]
+
+
+@pytest.mark.parametrize("cursor, sort", [
+    (_forge("id", "x", 1), "id"),
+    (_forge("-last_seen", [1], 1), "-last_seen"),
+    (_forge("hostname", 5, 1), "hostname"),
+    (_forge("id", 1, "2"), "id"),
+    (_forge("id", True, 1), "id"),
+    (_forge("rank", "high", 1), "rank"),
+    (_forge("id", 1), "id"),
+    ("not base64!", "id"),
+])
+def test_forged_cursors_are_rejected(cursor, sort):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, sort)
+
+
+def test_cursor_for_another_sort_is_rejected():
+    with pytest.raises(ValueError, match="issued for sort"):
+        decode_cursor(encode_position("id", 3, 3), "hostname")
+
+
+@pytest.mark.parametrize("cursor", [_forge("id", "x", 1), _forge("-last_seen", [1], 1)])
+def test_api_answers_forged_cursor_with_400(client, cursor):
+    sort = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))[0]
+    response = client.get("/api/devices", params={"sort": sort, "limit": 2, "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_api_pages_through_headers(client):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 4, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/devices", params=params)
+        assert response.status_code == 200
+        ids += [device["id"] for device in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert ids == sorted(ids) and len(ids) == int(response.headers["x-total-count"])
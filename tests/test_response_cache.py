@@ -0,0 +1,91 @@
+from app.utils.response_cache import ResponseCache
+
+
+def test_hits_and_misses():
+    cache = ResponseCache()
+    assert cache.get(1, "summary") is None
+    cache.put(1, "summary", b"{}", {})
+    assert cache.get(1, "summary").body == b"{}"
+    assert cache.get(2, "summary") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 2, round(1 / 3, 4))
+
+
+def test_requests_at_different_revisions_do_not_evict_each_other():
+    cache = ResponseCache()
+    cache.put(1, "devices", b"old", {})
+    cache.put(2, "devices", b"new", {})
+    assert cache.get(1, "devices").body == b"old"
+    assert cache.get(2, "devices").body == b"new"
+    assert cache.stats()["evictions"] == 0
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = ResponseCache(max_entries=2)
+    cache.put(1, "a", b"a", {})
+    cache.put(1, "b", b"b", {})
+    cache.get(1, "a")
+    cache.put(2, "c", b"c", {})
+    assert cache.get(1, "b") is None
+    assert cache.get(1, "a") is not None and cache.get(2, "c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget():
+    cache = ResponseCache(max_bytes=10)
+    cache.put(1, "a", b"x" * 6, {})
+    cache.put(1, "b", b"x" * 6, {})
+    assert cache.get(1, "a") is None
+    assert cache.stats()["bytes"] == 6
+    # Larger than the whole budget: never cached
+    cache.put(1, "c", b"x" * 11, {})
+    assert cache.get(1, "c") is None and cache.get(1, "b") is not None
+
+
+def test_etag_matching():
+    etag = ResponseCache.etag("e", 3, "summary;identity")
+    assert ResponseCache.matches(etag, etag)
+    assert ResponseCache.matches(f'"other", W/{etag}', etag)
+    assert ResponseCache.matches("*", etag)
+    assert not ResponseCache.matches(None, etag)
+    assert not ResponseCache.matches(ResponseCache.etag("e", 4, "summary;identity"), etag)
+
+
+def test_summary_etag_and_304(client):
+    first = client.get("/api/summary")
+    etag = first.headers["ETag"]
+    assert client.get("/api/summary", headers={"If-None-Match": etag}).status_code == 304
+    hits = client.get("/api/cache/stats").json()["hits"]
+    again = client.get("/api/summary")
+    assert again.content == first.content and again.headers["ETag"] == etag
+    assert client.get("/api/cache/stats").json()["hits"] == hits + 1
+
+    client.patch("/api/devices/4", json={"given_name": "Changed"})
+    changed = client.get("/api/summary", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+def test_body_rendered_across_a_mutation_is_not_tagged_or_cached(client, monkeypatch):
+    from app.routes.device_routes import device_controller
+    get_summary = device_controller.get_summary
+    # A new revision, so the summary is not cached yet
+    device_controller.update_device(5, _update(given_name="Before render"))
+
+    def mutating_get_summary():
+        summary = get_summary()
+        device_controller.update_device(5, _update(given_name="Mid-render"))
+        return summary
+
+    monkeypatch.setattr(device_controller, "get_summary", mutating_get_summary)
+    response = client.get("/api/summary")
+    assert response.status_code == 200 and "ETag" not in response.headers
+    monkeypatch.undo()
+
+    fresh = client.get("/api/summary")
+    assert "ETag" in fresh.headers
+    assert client.get("/api/cache/stats").json()["misses"] >= 2
+
+
+def _update(**fields):
+    from app.schemas.device import DeviceUpdate
+    return DeviceUpdate(**fields)
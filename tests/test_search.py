@@ -0,0 +1,59 @@
+from app.schemas.device import DeviceSearch
+from app.storage.device_store import DeviceStore
+from app.storage.search_index import TextIndex
+from app.storage.snapshot import load_devices
+
+
+def hostnames(devices, q: str):
+    return sorted(device.hostname for device in devices.search(DeviceSearch(q=q)).devices)
+
+
+def test_search_by_hostname(repository):
+    assert hostnames(repository, "nas") == ["nas-01"]
+    assert hostnames(repository, "no-such-device") == []
+
+
+def test_saves_are_searchable(repository):
+    renamed = next(device for device in repository.all() if device.hostname == "nas-01")
+    repository.save(renamed.model_copy(update={"hostname": "backup-box"}))
+
+    assert hostnames(repository, "nas") == []
+    assert hostnames(repository, "backup") == ["backup-box"]
+    assert hostnames(repository, "lobby") == ["ap-lobby", "lobby-tv"]
+
+
+def test_saves_right_after_a_reload_are_searchable(json_repository):
+    # Each load rebuilds the text index in the background; saves racing it must not be lost
+    for attempt in range(5):
+        json_repository.load()
+        renamed = next(device for device in json_repository.all() if device.id == 6)
+        json_repository.save(renamed.model_copy(update={"hostname": f"backup-{attempt}"}))
+        assert hostnames(json_repository, f"backup-{attempt}") == [f"backup-{attempt}"]
+        assert hostnames(json_repository, "lobby") == ["ap-lobby", "lobby-tv"]
+
+
+def test_index_built_from_a_snapshot_catches_up_with_later_saves(data_file):
+    store = DeviceStore()
+    store.load(load_devices(data_file))
+    assert store.text_stale
+    generation, texts = store.text_snapshot()
+    index = TextIndex()
+    index.load(texts.items())
+
+    renamed = next(device for device in store.all() if device.hostname == "nas-01")
+    store.update(renamed.model_copy(update={"hostname": "backup-box"}))
+    assert store.install_text(generation, texts, index)
+
+    assert not store.text_stale
+    assert hostnames(store, "nas") == []
+    assert hostnames(store, "backup") == ["backup-box"]
+
+
+def test_index_built_before_a_reload_is_dropped(data_file):
+    store = DeviceStore()
+    store.load(load_devices(data_file))
+    generation, texts = store.text_snapshot()
+    store.load(load_devices(data_file))
+
+    assert not store.install_text(generation, texts, TextIndex())
+    assert hostnames(store, "nas") == ["nas-01"]
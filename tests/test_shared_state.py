@@ -0,0 +1,96 @@
+import json
+import subprocess
+import sys
+import time
+import pytest
+from app import config
+from app.controllers.device_controller import DeviceController
+from app.schemas.device import DeviceUpdate, GroupUpdate
+from app.storage.sqlite_repository import SqliteDeviceRepository
+
+# Another worker: rename device 3 and record the change, as a controller would
+WORKER = """
+import sys
+from app.storage.sqlite_repository import SqliteDeviceRepository
+repository = SqliteDeviceRepository(db_path=sys.argv[1])
+repository.load()
+with repository.transaction():
+    device = repository.get(3)
+    repository.save(device.model_copy(update={"given_name": sys.argv[2]}))
+    repository.record_change({"type": "devices.updated", "devices": [{"id": 3, "changes": {"given_name": sys.argv[2]}}]})
+repository.sync()
+repository.close()
+"""
+
+
+def _other_process(db_path: str, name: str):
+    subprocess.run([sys.executable, "-c", WORKER, db_path, name], check=True, cwd=".", timeout=60)
+
+
+def test_commits_from_another_process_are_visible(sqlite_repository):
+    revision = sqlite_repository.revision()
+    _other_process(sqlite_repository.db_path, "From another worker")
+
+    assert sqlite_repository.revision() == revision + 1
+    assert sqlite_repository.get(3).given_name == "From another worker"
+    changes = sqlite_repository.changes_since(revision)
+    assert [(changed, json.loads(data)["devices"]) for changed, data in changes] == [
+        (revision + 1, [{"id": 3, "changes": {"given_name": "From another worker"}}])
+    ]
+    assert sqlite_repository.changes_since(revision + 1) == []
+    assert sqlite_repository.verify_summary()["ok"]
+
+
+def test_revisions_are_shared_between_connections(sqlite_repository):
+    other = SqliteDeviceRepository(db_path=sqlite_repository.db_path)
+    other.load()
+    try:
+        revisions = []
+        for repository in (sqlite_repository, other, sqlite_repository):
+            with repository.transaction():
+                revisions.append(repository.record_change({"type": "test"}))
+        assert revisions == list(range(revisions[0], revisions[0] + 3))
+        assert other.revision() == sqlite_repository.revision() == revisions[-1]
+
+        # Group policies are cached per connection until the revision moves
+        staff = other.get_group(2)
+        with sqlite_repository.transaction():
+            sqlite_repository.save_group(staff.model_copy(update={"name": "Employees"}))
+            sqlite_repository.record_change({"type": "group.updated"})
+        assert other.get_group(2).name == "Employees"
+    finally:
+        other.close()
+
+
+@pytest.fixture
+def workers(sqlite_repository, monkeypatch):
+    """Two controllers over one SQLite database, as two server workers."""
+    monkeypatch.setattr(config, "CHANGE_POLL_INTERVAL", 0.01)
+    controllers = [DeviceController(SqliteDeviceRepository(db_path=sqlite_repository.db_path)) for _ in range(2)]
+    yield controllers
+    for controller in controllers:
+        controller.close()
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_changes_reach_the_other_workers_feed(workers):
+    first, second = workers
+    first.update_device(4, DeviceUpdate(given_name="Renamed by the first worker"))
+    revision = first.revision
+    _wait_for(lambda: second.changes.feed.head == revision)
+
+    assert second.get_device_by_id(4).given_name == "Renamed by the first worker"
+    stats = second.changes.feed.stats()
+    assert stats["published"] == 1 and stats["oldest_revision"] == revision
+
+    second.update_group(3, GroupUpdate(name="Visitors"))
+    _wait_for(lambda: first.changes.feed.head == second.revision)
+    assert first.get_group(3).name == "Visitors"
+    assert first.get_summary()["by_group"]["Visitors"] == 2
+    assert first.get_summary() == second.get_summary()
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+from app.schemas.device import Sighting
+from app.storage.json_repository import JsonDeviceRepository
+
+AP_LOBBY = "B8:27:EB:10:22:33"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def test_sightings_are_merged_per_mac(controller):
+    revision = controller.revision
+    seen = _now()
+    controller.sightings.buffer.add([
+        Sighting(mac="b8-27-eb-10-22-33", ip="192.168.69.77", timestamp=seen - timedelta(seconds=2)),
+        Sighting(mac=AP_LOBBY, hostname="ap-lobby-2", timestamp=seen),
+        Sighting(mac=AP_LOBBY, ip="192.168.69.78", timestamp=seen - timedelta(seconds=1)),
+    ], seen)
+    assert controller.sightings.buffer.stats()["pending_devices"] == 1
+
+    result = controller.sightings.flush()
+    assert (result["devices"], result["sightings"], result["updated"], result["created"]) == (1, 3, 1, 0)
+    device = controller.get_device_by_id(2)
+    # The newest report of each field wins
+    assert (device.ip, device.hostname) == ("192.168.69.78", "ap-lobby-2")
+    assert [d.id for d in controller.repository.find_by_ip("192.168.69.78")] == [2]
+    assert controller.revision == revision + 1
+
+
+def test_unknown_macs_become_new_devices(controller):
+    result = controller.sightings.ingest([
+        Sighting(mac="02:00:00:00:00:01", hostname="kiosk", user_agent="Kiosk/1.0"),
+        Sighting(mac="02:00:00:00:00:02", ip="192.168.69.200"),
+        Sighting(mac="02:00:00:00:00:01", ip="192.168.69.201"),
+        Sighting(mac=AP_LOBBY),
+    ])
+    flushed = result["flushed"]
+    assert (flushed["devices"], flushed["created"]) == (3, 2)
+
+    kiosk = controller.repository.find_by_mac("02:00:00:00:00:01")[0]
+    assert kiosk.id == 11 and (kiosk.hostname, kiosk.ip, kiosk.given_name) == ("kiosk", "192.168.69.201", "kiosk")
+    assert kiosk.user_agent == ["Kiosk/1.0"] and kiosk.is_active
+    assert kiosk.group.is_default and not kiosk.has_custom_blocklist
+    assert kiosk.blocklist == controller.get_group(kiosk.group.id).blocklist
+    assert controller.repository.find_by_mac("02:00:00:00:00:02")[0].id == 12
+    summary = controller.get_summary()
+    assert summary["total"] == 12 and summary["by_group"]["Default Group"] == 3
+    assert controller.verify_summary()["ok"]
+
+    # Seen again: matched, not created twice
+    again = controller.sightings.ingest([Sighting(mac="02:00:00:00:00:01", hostname="kiosk-lobby")])
+    assert again["flushed"]["created"] == 0 and controller.get_summary()["total"] == 12
+
+
+def test_durable_flush_waits_for_the_journal(controller, data_file, monkeypatch):
+    syncs = []
+    sync = controller.repository.sync
+    monkeypatch.setattr(controller.repository, "sync", lambda: syncs.append(1) or sync())
+
+    controller.sightings.buffer.add([Sighting(mac="02:00:00:00:00:03")], _now())
+    controller.sightings.flush(durable=False)
+    assert syncs == []
+    controller.sightings.buffer.add([Sighting(mac="02:00:00:00:00:04")], _now())
+    controller.sightings.flush()
+    assert syncs == [1]
+
+    # Both made it to disk, the non-durable one in the background
+    controller.close()
+    reopened = JsonDeviceRepository(data_file_path=data_file)
+    reopened.load()
+    try:
+        assert reopened.find_by_mac("02:00:00:00:00:03") and reopened.find_by_mac("02:00:00:00:00:04")
+    finally:
+        reopened.close()
+
+
+def test_nothing_pending_is_a_no_op(controller):
+    revision = controller.revision
+    assert controller.sightings.flush()["devices"] == 0
+    assert controller.revision == revision
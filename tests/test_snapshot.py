@@ -0,0 +1,88 @@
+import gc
+import json
+import pytest
+from app.schemas.device import Device
+from app.storage.snapshot import (
+    bulk_load, is_trusted, iter_json_array, load_devices, manifest_path, trusted_device, write_snapshot
+)
+
+
+@pytest.fixture
+def snapshot(data_file):
+    """The sample fleet rewritten as a snapshot this server trusts."""
+    write_snapshot(data_file, list(load_devices(data_file)))
+    return data_file
+
+
+def _dumps(devices):
+    return [device.model_dump() for device in devices]
+
+
+def test_trusted_snapshots_skip_validation(snapshot):
+    assert is_trusted(snapshot)
+    with open(snapshot) as f:
+        raw = json.load(f)
+    validated = [Device.model_validate(values) for values in raw]
+    for stream_threshold in (0, 1):
+        loaded = list(load_devices(snapshot, stream_threshold))
+        assert all(type(device) is Device for device in loaded)
+        assert _dumps(loaded) == _dumps(validated)
+    device = trusted_device(raw[0])
+    assert device.model_copy(update={"given_name": "Copy"}).group == validated[0].group
+    assert device.model_dump_json() == validated[0].model_dump_json()
+
+
+def _rewrite(path, edit):
+    with open(path) as f:
+        raw = json.load(f)
+    edit(raw)
+    with open(path, "w") as f:
+        json.dump(raw, f)
+
+
+def test_a_changed_snapshot_is_validated(snapshot):
+    _rewrite(snapshot, lambda raw: raw[0].update(given_name="Edited by hand"))
+    assert not is_trusted(snapshot)
+    assert next(iter(load_devices(snapshot))).given_name == "Edited by hand"
+
+    _rewrite(snapshot, lambda raw: raw[0].update(is_active="maybe"))
+    for stream_threshold in (0, 1):
+        with pytest.raises(ValueError):
+            list(load_devices(snapshot, stream_threshold))
+
+
+def test_a_manifest_for_another_schema_is_not_trusted(snapshot):
+    with open(manifest_path(snapshot)) as f:
+        manifest = json.load(f)
+    with open(manifest_path(snapshot), "w") as f:
+        json.dump({**manifest, "schema": "0" * 16}, f)
+    assert not is_trusted(snapshot)
+    assert _dumps(load_devices(snapshot)) == _dumps(load_devices(snapshot, 1))
+
+
+def test_elements_spanning_chunk_boundaries(tmp_path):
+    items = [{"id": 1, "given_name": "Café ☕"}, [1, [2, "]"]], "x, y", {"nested": {"a": [None, True]}}, 12.5]
+    path = tmp_path / "items.json"
+    path.write_text(" [\n" + ",\n  ".join(json.dumps(item, ensure_ascii=False) for item in items) + "\n] ", encoding="utf-8")
+    # Down to one byte per read, splitting the multibyte characters too
+    for chunk_size in (1, 2, 3, 7, 64, 1 << 20):
+        assert list(iter_json_array(str(path), chunk_size)) == items
+
+    path.write_text('[{"id": 1}, {"id": 2', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), 4))
+    path.write_text('{"id": 1}', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path)))
+    path.write_text("[]", encoding="utf-8")
+    assert list(iter_json_array(str(path), 1)) == []
+
+
+def test_only_the_startup_load_changes_the_gc(data_file):
+    # The process's first load has happened by now (the app's, at import)
+    from main import app  # noqa: F401
+    frozen = gc.get_freeze_count()
+    with bulk_load():
+        assert gc.isenabled()
+        list(load_devices(data_file))
+    assert gc.isenabled() and gc.get_freeze_count() == frozen
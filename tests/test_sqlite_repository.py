@@ -0,0 +1,56 @@
+import os
+import sqlite3
+from app.storage.blocklist_bits import BlocklistChange
+
+
+def test_sync_fsyncs_the_wal_once_per_batch_of_commits(sqlite_repository, monkeypatch):
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced.append(os.fstat(fd).st_ino), fsync(fd)))
+    device = sqlite_repository.get(1)
+    for name in ("a", "b", "c"):
+        with sqlite_repository.transaction():
+            sqlite_repository.save(device.model_copy(update={"given_name": name}))
+    sqlite_repository.sync()
+    assert synced == [os.stat(sqlite_repository.db_path + "-wal").st_ino]
+    sqlite_repository.sync()
+    assert len(synced) == 1
+
+
+def test_sync_after_truncating_checkpoint(sqlite_repository):
+    with sqlite_repository.transaction():
+        sqlite_repository.save(sqlite_repository.get(1).model_copy(update={"given_name": "x"}))
+    sqlite_repository.flush()
+    sqlite_repository.sync()
+    assert sqlite_repository.get(1).given_name == "x"
+
+
+def test_summary_counters_follow_every_write(sqlite_repository):
+    with sqlite_repository.transaction():
+        device = sqlite_repository.get(2)
+        staff = sqlite_repository.get_group(2)
+        sqlite_repository.save(device.model_copy(update={
+            "group": device.group.model_copy(update={"id": staff.id, "name": staff.name}),
+            "is_active": False
+        }))
+        new_device = device.model_copy(update={"id": 11, "mac": "02:00:00:00:00:11"})
+        sqlite_repository.save_many([new_device])
+    sqlite_repository.apply_blocklist([3], BlocklistChange(toggle_mask=1))
+
+    summary = sqlite_repository.summary()
+    assert (summary["total"], summary["active"]) == (11, 8)
+    assert summary["by_group"] == {"Default Group": 1, "IoT": 3, "Staff": 5, "Guests": 2}
+    assert sqlite_repository.verify_summary()["ok"]
+
+
+def test_repair_rebuilds_drifted_counters(sqlite_repository):
+    with sqlite3.connect(sqlite_repository.db_path) as conn:
+        conn.execute("UPDATE summary_counts SET count = count + 5 WHERE kind = 'total'")
+    conn.close()
+    # Served from the counters, not counted from the devices
+    assert sqlite_repository.summary()["total"] == 15
+    report = sqlite_repository.verify_summary()
+    assert not report["ok"] and report["drift"]
+    assert not sqlite_repository.verify_summary(repair=True)["ok"]
+    assert sqlite_repository.verify_summary()["ok"]
+    assert sqlite_repository.summary()["total"] == 10
@@ -0,0 +1,46 @@
+import sqlite3
+import pytest
+from app.controllers.device_controller import DeviceController
+from app.storage.sqlite_repository import SqliteDeviceRepository
+
+
+@pytest.fixture
+def controller(sqlite_repository):
+    """The API over the SQLite backend, whose summary counters live in the database."""
+    device_controller = DeviceController(SqliteDeviceRepository(db_path=sqlite_repository.db_path))
+    yield device_controller
+    device_controller.close()
+
+
+def _drift(db_path: str):
+    """Skew the stored counters behind the repository's back, as a hand edit or a bad restore would."""
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute("INSERT INTO summary_counts (kind, key, count) VALUES ('group', 'Drifted', 1)")
+        conn.execute("UPDATE summary_counts SET count = count + 1 WHERE kind = 'total'")
+    conn.close()
+
+
+def test_verify_reports_drift_without_repairing_it(api, sqlite_repository):
+    assert api.get("/api/summary/verify").json()["ok"]
+    _drift(sqlite_repository.db_path)
+
+    for _ in range(2):
+        report = api.get("/api/summary/verify").json()
+        assert not report["ok"]
+        assert report["drift"]
+
+    repaired = api.post("/api/summary/verify")
+    assert repaired.status_code == 200
+    assert repaired.headers["X-Durability"] == "durable"
+    assert not repaired.json()["ok"]
+    assert api.get("/api/summary/verify").json()["ok"]
+    assert api.post("/api/summary/verify").json()["ok"]
+    summary = api.get("/api/summary").json()
+    assert summary["total"] == 10 and "Drifted" not in summary["by_group"]
+
+
+def test_verify_does_not_take_a_repair_flag(api, sqlite_repository):
+    _drift(sqlite_repository.db_path)
+    assert not api.get("/api/summary/verify?repair=true").json()["ok"]
+    assert not api.get("/api/summary/verify").json()["ok"]
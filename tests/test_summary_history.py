@@ -0,0 +1,61 @@
+import os
+import pytest
+from app.storage.journal import write_atomic
+from app.utils import summary_history
+from app.utils.summary_history import SummaryHistory
+
+
+def _summary(groups, total=10, active=5):
+    return {"total": total, "active": active, "by_group": groups, "by_category": {}}
+
+
+def test_rollups_aggregate_samples():
+    history = SummaryHistory()
+    for offset, active in enumerate([1, 5, 3]):
+        history.record(600 + offset, _summary({}, active=active))
+    result = history.query(600, 659, resolution="1m", keys=["active"])
+    assert result["timestamps"] == [600]
+    assert result["series"]["active"] == [3.0]
+    assert history.query(600, 659, resolution="1m", keys=["active"], aggregate="max")["series"]["active"] == [5.0]
+    with pytest.raises(ValueError):
+        history.query(600, 659, keys=["group:Nope"])
+
+
+def test_series_are_capped_evicting_labels_gone_longest(monkeypatch):
+    monkeypatch.setattr(summary_history, "MAX_SERIES", 4)
+    history = SummaryHistory()
+    history.record(60, _summary({"A": 1}))
+    history.record(120, _summary({"B": 1}))
+    history.record(180, _summary({"B": 1, "C": 1}))
+    # A went away first, so it makes room for C
+    assert history.keys == ["total", "active", "group:B", "group:C"]
+    history.record(240, _summary({"B": 1, "C": 1, "D": 1}))
+    # Every other series is live: D is not recorded
+    assert history.keys == ["total", "active", "group:B", "group:C"]
+    assert history.stats()["dropped_series"] == 1
+    assert history.query(0, 300, resolution="1m", keys=["group:C"])["series"]["group:C"] == [0.0, 0.0, 1.0, 1.0]
+
+
+def test_only_the_lock_holder_saves(tmp_path):
+    path = str(tmp_path / "history.npz")
+    owner, other = SummaryHistory(path), SummaryHistory(path)
+    owner.record(60, _summary({"A": 1}))
+    other.record(60, _summary({"B": 1}))
+    owner.save()
+    # flock is per open file, so a second handle in this process stands in for another worker
+    assert owner.owns_file() and not other.owns_file()
+    other.save()
+    restored = SummaryHistory(path)
+    restored.load()
+    assert "group:A" in restored.keys and "group:B" not in restored.keys
+    owner.close()
+    assert other.owns_file()
+    other.close()
+
+
+def test_write_atomic_leaves_no_temp_files(tmp_path):
+    path = str(tmp_path / "file.bin")
+    write_atomic(path, b"one")
+    write_atomic(path, b"two")
+    assert open(path, "rb").read() == b"two"
+    assert os.listdir(tmp_path) == ["file.bin"]